@@ -31,8 +31,10 @@ class TeacherAdmin(admin.ModelAdmin):
 
 @admin.register(AttendanceSession)
 class AttendanceSessionAdmin(admin.ModelAdmin):
-    list_display = ('subject', 'batch', 'teacher', 'start_time', 'is_active')
-    list_filter = ('is_active', 'batch', 'subject')
+    list_display = ('subject', 'batch', 'teacher', 'start_time', 'is_active', 'ingest_mode', 'present_count', 'roster_size')
+    list_filter = ('is_active', 'ingest_mode', 'batch', 'subject')
+    list_editable = ('ingest_mode',)
+    readonly_fields = ('present_count', 'roster_size')
     search_fields = ('subject__name',)
 
 @admin.register(AttendanceRecord)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AttendanceManagementSystemConfig(AppConfig):
+    name = 'attendance_management_system'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        # Installs the per-connection execute wrapper before any connection opens
+        from . import sql_budget  # noqa: F401
@@ -0,0 +1,257 @@
+"""
+Buffered audit log sink.
+
+``log_action`` hands entries to a per-process buffer instead of inserting an
+AuditLog row inside the request. A background flusher writes them with one
+``bulk_create`` whenever ``AUDIT_LOG_BATCH_SIZE`` entries are waiting or every
+``AUDIT_LOG_FLUSH_INTERVAL`` seconds, and the buffer is drained at exit.
+
+The buffer is bounded by ``AUDIT_LOG_MAX_PENDING``. When it is full a caller
+waits at most ``AUDIT_LOG_PUT_TIMEOUT`` seconds for room and the entry is then
+dropped, so a slow database costs audit entries rather than request latency.
+``stats()`` exposes the drop and backpressure counters. Row timestamps
+(``auto_now_add``) are set at flush time, at most one flush interval late.
+
+``archive_before`` implements the retention job: rows older than a cutoff are
+moved into gzip-compressed JSON Lines files and removed from the table.
+
+``action_choices`` feeds the log's action filter from a cached DISTINCT query.
+Every write path reports its actions to ``actions_written``, which retires the
+cached list the first time this process writes an action it has not seen.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+ACTIONS_PREFIX = 'ams:audit-actions:v1:'
+
+_known_actions = set()
+
+
+class AuditBuffer:
+    def __init__(self, max_pending=10000, batch_size=200, flush_interval=1.0, put_timeout=0.0):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = os.getpid()
+        self._thread = None
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'backpressure': 0, 'failed_flushes': 0, 'high_water': 0}
+
+    # --- Write path ---
+
+    def _check_fork(self):
+        # A forked worker must not write out entries its parent still owns.
+        if self._pid != os.getpid():
+            self._entries.clear()
+            self._pid = os.getpid()
+            self._thread = None
+
+    def log(self, user_id, action, details=""):
+        """Queue one entry. Returns False if it was dropped because the buffer stayed full."""
+        entry = (user_id, action, details)
+        with self._not_full:
+            self._check_fork()
+            if len(self._entries) >= self.max_pending:
+                self._stats['backpressure'] += 1
+                self._wakeup.set()
+                if self.put_timeout <= 0 or not self._not_full.wait_for(
+                    lambda: len(self._entries) < self.max_pending, self.put_timeout
+                ):
+                    self._stats['dropped'] += 1
+                    return False
+            self._entries.append(entry)
+            self._stats['enqueued'] += 1
+            self._stats['high_water'] = max(self._stats['high_water'], len(self._entries))
+            if len(self._entries) >= self.batch_size:
+                self._wakeup.set()
+        self._ensure_flusher()
+        return True
+
+    # --- Flush path ---
+
+    def _ensure_flusher(self):
+        if self.flush_interval is None:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error flushing audit log")
+            finally:
+                close_old_connections()
+
+    def _take(self):
+        with self._not_full:
+            self._check_fork()
+            batch = [self._entries.popleft() for _ in range(min(self.batch_size, len(self._entries)))]
+            self._not_full.notify_all()
+        return batch
+
+    def _requeue(self, batch):
+        # Put a failed batch back in front of newer entries, as far as room allows.
+        with self._lock:
+            room = max(self.max_pending - len(self._entries), 0)
+            self._entries.extendleft(reversed(batch[:room]))
+            self._stats['dropped'] += len(batch) - min(room, len(batch))
+            self._stats['failed_flushes'] += 1
+
+    def flush(self):
+        """Write out everything buffered so far. Returns the number of rows written."""
+        from .models import AuditLog
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    AuditLog.objects.bulk_create([
+                        AuditLog(user_id=user_id, action=action, details=details)
+                        for user_id, action, details in batch
+                    ])
+                except Exception:
+                    self._requeue(batch)
+                    raise
+                actions_written(action for _, action, _ in batch)
+                written += len(batch)
+                with self._lock:
+                    self._stats['written'] += len(batch)
+        return written
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._entries))
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    """Process-wide audit buffer, drained at interpreter exit."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = AuditBuffer(
+                    max_pending=getattr(settings, 'AUDIT_LOG_MAX_PENDING', 10000),
+                    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 1.0),
+                    put_timeout=getattr(settings, 'AUDIT_LOG_PUT_TIMEOUT', 0.0),
+                )
+                atexit.register(_drain_at_exit, buffer)
+                _buffer = buffer
+    return _buffer
+
+
+def _drain_at_exit(buffer):
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Error draining audit log")
+
+
+def is_buffered():
+    return getattr(settings, 'AUDIT_LOG_BUFFERED', True)
+
+
+def stats():
+    """Counters for this worker process (empty until the first buffered entry)."""
+    return _buffer.stats() if _buffer is not None else {}
+
+
+def _actions_generation():
+    key = f"{ACTIONS_PREFIX}gen"
+    cache.add(key, uuid.uuid4().hex, None)
+    return cache.get(key)
+
+
+def action_choices():
+    """Sorted distinct AuditLog actions, cached under a generation token."""
+    from .models import AuditLog
+
+    key = f"{ACTIONS_PREFIX}{_actions_generation()}"
+    actions = cache.get(key)
+    if actions is None:
+        actions = list(AuditLog.objects.order_by('action').values_list('action', flat=True).distinct())
+        cache.set(key, actions, getattr(settings, 'AUDIT_ACTIONS_CACHE_TIMEOUT', 60 * 60))
+    return actions
+
+
+def actions_written(actions):
+    """Call after AuditLog rows are committed; retires the cached list if an action is new here."""
+    new = set(actions) - _known_actions
+    if new:
+        _known_actions.update(new)
+        cache.delete(f"{ACTIONS_PREFIX}gen")
+
+
+def archive_before(cutoff, directory, chunk_size=5000):
+    """
+    Move AuditLog rows with timestamp < cutoff into ``auditlog-<first id>-<last id>.jsonl.gz``
+    files under `directory`, oldest first. Each chunk's file is complete on disk
+    before its rows are deleted, so an interrupted run can only leave duplicates
+    in the archive, never lose rows. Returns (rows archived, files written).
+    """
+    from .models import AuditLog
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    archived, files = 0, 0
+    while True:
+        rows = list(
+            AuditLog.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values('id', 'timestamp', 'user_id', 'user__username', 'action', 'details')[:chunk_size]
+        )
+        if not rows:
+            if archived:
+                # The archived rows may have held the last of an action
+                cache.delete(f"{ACTIONS_PREFIX}gen")
+            return archived, files
+
+        path = directory / f"auditlog-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+        partial = path.with_name(path.name + '.part')
+        with gzip.open(partial, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                row['timestamp'] = row['timestamp'].isoformat()
+                row['username'] = row.pop('user__username')
+                f.write(json.dumps(row) + '\n')
+        with open(partial, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+
+        with transaction.atomic():
+            AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        files += 1
@@ -0,0 +1,49 @@
+"""
+Deferring non-critical work (audit writes, etc.) until after an async view responds.
+
+Under ASGI the server's event loop outlives the request, so the work is scheduled
+as a task and the response goes out immediately. Under WSGI each async view runs
+in a throwaway loop that would cancel leftover tasks, so the work is awaited inline.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_tasks = set()
+
+
+async def run_after_response(request, func, *args, **kwargs):
+    """Run a sync callable off the event loop, after the response when possible."""
+    if not isinstance(request, ASGIRequest):
+        await sync_to_async(func)(*args, **kwargs)
+        return
+    task = asyncio.ensure_future(sync_to_async(_detached, thread_sensitive=False)(func, *args, **kwargs))
+    # Keep a strong reference until done; the loop only holds weak ones
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+
+
+def _detached(func, *args, **kwargs):
+    # Pool threads outlive the request, so release their DB connection like a request would
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _finished(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # Not inside an except block, so hand the exception over for the traceback
+        logger.error("Error in deferred task", exc_info=task.exception())
+
+
+async def drain():
+    """Wait for all deferred work scheduled in this process (tests, shutdown)."""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
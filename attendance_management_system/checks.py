@@ -0,0 +1,22 @@
+"""
+System checks for deployment settings the app relies on.
+
+Session snapshots, rosters and present-sets are invalidated by deleting cache
+keys, which only reaches other workers when the cache is shared between them.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .session_cache import cache_is_process_local
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if getattr(settings, 'WEB_CONCURRENCY', 1) > 1 and cache_is_process_local():
+        return [Error(
+            'The default cache is LocMemCache but WEB_CONCURRENCY runs several workers.',
+            hint='Point CACHE_BACKEND/CACHE_LOCATION at a shared backend such as Redis; '
+                 'ending a session or moving a student only clears the cache of the worker that did it.',
+            id='attendance.E001',
+        )]
+    return []
@@ -0,0 +1,19 @@
+"""
+Process-pool entry points for export jobs.
+
+Spawned workers unpickle these functions by importing this module before Django
+is set up, so nothing here may import models at module level.
+"""
+
+
+def init(databases=None):
+    import django
+    from django.conf import settings
+    if databases is not None:
+        settings.DATABASES = databases
+    django.setup()
+
+
+def write_partition(filters, bounds, path):
+    from .exports import export_partition
+    return export_partition(filters, bounds, path)
@@ -0,0 +1,317 @@
+"""
+Exports of attendance records.
+
+Small CSV exports stream straight from the request (``csv_lines``). Large ones run
+as an ExportJob: the request only stores the filters and hands back a job id, and
+a coordinator thread in the web process splits the work into partitions (one per
+batch, or one per month within a single batch) that a process pool writes as
+separate gzip members. Concatenated gzip members are one valid ``.csv.gz``.
+Snapshot jobs write one columnar ``.npz`` in the coordinator (see snapshot.py);
+their integer codes are global to the file, so they are not partitioned.
+
+Identical filters reuse a queued, running or unexpired finished job. A running
+job touches its ``heartbeat_at`` every ``EXPORT_HEARTBEAT_INTERVAL`` seconds; a
+queued or running one that has not beaten for ``EXPORT_STALE_AFTER`` seconds
+(its process died, or a restart dropped it before it started) is no longer
+reused, and ``reap_stale`` marks it failed. Artifacts are removed
+``EXPORT_ARTIFACT_TTL`` seconds after they finish by ``purge_expired``.
+``manage.py purge_exports`` runs both and must be scheduled (cron): submissions
+only run ``purge_expired``, so nothing else fails jobs left behind by a restart.
+"""
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from . import export_worker, snapshot
+from .models import AttendanceRecord, ExportJob
+from .pagination import day_bounds
+
+logger = logging.getLogger(__name__)
+
+HEADER = ['Date', 'Session ID', 'Teacher', 'Subject', 'Batch', 'Student', 'Status']
+FILTER_KEYS = ('batch', 'subject', 'date', 'start', 'end')
+ARTIFACT_SUFFIXES = {ExportJob.CSV: 'csv.gz', ExportJob.SNAPSHOT: 'npz'}
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+def filter_attendance_records(records, params):
+    """Apply the batch / subject / date (or start-end range) filters shared by the report and exports."""
+    batch_id = params.get('batch')
+    subject_id = params.get('subject')
+    date_str = params.get('date')
+    if batch_id:
+        records = records.filter(session__batch_id=batch_id)
+    if subject_id:
+        records = records.filter(session__subject_id=subject_id)
+    if date_str:
+        # A range on the indexed column rather than a per-row date conversion
+        day_start, day_end = day_bounds(date_str, date_str)
+        if day_start:
+            records = records.filter(timestamp__gte=day_start, timestamp__lt=day_end)
+    start, end = day_bounds(params.get('start'), params.get('end'))
+    if start:
+        records = records.filter(timestamp__gte=start)
+    if end:
+        records = records.filter(timestamp__lt=end)
+    return records
+
+
+def csv_lines(records, chunk_size=2000, header=True):
+    """
+    CSV lines for an export, fetched in primary-key chunks so memory stays flat
+    on every backend (mysqlclient buffers whole result sets client-side).
+    """
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(HEADER)
+    columns = records.values_list(
+        'id', 'timestamp', 'session__session_id',
+        'session__teacher__user__first_name', 'session__teacher__user__last_name',
+        'session__subject__name', 'session__batch__name',
+        'student__user__first_name', 'student__user__last_name', 'status',
+    ).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(columns.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        for _, timestamp, session_uuid, t_first, t_last, subject, batch, s_first, s_last, status in chunk:
+            yield writer.writerow([
+                timestamp,
+                session_uuid,
+                f"{t_first} {t_last}".strip(),
+                subject,
+                batch,
+                f"{s_first} {s_last}".strip(),
+                status,
+            ])
+        last_id = chunk[-1][0]
+
+
+# --- Background jobs ---
+
+def normalise_filters(params):
+    return {key: str(params[key]).strip() for key in FILTER_KEYS if str(params.get(key) or '').strip()}
+
+
+def normalise_format(value):
+    return value if value in dict(ExportJob.FORMAT_CHOICES) else ExportJob.CSV
+
+
+def fingerprint(filters, format=ExportJob.CSV):
+    key = filters if format == ExportJob.CSV else dict(filters, format=format)
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def submit(params, user=None):
+    """
+    Queue an export for the given filters and format, or return the live job already
+    covering them. Returns (job, created); a new job starts once the transaction commits.
+    """
+    purge_expired()
+    filters = normalise_filters(params)
+    format = normalise_format(params.get('format'))
+    digest = fingerprint(filters, format)
+    now = timezone.now()
+    job = ExportJob.objects.filter(
+        Q(status__in=[ExportJob.QUEUED, ExportJob.RUNNING], heartbeat_at__gt=_stale_before(now))
+        | Q(status=ExportJob.DONE, expires_at__gt=now),
+        fingerprint=digest,
+    ).order_by('-created_at').first()
+    if job is not None:
+        return job, False
+    job = ExportJob.objects.create(requested_by=user, filters=filters, format=format, fingerprint=digest)
+    transaction.on_commit(lambda: start(job.pk))
+    return job, True
+
+
+def start(job_pk):
+    threading.Thread(target=_run_in_thread, args=(job_pk,), name=f'export-{job_pk}', daemon=True).start()
+
+
+def _run_in_thread(job_pk):
+    try:
+        run(job_pk)
+    finally:
+        # This thread is done with the database for good
+        connections.close_all()
+
+
+def _partitions(filters):
+    """(filters, [start, end) bounds or None) per unit of work."""
+    records = filter_attendance_records(AttendanceRecord.objects.all(), filters)
+    if not filters.get('batch'):
+        batch_ids = records.order_by('session__batch_id').values_list('session__batch_id', flat=True).distinct()
+        return [(dict(filters, batch=str(b)), None) for b in batch_ids]
+
+    span = records.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+    if span['first'] is None:
+        return [(filters, None)]
+    parts = []
+    month = timezone.localtime(span['first']).date().replace(day=1)
+    last = timezone.localtime(span['last']).date()
+    while month <= last:
+        following = (month + timedelta(days=32)).replace(day=1)
+        bounds = tuple(timezone.make_aware(datetime.combine(d, datetime.min.time())) for d in (month, following))
+        parts.append((filters, bounds))
+        month = following
+    return parts
+
+
+def export_partition(filters, bounds, path):
+    """Write one partition as a header-less gzip CSV. Returns the row count."""
+    records = filter_attendance_records(AttendanceRecord.objects.all(), filters)
+    if bounds is not None:
+        records = records.filter(timestamp__gte=bounds[0], timestamp__lt=bounds[1])
+    rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        for line in csv_lines(records, header=False):
+            f.write(line)
+            rows += 1
+    return rows
+
+
+def _artifact_dir():
+    return Path(settings.MEDIA_ROOT) / 'exports'
+
+
+def run(job_pk, processes=None):
+    """Produce a job's artifact. CSV partitions run in a process pool unless processes is 0."""
+    if processes is None:
+        processes = getattr(settings, 'EXPORT_PROCESSES', 2)
+    job = ExportJob.objects.get(pk=job_pk)
+    parts_dir = _artifact_dir() / str(job.job_id)
+    stop = threading.Event()
+    threading.Thread(target=_beat, args=(job_pk, stop), name=f'export-{job_pk}-heartbeat', daemon=True).start()
+    try:
+        artifact = _artifact_dir() / f"{job.job_id}.{ARTIFACT_SUFFIXES[job.format]}"
+        partial = artifact.with_name(artifact.name + '.part')
+        if job.format == ExportJob.SNAPSHOT:
+            rows = _run_snapshot(job, partial)
+        else:
+            rows = _run_csv(job, parts_dir, partial, processes)
+        os.replace(partial, artifact)
+
+        now = timezone.now()
+        ExportJob.objects.filter(pk=job_pk).update(
+            status=ExportJob.DONE,
+            row_count=rows,
+            artifact=str(artifact.relative_to(settings.MEDIA_ROOT)),
+            finished_at=now,
+            expires_at=now + timedelta(seconds=getattr(settings, 'EXPORT_ARTIFACT_TTL', 24 * 60 * 60)),
+        )
+    except Exception as e:
+        logger.exception("Error running export %s", job.job_id)
+        ExportJob.objects.filter(pk=job_pk).update(status=ExportJob.FAILED, error=str(e), finished_at=timezone.now())
+    finally:
+        stop.set()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def _beat(job_pk, stop):
+    try:
+        while not stop.wait(getattr(settings, 'EXPORT_HEARTBEAT_INTERVAL', 30)):
+            ExportJob.objects.filter(pk=job_pk).update(heartbeat_at=timezone.now())
+    except Exception:
+        logger.exception("Error updating export heartbeat %s", job_pk)
+    finally:
+        connections.close_all()
+
+
+def _run_snapshot(job, partial):
+    ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.RUNNING, total_parts=1, heartbeat_at=timezone.now())
+    _artifact_dir().mkdir(parents=True, exist_ok=True)
+    rows = snapshot.write_snapshot(filter_attendance_records(AttendanceRecord.objects.all(), job.filters), partial)
+    ExportJob.objects.filter(pk=job.pk).update(done_parts=1)
+    return rows
+
+
+def _run_csv(job, parts_dir, partial, processes):
+    partitions = _partitions(job.filters)
+    ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.RUNNING, total_parts=len(partitions), heartbeat_at=timezone.now())
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    paths = [str(parts_dir / f"part-{i:04d}.csv.gz") for i in range(len(partitions))]
+
+    rows = 0
+    if processes and len(partitions) > 1:
+        # spawn: forking a threaded web worker with open DB connections is not safe
+        pool = ProcessPoolExecutor(
+            max_workers=min(processes, len(partitions)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=export_worker.init,
+            # The coordinator's database settings, which may differ from the settings module's (tests)
+            initargs=(settings.DATABASES,),
+        )
+        with pool:
+            futures = [pool.submit(export_worker.write_partition, f, b, p) for (f, b), p in zip(partitions, paths)]
+            for future in as_completed(futures):
+                rows += future.result()
+                ExportJob.objects.filter(pk=job.pk).update(done_parts=F('done_parts') + 1)
+    else:
+        for (f, b), p in zip(partitions, paths):
+            rows += export_partition(f, b, p)
+            ExportJob.objects.filter(pk=job.pk).update(done_parts=F('done_parts') + 1)
+
+    with open(partial, 'wb') as out:
+        header = csv.writer(_Echo()).writerow(HEADER)
+        out.write(gzip.compress(header.encode('utf-8')))
+        for path in paths:
+            with open(path, 'rb') as part:
+                shutil.copyfileobj(part, out)
+    return rows
+
+
+def artifact_path(job):
+    return Path(settings.MEDIA_ROOT) / job.artifact if job.artifact else None
+
+
+def purge_expired(now=None):
+    """Delete artifacts past their expiry and mark their jobs expired. Returns the number purged."""
+    now = now or timezone.now()
+    purged = 0
+    for job in ExportJob.objects.filter(status=ExportJob.DONE, expires_at__lte=now):
+        path = artifact_path(job)
+        if path is not None and path.exists():
+            path.unlink()
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.EXPIRED, artifact='')
+        purged += 1
+    return purged
+
+
+def _stale_before(now):
+    return now - timedelta(seconds=getattr(settings, 'EXPORT_STALE_AFTER', 10 * 60))
+
+
+def reap_stale(now=None):
+    """Mark queued or running jobs that stopped beating as failed and remove their files. Returns the number reaped."""
+    now = now or timezone.now()
+    reaped = 0
+    for job in ExportJob.objects.filter(status__in=[ExportJob.QUEUED, ExportJob.RUNNING], heartbeat_at__lte=_stale_before(now)):
+        # Skipped if it beat (or moved on) since the query
+        if not ExportJob.objects.filter(pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at).update(
+            status=ExportJob.FAILED, error='Abandoned: the export stopped making progress.', finished_at=now,
+        ):
+            continue
+        shutil.rmtree(_artifact_dir() / str(job.job_id), ignore_errors=True)
+        (_artifact_dir() / f"{job.job_id}.{ARTIFACT_SUFFIXES[job.format]}.part").unlink(missing_ok=True)
+        reaped += 1
+    return reaped
@@ -0,0 +1,78 @@
+"""
+Paginated attendance history for one student.
+
+Each page is one joined query, cached per student under a generation token.
+``student_stats.record_added`` / ``record_removed`` (called from every record
+write path) drop the token, which retires all of that student's cached pages
+at once without having to know their keys.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .models import AttendanceRecord
+from .pagination import day_bounds, keyset_page
+
+PREFIX = 'ams:history:v1:'
+
+
+def _generation_key(student_pk):
+    return f"{PREFIX}gen:{student_pk}"
+
+
+def _generation(student_pk):
+    key = _generation_key(student_pk)
+    cache.add(key, uuid.uuid4().hex, None)
+    return cache.get(key)
+
+
+def invalidate(student_pk):
+    cache.delete(_generation_key(student_pk))
+
+
+def normalise_filters(params):
+    subject = str(params.get('subject') or '').strip()
+    filters = {'subject': subject} if subject.isdigit() else {}
+    for key in ('start', 'end'):
+        value = str(params.get(key) or '').strip()
+        if value:
+            filters[key] = value
+    return filters
+
+
+def history_page(student, params, cursor=None):
+    """
+    One page of the student's records, newest first, filtered by subject and
+    start/end dates. Returns (rows, next_cursor); rows are dicts with
+    'id', 'timestamp', 'subject', 'teacher' and 'status'.
+    """
+    filters = normalise_filters(params)
+    digest = hashlib.sha256(repr((sorted(filters.items()), cursor or '')).encode()).hexdigest()[:32]
+    key = f"{PREFIX}{student.pk}:{_generation(student.pk)}:{digest}"
+    cached = cache.get(key)
+    metrics.cache_lookup('history', cached is not None)
+    if cached is not None:
+        return cached
+
+    records = AttendanceRecord.objects.filter(student=student).select_related('session__subject', 'session__teacher__user')
+    if 'subject' in filters:
+        records = records.filter(session__subject_id=filters['subject'])
+    start, end = day_bounds(filters.get('start'), filters.get('end'))
+    if start:
+        records = records.filter(timestamp__gte=start)
+    if end:
+        records = records.filter(timestamp__lt=end)
+
+    records, next_cursor = keyset_page(records, cursor, getattr(settings, 'HISTORY_PAGE_SIZE', 50))
+    rows = [{
+        'id': r.pk,
+        'timestamp': r.timestamp,
+        'subject': r.session.subject.name,
+        'teacher': r.session.teacher.user.get_full_name(),
+        'status': r.status,
+    } for r in records]
+    cache.set(key, (rows, next_cursor), getattr(settings, 'HISTORY_CACHE_TIMEOUT', 300))
+    return rows, next_cursor
@@ -0,0 +1,290 @@
+"""
+Durable scan journal for sessions running in journaled ingest mode.
+
+A scan is acknowledged as soon as it is appended (and fsynced) to a per-process
+journal file. A background flusher rotates that file into a pending segment and
+writes the whole segment with one ``bulk_create`` per model, so a burst of
+scans costs a handful of transactions instead of one per student.
+
+Segments are only deleted after their rows commit. Replaying a segment is safe
+for attendance because inserts ignore conflicts on ``('session', 'student')``.
+Records keep the time of the scan, however late their segment is written.
+Leftovers of a previous run are replayed when the server starts (``wsgi.py`` and
+``asgi.py`` call ``replay_in_background``), not only on the next journaled scan.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import audit, student_stats
+from .pubsub import notify_session_changed
+from .rollup import refresh_sessions
+from .services import recount_present
+
+ACTIVE_PREFIX = 'scans-'
+ACTIVE_SUFFIX = '.jsonl'
+PENDING_SUFFIX = '.pending'
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScanJournal:
+    def __init__(self, directory, batch_size=200, flush_interval=1.0):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = set()  # (session_pk, student_pk) appended but not yet flushed
+        self._inflight = set()  # rotated into a segment that has not committed yet
+        self._unflushed = 0
+        self._file = None
+        self._pid = None
+        self._thread = None
+
+    # --- Write path ---
+
+    def _active_path(self):
+        return self.directory / f"{ACTIVE_PREFIX}{os.getpid()}{ACTIVE_SUFFIX}"
+
+    def _open(self):
+        # Reopen after fork so each worker process owns its own journal file.
+        if self._file is None or self._pid != os.getpid():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self._active_path(), 'a', encoding='utf-8')
+            self._pid = os.getpid()
+            self._pending = set()
+            self._unflushed = 0
+            self._thread = None
+        return self._file
+
+    def is_pending(self, session_pk, student_pk):
+        key = (session_pk, student_pk)
+        return key in self._pending or key in self._inflight
+
+    def append(self, session_pk, student_pk, user_pk=None, audit_details=""):
+        """
+        Durably record a scan. Returns False if this process already holds an
+        unflushed scan for the same (session, student) pair.
+        """
+        entry = json.dumps({
+            'session': session_pk,
+            'student': student_pk,
+            'user': user_pk,
+            'details': audit_details,
+            'ts': time.time(),
+        })
+        with self._lock:
+            f = self._open()
+            key = (session_pk, student_pk)
+            if key in self._pending or key in self._inflight:
+                return False
+            f.write(entry + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            self._pending.add(key)
+            self._unflushed += 1
+            if self._unflushed >= self.batch_size:
+                self._wakeup.set()
+        self._ensure_flusher()
+        return True
+
+    # --- Flush path ---
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='scan-journal-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error flushing scan journal")
+            finally:
+                close_old_connections()
+
+    def _rotate(self):
+        """Move the active file aside so appends continue while it is written out."""
+        with self._lock:
+            if self._file is None or self._pid != os.getpid() or not self._unflushed:
+                return None
+            self._file.close()
+            self._file = None
+            segment = self.directory / f"{ACTIVE_PREFIX}{os.getpid()}-{time.time_ns()}{PENDING_SUFFIX}"
+            os.replace(self._active_path(), segment)
+            flushed = self._pending
+            self._pending = set()
+            self._unflushed = 0
+        return segment, flushed
+
+    def flush(self):
+        """Write out everything this process has journaled so far."""
+        with self._flush_lock:
+            rotated = self._rotate()
+            if rotated is not None:
+                self._inflight |= rotated[1]
+            applied = 0
+            # Also retries segments whose earlier flush failed.
+            for segment in sorted(self.directory.glob(f"{ACTIVE_PREFIX}{os.getpid()}-*{PENDING_SUFFIX}")):
+                applied += self._apply_segment(segment)
+            self._inflight = set()
+            return applied
+
+    def _apply_segment(self, segment):
+        from .models import AttendanceRecord, AuditLog
+
+        records, audits, seen = [], {}, set()
+        with open(segment, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append was never acked.
+                    continue
+                key = (entry['session'], entry['student'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                scanned = datetime.fromtimestamp(entry['ts'], tz=dt_timezone.utc) if 'ts' in entry else timezone.now()
+                records.append(AttendanceRecord(session_id=entry['session'], student_id=entry['student'], timestamp=scanned))
+                if entry.get('details'):
+                    audits[key] = AuditLog(user_id=entry.get('user'), action="Mark Attendance", details=entry['details'])
+
+        session_pks = {r.session_id for r in records}
+        with transaction.atomic():
+            # Replays may repeat rows that already committed; those must not count twice
+            existing = set(AttendanceRecord.objects.filter(
+                session_id__in=session_pks, student_id__in=[r.student_id for r in records]
+            ).values_list('session_id', 'student_id'))
+            AttendanceRecord.objects.bulk_create(records, batch_size=self.batch_size, ignore_conflicts=True)
+            AuditLog.objects.bulk_create(
+                [row for key, row in audits.items() if key not in existing], batch_size=self.batch_size
+            )
+            refresh_sessions(session_pks)
+            recount_present(session_pks)
+            for r in records:
+                if (r.session_id, r.student_id) not in existing:
+                    student_stats.record_added(r.student_id, r.timestamp)
+        if audits:
+            audit.actions_written(a.action for a in audits.values())
+        os.remove(segment)
+        for session_pk in session_pks:
+            notify_session_changed(session_pk)
+        return len(records)
+
+    def replay(self):
+        """
+        Apply segments left behind by crashed or restarted processes.
+        Active files of live processes are left alone.
+        """
+        if not self.directory.exists():
+            return 0
+        applied = 0
+        with self._flush_lock:
+            for path in sorted(self.directory.glob(f"{ACTIVE_PREFIX}*{ACTIVE_SUFFIX}")):
+                pid = path.name[len(ACTIVE_PREFIX):-len(ACTIVE_SUFFIX)]
+                if not pid.isdigit():
+                    continue
+                if int(pid) == os.getpid() and self._file is not None:
+                    continue
+                if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                    continue
+                self._claim(path)
+            for segment in sorted(self.directory.glob(f"{ACTIVE_PREFIX}*{PENDING_SUFFIX}")):
+                owner = segment.name[len(ACTIVE_PREFIX):].split('-', 1)[0]
+                if owner.isdigit() and int(owner) != os.getpid():
+                    if _pid_alive(int(owner)):
+                        continue
+                    segment = self._claim(segment)
+                    if segment is None:
+                        continue
+                applied += self._apply_segment(segment)
+        return applied
+
+    def _claim(self, path):
+        """
+        Rename a dead process's file to a segment owned by this process, so
+        workers replaying at the same time never apply it twice. Returns None
+        if another worker claimed it first.
+        """
+        claimed = path.with_name(f"{ACTIVE_PREFIX}{os.getpid()}-{time.time_ns()}-{uuid.uuid4().hex[:8]}{PENDING_SUFFIX}")
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+
+_journal = None
+_journal_lock = threading.Lock()
+_replay_started = False
+
+
+def get_journal():
+    """Process-wide journal; replays leftovers from a previous run on first use."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                journal = ScanJournal(
+                    getattr(settings, 'ATTENDANCE_JOURNAL_DIR', settings.BASE_DIR / 'journal'),
+                    batch_size=getattr(settings, 'ATTENDANCE_JOURNAL_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'ATTENDANCE_JOURNAL_FLUSH_INTERVAL', 1.0),
+                )
+                if getattr(settings, 'ATTENDANCE_JOURNAL_REPLAY_ON_START', True):
+                    try:
+                        journal.replay()
+                    except Exception:
+                        logger.exception("Error replaying scan journal")
+                atexit.register(journal.flush)
+                _journal = journal
+    return _journal
+
+
+def replay_in_background():
+    """Replay leftovers of a previous run right after start-up, once per process."""
+    global _replay_started
+    with _journal_lock:
+        if _replay_started or not getattr(settings, 'ATTENDANCE_JOURNAL_REPLAY_ON_START', True):
+            return
+        _replay_started = True
+    threading.Thread(target=_replay_at_start, name='scan-journal-replay', daemon=True).start()
+
+
+def _replay_at_start():
+    try:
+        get_journal()
+    finally:
+        close_old_connections()
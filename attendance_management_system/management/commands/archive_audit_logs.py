@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from attendance_management_system.audit import archive_before
+from attendance_management_system.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = "Move audit log rows older than the retention period into compressed archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', 180),
+                            help="Keep this many days of audit logs in the database.")
+        parser.add_argument('--dir', default=str(getattr(settings, 'AUDIT_LOG_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'audit_logs')),
+                            help="Directory for the .jsonl.gz archive files.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = AuditLog.objects.filter(timestamp__lt=cutoff).count()
+            self.stdout.write(f"{count} audit log row(s) older than {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+        archived, files = archive_before(cutoff, options['dir'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} audit log row(s) into {files} file(s) in {options['dir']}."))
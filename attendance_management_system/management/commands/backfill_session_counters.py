@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from attendance_management_system.models import AttendanceSession, Student
+from attendance_management_system.services import recount_present
+
+
+class Command(BaseCommand):
+    help = "Fill AttendanceSession.present_count from the records and roster_size for sessions without a snapshot."
+
+    def handle(self, *args, **options):
+        counted = recount_present()
+        # Sessions from before roster snapshots existed: best available figure is the batch's current size
+        batch_size = Student.objects.filter(batch=OuterRef('batch')).order_by().values('batch').annotate(n=Count('id')).values('n')
+        sized = AttendanceSession.objects.filter(roster_size=0).update(roster_size=Coalesce(Subquery(batch_size), Value(0)))
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted present_count for {counted} session(s); set roster_size for {sized} session(s) without a snapshot."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from attendance_management_system.exports import purge_expired, reap_stale
+
+
+class Command(BaseCommand):
+    help = "Delete export artifacts that are past EXPORT_ARTIFACT_TTL and fail jobs that stopped making progress."
+
+    def handle(self, *args, **options):
+        purged = purge_expired()
+        reaped = reap_stale()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired export(s); failed {reaped} stalled export(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from attendance_management_system.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recreate the daily attendance rollup used by the dashboard charts from the attendance records."
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily attendance rollup ({rows} row(s))."))
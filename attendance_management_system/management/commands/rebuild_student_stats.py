@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from attendance_management_system.models import Student
+from attendance_management_system.student_stats import refresh
+
+
+class Command(BaseCommand):
+    help = "Recompute every student's stats row (streak, totals, eligible sessions), creating missing ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Students recomputed per round of queries.")
+
+    def handle(self, *args, **options):
+        student_pks = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        for i in range(0, len(student_pks), options['chunk_size']):
+            refresh(*student_pks[i:i + options['chunk_size']])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {len(student_pks)} student(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from attendance_management_system.journal import get_journal
+
+
+class Command(BaseCommand):
+    help = "Apply scan journal segments left behind by stopped or crashed workers."
+
+    def handle(self, *args, **options):
+        applied = get_journal().replay()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {applied} journaled scan(s)."))
@@ -0,0 +1,405 @@
+"""
+In-process metrics served in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in this process's memory, so recording one
+is a dict update under a lock. When ``METRICS_DIR`` is set (it is off by
+default), every worker process also writes its values to
+``metrics-<pid>-<start>.json`` there each ``METRICS_FLUSH_INTERVAL`` seconds and
+at exit; ``render()`` adds those files to its own live values, so whichever
+worker answers a scrape reports the whole deployment. A file's worker counts as
+alive only while its PID runs with the same process start time, since
+containers reuse PIDs. Counters and histograms of exited workers keep counting,
+their gauges do not: a scrape folds their files into ``metrics-compacted.json``
+and deletes them. Empty the directory when deploying (as with
+prometheus_client's multiprocess mode).
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import audit
+
+try:
+    import fcntl
+except ImportError:  # Windows: dead workers' files are summed but never compacted
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FILE_PREFIX = 'metrics-'
+COMPACTED = f"{FILE_PREFIX}compacted.json"
+
+_lock = threading.Lock()
+_metrics = {}  # name -> metric, in declaration order
+_started = time.time_ns()
+_flusher = None
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values tuple -> value
+        _metrics[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+        _ensure_flusher()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_flusher()
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[slot] += 1
+            counts[-1] += value
+        _ensure_flusher()
+
+
+REQUEST_LATENCY = Histogram(
+    'ams_request_duration_seconds', 'Time taken to produce a response, by view.', ('view',),
+    buckets=getattr(settings, 'METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS),
+)
+SCAN_OUTCOMES = Counter('ams_scan_outcomes_total', 'QR scans handled by mark_attendance, by outcome.', ('outcome',))
+CACHE_LOOKUPS = Counter('ams_cache_lookups_total', 'Cache lookups by cache and result (hit or miss).', ('cache', 'result'))
+CACHE_HIT_RATIO = Gauge('ams_cache_hit_ratio', 'Share of cache lookups that hit, across all workers.', ('cache',))
+AUDIT_LOG_EVENTS = Counter('ams_audit_log_events_total', 'Buffered audit log entries by event.', ('event',))
+AUDIT_LOG_PENDING = Gauge('ams_audit_log_pending', 'Audit log entries waiting to be written.')
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _collect():
+    """Copy counters kept by other modules into the registry."""
+    for event, value in audit.stats().items():
+        if event == 'pending':
+            AUDIT_LOG_PENDING.set(value)
+        elif event != 'high_water':
+            AUDIT_LOG_EVENTS.set(value, event=event)
+
+
+def _local():
+    _collect()
+    with _lock:
+        return {
+            name: [[list(key), list(value) if isinstance(value, list) else value] for key, value in metric._values.items()]
+            for name, metric in _metrics.items()
+        }
+
+
+# --- Sharing across worker processes ---
+
+def _directory():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def _own_path(directory):
+    return directory / f"{FILE_PREFIX}{os.getpid()}-{_started}.json"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_start(pid):
+    """When the process started, in clock ticks since boot (Linux), or None where /proc is unavailable."""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # starttime is field 22; counting resumes after the parenthesised command name at field 3
+    return int(stat.rsplit(b')', 1)[1].split()[19])
+
+
+def _alive(data):
+    return _pid_alive(data['pid']) and _process_start(data['pid']) == data.get('start')
+
+
+_start = _process_start(os.getpid())
+
+
+def _write(path, data):
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None  # deleted while listing (files are replaced atomically, never half-written)
+
+
+def flush():
+    """Write this process's values to METRICS_DIR (a no-op when it is not set)."""
+    directory = _directory()
+    if directory is None:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    _write(_own_path(directory), {'pid': os.getpid(), 'start': _start, 'metrics': _local()})
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None or not getattr(settings, 'METRICS_DIR', None):
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_run, name='metrics-flusher', daemon=True)
+        _flusher.start()
+
+
+def _run():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0))
+        try:
+            flush()
+        except Exception:
+            logger.exception("Error writing metrics")
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Error writing metrics")
+
+
+def _after_fork():
+    # A forked worker starts from zero under its own file; the parent keeps reporting its own values
+    global _lock, _started, _start, _flusher
+    _lock = threading.Lock()
+    _started = time.time_ns()
+    _start = _process_start(os.getpid())
+    _flusher = None
+    for metric in _metrics.values():
+        metric._values = {}
+
+
+atexit.register(_flush_at_exit)
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _snapshots():
+    """
+    (path, live, values) for this process (path None), the compacted file and
+    every other worker's file. Worker files already folded into the compacted
+    one come back empty, still to be deleted.
+    """
+    snapshots = [(None, True, _local())]
+    directory = _directory()
+    if directory is None or not directory.is_dir():
+        return snapshots
+    own = _own_path(directory)
+    workers = []
+    for path in directory.glob(f"{FILE_PREFIX}*.json"):
+        if path != own and path.name != COMPACTED:
+            data = _read(path)
+            if data is not None:
+                workers.append((path, data))
+    # Read after the worker files: a file compacted meanwhile is then listed as merged here
+    compacted = _read(directory / COMPACTED) or {'merged': [], 'metrics': {}}
+    merged = set(compacted['merged'])
+    snapshots.append((directory / COMPACTED, False, compacted['metrics']))
+    for path, data in workers:
+        snapshots.append((path, _alive(data), {} if path.name in merged else data['metrics']))
+    return snapshots
+
+
+def _merge(totals, metric, rows):
+    for labels, value in rows:
+        key = tuple(labels)
+        if metric.kind == 'histogram':
+            if len(value) != len(metric.buckets) + 2:
+                continue  # written with different METRICS_LATENCY_BUCKETS
+            current = totals.setdefault(key, [0] * (len(value) - 1) + [0.0])
+            for i, v in enumerate(value):
+                current[i] += v
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _compact(directory, dead):
+    """Fold the counters and histograms of exited workers' files into COMPACTED, then delete those files."""
+    if fcntl is None:
+        return
+    with open(directory / f"{FILE_PREFIX}compact.lock", 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return  # another worker is compacting
+        compacted = _read(directory / COMPACTED) or {'merged': [], 'metrics': {}}
+        merged = set(compacted['merged'])
+        totals = {name: {tuple(labels): value for labels, value in rows} for name, rows in compacted['metrics'].items()}
+        for path, snapshot in dead:
+            if path.name in merged:
+                continue
+            for name, rows in snapshot.items():
+                metric = _metrics.get(name)
+                if metric is not None and metric.kind != 'gauge':
+                    _merge(totals.setdefault(name, {}), metric, rows)
+            merged.add(path.name)
+        # Names are kept until their file is gone, so a crash before the unlinks cannot count a file twice
+        _write(directory / COMPACTED, {
+            'merged': sorted(name for name in merged if (directory / name).exists()),
+            'metrics': {name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()},
+        })
+        for path, _ in dead:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """Values of every metric summed across worker processes: {name: {label values: value}}."""
+    totals = {name: {} for name in _metrics}
+    dead = []
+    for path, live, snapshot in _snapshots():
+        if not live and path is not None and path.name != COMPACTED:
+            dead.append((path, snapshot))
+        for name, rows in snapshot.items():
+            metric = _metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not live):
+                continue
+            _merge(totals[name], metric, rows)
+    if dead:
+        try:
+            _compact(_directory(), dead)
+        except OSError:
+            logger.exception("Error compacting metrics")
+
+    lookups = {}
+    for (cache, result), value in totals[CACHE_LOOKUPS.name].items():
+        lookups.setdefault(cache, {'hit': 0, 'miss': 0})[result] = value
+    totals[CACHE_HIT_RATIO.name] = {
+        (cache,): counts['hit'] / (counts['hit'] + counts['miss'])
+        for cache, counts in lookups.items() if counts['hit'] + counts['miss']
+    }
+    return totals
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, values in collect().items():
+        metric = _metrics[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if metric.kind != 'histogram':
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float('inf'),), value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, key, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for metric in _metrics.values():
+            metric._values = {}
+
+
+class MetricsMiddleware:
+    """Records how long each resolved view took to return its response."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        _observe(request, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        _observe(request, time.perf_counter() - start)
+        return response
+
+
+def _observe(request, seconds):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.view_name:
+        REQUEST_LATENCY.observe(seconds, view=match.view_name)
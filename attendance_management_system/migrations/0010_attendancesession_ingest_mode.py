@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0009_attendancesession_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesession',
+            name='ingest_mode',
+            field=models.CharField(choices=[('sync', 'Synchronous'), ('journal', 'Journaled')], default='sync', max_length=10),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance_management_system', 'AttendanceRecord')
+    DailyAttendance = apps.get_model('attendance_management_system', 'DailyAttendance')
+    groups = (
+        AttendanceRecord.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'session__batch_id', 'session__subject_id', 'session__teacher_id', 'student_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    DailyAttendance.objects.bulk_create([
+        DailyAttendance(
+            day=g['day'], batch_id=g['session__batch_id'], subject_id=g['session__subject_id'],
+            teacher_id=g['session__teacher_id'], student_id=g['student_id'], count=g['n'],
+        )
+        for g in groups
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0011_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.batch')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.subject')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.teacher')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['teacher', 'day'], name='dailyatt_teacher_day_idx'), models.Index(fields=['student', 'day'], name='dailyatt_student_day_idx')],
+                'unique_together': {('day', 'batch', 'subject', 'teacher', 'student')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0013_session_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStats',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='attendance_management_system.student')),
+                ('last_attended', models.DateField(blank=True, null=True)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('total_present', models.PositiveIntegerField(default=0)),
+                ('eligible_sessions', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_roster_size(apps, schema_editor):
+    # Sessions created without a roster snapshot: best available figure is the batch's current size
+    AttendanceSession = apps.get_model('attendance_management_system', 'AttendanceSession')
+    Student = apps.get_model('attendance_management_system', 'Student')
+    batch_size = Student.objects.filter(batch=OuterRef('batch')).order_by().values('batch').annotate(n=Count('id')).values('n')
+    AttendanceSession.objects.filter(roster_size=0).update(roster_size=Coalesce(Subquery(batch_size), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0019_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_roster_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count
+
+# Copied from student_stats as it stood at this migration, so later changes there do not alter it
+STREAK_GAP_DAYS = 2
+
+
+def _streak(days):
+    if not days:
+        return None, 0
+    run = 1
+    for newer, older in zip(days, days[1:]):
+        if (newer - older).days > STREAK_GAP_DAYS:
+            break
+        run += 1
+    return days[0], run
+
+
+def create_missing_stats(apps, schema_editor):
+    # Rows used to be created on a student's first scan; create them all up front
+    Student = apps.get_model('attendance_management_system', 'Student')
+    StudentStats = apps.get_model('attendance_management_system', 'StudentStats')
+    AttendanceRecord = apps.get_model('attendance_management_system', 'AttendanceRecord')
+    AttendanceSession = apps.get_model('attendance_management_system', 'AttendanceSession')
+    DailyAttendance = apps.get_model('attendance_management_system', 'DailyAttendance')
+
+    students = dict(Student.objects.filter(stats__isnull=True).values_list('pk', 'batch_id'))
+    eligible = dict(
+        AttendanceSession.objects.filter(is_active=False).order_by()
+        .values('batch_id').annotate(n=Count('id')).values_list('batch_id', 'n')
+    )
+    pks = list(students)
+    for i in range(0, len(pks), 500):
+        chunk = pks[i:i + 500]
+        days = {pk: [] for pk in chunk}
+        for student_pk, day in (
+            DailyAttendance.objects.filter(student_id__in=chunk)
+            .order_by('student_id', '-day').values_list('student_id', 'day').distinct()
+        ):
+            days[student_pk].append(day)
+        totals = dict(
+            AttendanceRecord.objects.filter(student_id__in=chunk).order_by()
+            .values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+        )
+        rows = []
+        for student_pk in chunk:
+            last_attended, streak = _streak(days[student_pk])
+            rows.append(StudentStats(
+                student_id=student_pk, last_attended=last_attended, current_streak=streak,
+                total_present=totals.get(student_pk, 0),
+                eligible_sessions=eligible.get(students[student_pk], 0) if students[student_pk] else 0,
+            ))
+        StudentStats.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0020_backfill_roster_size'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_stats, migrations.RunPython.noop),
+    ]
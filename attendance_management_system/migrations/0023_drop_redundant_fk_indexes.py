@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance_management_system', '0022_exportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='records', to='attendance_management_system.attendancesession'),
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='attendance_management_system.student'),
+        ),
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='batch',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.batch'),
+        ),
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='attendance_management_system.teacher'),
+        ),
+    ]
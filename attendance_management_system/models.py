@@ -41,10 +41,17 @@ class Teacher(models.Model):
         return self.user.get_full_name()
 
 class AttendanceSession(models.Model):
+    # Sync writes each scan straight to the DB; journal acks once the scan is
+    # appended to the local journal and a background flusher batches the inserts.
+    INGEST_SYNC = 'sync'
+    INGEST_JOURNAL = 'journal'
+    INGEST_MODE_CHOICES = [(INGEST_SYNC, 'Synchronous'), (INGEST_JOURNAL, 'Journaled')]
+
     session_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
-    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    # teacher and batch lead composite indexes below, which serve their lookups too
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, db_index=False)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
-    batch = models.ForeignKey(Batch, on_delete=models.CASCADE)
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, db_index=False)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -53,28 +60,141 @@ class AttendanceSession(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     radius = models.FloatField(default=100.0) # in meters
+    ingest_mode = models.CharField(max_length=10, choices=INGEST_MODE_CHOICES, default=INGEST_SYNC)
+
+    # Counters for rate reports: roster size captured with the roster snapshot,
+    # present_count updated in the same write path as the records (services.py)
+    roster_size = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['batch', 'subject'], name='session_batch_subject_idx'),
+            # manage_attendance pages through sessions newest first
+            models.Index(fields=['-start_time', '-id'], name='session_start_id_idx'),
+            # Teacher dashboard: a teacher's active / recent ended sessions
+            models.Index(fields=['teacher', 'is_active', '-start_time'], name='session_teacher_active_idx'),
+            # Completed-session counts per batch (student stats, rosters)
+            models.Index(fields=['batch', 'is_active'], name='session_batch_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.subject.name} - {self.batch.name} ({self.start_time.strftime('%Y-%m-%d %H:%M')})"
 
 class AttendanceRecord(models.Model):
-    session = models.ForeignKey(AttendanceSession, on_delete=models.CASCADE, related_name='records')
-    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Both lead composite indexes below; single-column ones would only slow every insert
+    session = models.ForeignKey(AttendanceSession, on_delete=models.CASCADE, related_name='records', db_index=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records', db_index=False)
+    # A default rather than auto_now_add, so journal replays can keep the time of the scan
+    timestamp = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=10, default='Present') # Present, Absent (if needed later)
 
     class Meta:
         unique_together = ('session', 'student')
+        indexes = [
+            # The admin report walks (timestamp, id) newest first; batch/subject
+            # filters resolve sessions first and range-scan each one's records
+            models.Index(fields=['-timestamp', '-id'], name='attrec_ts_id_idx'),
+            models.Index(fields=['session', '-timestamp'], name='attrec_session_ts_idx'),
+            # Student history and stats, newest first
+            models.Index(fields=['student', '-timestamp', '-id'], name='attrec_student_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} - {self.session}"
 
+class DailyAttendance(models.Model):
+    """
+    Rollup of AttendanceRecord counts per local day, maintained by rollup.py on
+    every insert/delete so the dashboard charts never scan the records table.
+    """
+    day = models.DateField()
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'batch', 'subject', 'teacher', 'student')
+        indexes = [
+            models.Index(fields=['teacher', 'day'], name='dailyatt_teacher_day_idx'),
+            models.Index(fields=['student', 'day'], name='dailyatt_student_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.subject} - {self.student}: {self.count}"
+
+class StudentStats(models.Model):
+    """
+    Running attendance totals for one student, kept current by student_stats.py so
+    the student dashboard renders from a single row.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    last_attended = models.DateField(null=True, blank=True)
+    # Length of the run of attended days ending at last_attended (gaps of one day allowed)
+    current_streak = models.PositiveIntegerField(default=0)
+    total_present = models.PositiveIntegerField(default=0)
+    # Completed sessions of the student's batch
+    eligible_sessions = models.PositiveIntegerField(default=0)
+
+    def streak_on(self, day):
+        """Streak as shown on `day`: it lapses once the last attended day is older than yesterday."""
+        if self.last_attended is None or (day - self.last_attended).days > 1:
+            return 0
+        return self.current_streak
+
+    def __str__(self):
+        return f"{self.student}: {self.total_present}/{self.eligible_sessions}"
+
+class ExportJob(models.Model):
+    """A background export (see exports.py); the artifact lives under MEDIA_ROOT until it expires."""
+    QUEUED, RUNNING, DONE, FAILED, EXPIRED = 'queued', 'running', 'done', 'failed', 'expired'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'), (EXPIRED, 'Expired')]
+    CSV, SNAPSHOT = 'csv', 'npz'
+    FORMAT_CHOICES = [(CSV, 'CSV (gzip)'), (SNAPSHOT, 'Columnar snapshot (.npz)')]
+
+    job_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    filters = models.JSONField(default=dict)
+    format = models.CharField(max_length=5, choices=FORMAT_CHOICES, default=CSV)
+    # sha256 of the format and normalised filters; identical live requests share one job
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    total_parts = models.PositiveIntegerField(default=0)
+    done_parts = models.PositiveIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    artifact = models.CharField(max_length=255, blank=True)  # path relative to MEDIA_ROOT
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched while the job runs; a queued or running job that stops beating is abandoned
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 100
+        return int(self.done_parts * 100 / self.total_parts) if self.total_parts else 0
+
+    def __str__(self):
+        return f"Export {self.job_id} ({self.status})"
+
 class AuditLog(models.Model):
     action = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     details = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the explorer walks (timestamp, id) newest first
+            models.Index(fields=['-timestamp', '-id'], name='auditlog_ts_id_idx'),
+            models.Index(fields=['action', '-timestamp'], name='auditlog_action_ts_idx'),
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.action} by {self.user} at {self.timestamp}"
 
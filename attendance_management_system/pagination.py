@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+Pages are addressed by the (timestamp, id) of the last row shown instead of an
+OFFSET, so every page is an index range scan no matter how deep the reader goes
+and rows inserted meanwhile do not shift the page boundaries.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(moment, pk):
+    micros = (moment - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{pk}"
+
+
+def decode_cursor(cursor):
+    """(datetime, pk) for a cursor string, or None if missing or malformed."""
+    try:
+        micros, pk = cursor.split('-', 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(queryset, cursor, page_size, field='timestamp'):
+    """
+    One page of `queryset` ordered by (field, id) descending, starting after `cursor`.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    position = decode_cursor(cursor)
+    if position is not None:
+        moment, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'id__lt': pk}))
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    last = rows[page_size - 1]
+    return rows[:page_size], encode_cursor(getattr(last, field), last.pk)
+
+
+def day_bounds(start=None, end=None):
+    """
+    Half-open [start, end + 1 day) datetimes in the current timezone for two
+    'YYYY-MM-DD' strings, so a date filter stays a range on the indexed column
+    instead of a per-row date conversion. Missing or invalid ends are None.
+    """
+    def midnight(value, days=0):
+        try:
+            day = parse_date(value or '')
+        except ValueError:
+            day = None
+        if day is None:
+            return None
+        return timezone.make_aware(datetime.combine(day + timedelta(days=days), datetime.min.time()))
+
+    return midnight(start), midnight(end, days=1)
@@ -0,0 +1,74 @@
+"""
+In-process publish/subscribe used by the session push stream.
+
+Stands in for an external broker: publishers (views, the journal flusher) may run
+in any thread, and each subscriber owns an asyncio queue bound to its event loop.
+Only subscribers in the same process see a message, so streams also reconcile
+against the database on a timer.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    def __init__(self, topic, maxsize=100):
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def _deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Subscriber is behind; it catches up from the database on its next reconcile
+            pass
+
+    async def get(self, timeout):
+        """Next message, or raise asyncio.TimeoutError after timeout seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, maxsize=100):
+        """Must be called from inside the subscriber's event loop."""
+        subscription = Subscription(topic, maxsize)
+        with self._lock:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def publish(self, topic, message=None):
+        """Thread-safe; returns the number of local subscribers notified."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+            except RuntimeError:
+                # Event loop already closed; the stream is going away
+                pass
+        return len(subscribers)
+
+
+broker = Broker()
+
+
+def session_topic(session_pk):
+    return f"session:{session_pk}"
+
+
+def notify_session_changed(session_pk):
+    """Tell live streams of a session that its attendance records changed."""
+    return broker.publish(session_topic(session_pk))
@@ -0,0 +1,87 @@
+"""
+Server-sent event stream for the teacher's session_qr page (ASGI only).
+
+One connection replaces both polling loops: a ``qr`` event is sent on every
+rotation bucket and an ``attendance`` event (same payload as the
+``?since=`` delta API) whenever records change. Changes arrive through the
+in-process broker and are reconciled against the database every
+``SSE_RECONCILE_SECONDS`` to pick up writes made by other worker processes.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+
+from .models import AttendanceRecord
+from .pubsub import broker, session_topic
+from .qr_tokens import current_bucket, issue_token, seconds_left_in_bucket
+from .session_cache import get_session_snapshot
+
+
+def sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _attendance_delta(session_pk, since):
+    records = AttendanceRecord.objects.filter(
+        session_id=session_pk, id__gt=since
+    ).select_related('student__user').order_by('id')
+    data = [
+        {'id': r.id, 'student': r.student.user.get_full_name(), 'timestamp': r.timestamp.strftime('%H:%M:%S')}
+        async for r in records
+    ]
+    agg = await AttendanceRecord.objects.filter(session_id=session_pk).aaggregate(count=Count('id'))
+    return data, agg['count']
+
+
+async def session_event_stream(session, since=0):
+    """Async iterator of SSE frames for a SessionSnapshot, starting after record id `since`."""
+    reconcile_every = getattr(settings, 'SSE_RECONCILE_SECONDS', 10)
+    coalesce = getattr(settings, 'SSE_COALESCE_SECONDS', 0.5)
+    deadline = time.monotonic() + getattr(settings, 'SSE_MAX_SECONDS', 3600)
+    get_snapshot = sync_to_async(get_session_snapshot)
+
+    subscription = broker.subscribe(session_topic(session.pk))
+    try:
+        yield f"retry: {getattr(settings, 'SSE_RETRY_MS', 3000)}\n\n"
+        last_bucket, last_count, next_reconcile = None, None, 0.0
+        changed = True
+        while time.monotonic() < deadline:
+            bucket = current_bucket()
+            if bucket != last_bucket:
+                session = await get_snapshot(session.session_id)
+                if session is None or not session.is_active:
+                    yield sse_event('end', {'status': 'ended'})
+                    return
+                yield sse_event('qr', {'qr_data': issue_token(session.session_id)})
+                last_bucket = bucket
+
+            if changed or time.monotonic() >= next_reconcile:
+                records, count = await _attendance_delta(session.pk, since)
+                if records or count != last_count:
+                    if records:
+                        since = records[-1]['id']
+                    yield sse_event('attendance', {'attendance': records, 'count': count, 'last_id': since}, event_id=since)
+                    last_count = count
+                next_reconcile = time.monotonic() + reconcile_every
+
+            try:
+                await subscription.get(timeout=seconds_left_in_bucket())
+            except asyncio.TimeoutError:
+                changed = False
+            else:
+                # Fold a burst of scans into one delta query
+                await asyncio.sleep(coalesce)
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                changed = True
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,110 @@
+"""
+Compact signed tokens for the rotating session QR code.
+
+Layout, base64url-encoded without padding (42 characters):
+
+    version (1 byte) | session UUID (16) | time bucket (4, big-endian) | truncated HMAC-SHA256 (10)
+
+Verification is a fixed-size decode, a struct unpack and one constant-time compare;
+there is no JSON to parse. Legacy ``signing.dumps`` tokens are still accepted while
+``QR_TOKEN_ACCEPT_LEGACY`` is on. Failures raise ``signing.SignatureExpired`` /
+``signing.BadSignature`` so callers handle both formats the same way.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+from django.utils.encoding import force_bytes
+
+VERSION = 1
+MAC_BYTES = 10
+KEY_SALT = b'attendance_management_system.qr_tokens'
+
+_HEADER = struct.Struct('>B16sI')
+TOKEN_BYTES = _HEADER.size + MAC_BYTES
+TOKEN_LENGTH = len(base64.urlsafe_b64encode(b'\0' * TOKEN_BYTES).rstrip(b'='))
+
+
+@lru_cache(maxsize=8)
+def _derive_key(secret):
+    return hashlib.sha256(KEY_SALT + force_bytes(secret)).digest()
+
+
+def _mac(secret, body):
+    return hmac.new(_derive_key(secret), body, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def bucket_seconds():
+    return getattr(settings, 'QR_TOKEN_BUCKET_SECONDS', 2)
+
+
+def current_bucket(now=None):
+    return int((time.time() if now is None else now) // bucket_seconds())
+
+
+def seconds_left_in_bucket(now=None):
+    now = time.time() if now is None else now
+    return bucket_seconds() - (now % bucket_seconds())
+
+
+@lru_cache(maxsize=1024)
+def _token_for_bucket(session_uuid, bucket, secret):
+    # Tokens are deterministic per (session, bucket), so every poller in this
+    # process shares one mint per rotation instead of signing per request.
+    body = _HEADER.pack(VERSION, session_uuid.bytes, bucket)
+    return base64.urlsafe_b64encode(body + _mac(secret, body)).rstrip(b'=').decode('ascii')
+
+
+def issue_token(session_uuid, now=None):
+    """Compact token for a session UUID, stamped with the current time bucket."""
+    return _token_for_bucket(session_uuid, current_bucket(now), settings.SECRET_KEY)
+
+
+def verify_token(token, max_age=None, now=None):
+    """
+    Return the session UUID carried by a QR token (compact or legacy).
+    Age is measured from the start of the token's time bucket.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'QR_TOKEN_MAX_AGE', 20)
+    if not isinstance(token, str):
+        raise signing.BadSignature('Invalid token')
+    if len(token) == TOKEN_LENGTH:
+        return _verify_compact(token, max_age, now)
+    if getattr(settings, 'QR_TOKEN_ACCEPT_LEGACY', True) and ':' in token:
+        payload = signing.loads(token, max_age=max_age)
+        return uuid.UUID(payload['session_id'])
+    raise signing.BadSignature('Invalid token')
+
+
+def _verify_compact(token, max_age, now):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise signing.BadSignature('Invalid token')
+    if len(raw) != TOKEN_BYTES or raw[0] != VERSION:
+        raise signing.BadSignature('Invalid token')
+
+    body, mac = raw[:_HEADER.size], raw[_HEADER.size:]
+    for secret in [settings.SECRET_KEY, *getattr(settings, 'SECRET_KEY_FALLBACKS', [])]:
+        if hmac.compare_digest(mac, _mac(secret, body)):
+            break
+    else:
+        raise signing.BadSignature('Signature does not match')
+
+    _, uuid_bytes, bucket = _HEADER.unpack(body)
+    now = time.time() if now is None else now
+    issued_at = bucket * bucket_seconds()
+    if issued_at - now > bucket_seconds():
+        # Minted more than one bucket in the future: clock skew beyond tolerance
+        raise signing.BadSignature('Token from the future')
+    if now - issued_at > max_age:
+        raise signing.SignatureExpired(f'Token age > {max_age} seconds')
+    return uuid.UUID(bytes=uuid_bytes)
@@ -0,0 +1,159 @@
+"""
+Maintenance of the DailyAttendance rollup.
+
+Every write path that adds or removes AttendanceRecord rows keeps the rollup in
+step: ``mark_once`` and ORM saves/deletes adjust one counter, the journal
+flusher (whose ``bulk_create`` cannot report which rows were new) and cascading
+deletes of sessions or students recompute the affected groups, and ``rebuild`` recreates the whole table
+(``manage.py rebuild_attendance_rollup``).
+
+Days are local dates in the current time zone, the same as ``timestamp__date``.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AttendanceRecord, DailyAttendance
+from .pagination import day_bounds
+
+
+KEY_COLUMNS = ('day', 'batch_id', 'subject_id', 'teacher_id', 'student_id')
+
+
+def _key(session, student_pk, timestamp):
+    return {
+        'day': timezone.localdate(timestamp),
+        'batch_id': session.batch_id,
+        'subject_id': session.subject_id,
+        'teacher_id': session.teacher_id,
+        'student_id': student_pk,
+    }
+
+
+def _upsert_sql(connection):
+    """One-statement "insert or count + 1" for backends that support it, else None."""
+    qn = connection.ops.quote_name
+    table = qn(DailyAttendance._meta.db_table)
+    key = ', '.join(qn(c) for c in KEY_COLUMNS)
+    insert = f"INSERT INTO {table} ({key}, {qn('count')}) VALUES ({', '.join(['%s'] * len(KEY_COLUMNS))}, 1)"
+    if connection.vendor == 'mysql':
+        return f"{insert} ON DUPLICATE KEY UPDATE {qn('count')} = {qn('count')} + 1"
+    if connection.vendor in ('sqlite', 'postgresql'):
+        return f"{insert} ON CONFLICT ({key}) DO UPDATE SET {qn('count')} = {table}.{qn('count')} + 1"
+    return None
+
+
+def record_added(session, student_pk, timestamp):
+    """Count one new record. `session` may be a model instance or a SessionSnapshot."""
+    key = _key(session, student_pk, timestamp)
+    connection = connections[router.db_for_write(DailyAttendance)]
+    sql = _upsert_sql(connection)
+    if sql is not None:
+        params = [connection.ops.adapt_datefield_value(key['day'])] + [key[c] for c in KEY_COLUMNS[1:]]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return
+
+    if DailyAttendance.objects.filter(**key).update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            DailyAttendance.objects.create(count=1, **key)
+    except IntegrityError:
+        # Another writer created the row first
+        DailyAttendance.objects.filter(**key).update(count=F('count') + 1)
+
+
+def record_removed(session, student_pk, timestamp):
+    key = _key(session, student_pk, timestamp)
+    # Delete the last count first: decrementing first would leave a 1 for the delete to match
+    if not DailyAttendance.objects.filter(count__lte=1, **key).delete()[0]:
+        DailyAttendance.objects.filter(**key).update(count=F('count') - 1)
+
+
+def _aggregate(records):
+    return (
+        records.annotate(day=TruncDate('timestamp'))
+        .values('day', 'session__batch_id', 'session__subject_id', 'session__teacher_id', 'student_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+
+
+def _rows(groups):
+    for g in groups:
+        yield DailyAttendance(
+            day=g['day'], batch_id=g['session__batch_id'], subject_id=g['session__subject_id'],
+            teacher_id=g['session__teacher_id'], student_id=g['student_id'], count=g['n'],
+        )
+
+
+def refresh_groups(groups):
+    """Recompute the rollup rows of the given (day, batch_id, subject_id, teacher_id) groups."""
+    for day, batch_id, subject_id, teacher_id in groups:
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        group = {'batch_id': batch_id, 'subject_id': subject_id, 'teacher_id': teacher_id}
+        records = AttendanceRecord.objects.filter(
+            session__batch_id=batch_id, session__subject_id=subject_id, session__teacher_id=teacher_id,
+            timestamp__gte=start, timestamp__lt=start + timedelta(days=1),
+        )
+        with transaction.atomic():
+            DailyAttendance.objects.filter(day=day, **group).delete()
+            DailyAttendance.objects.bulk_create(_rows(_aggregate(records)))
+
+
+def refresh_sessions(session_pks):
+    """Recompute the rollup rows for every (day, batch, subject, teacher) group these sessions have records in."""
+    touched = (
+        AttendanceRecord.objects.filter(session_id__in=session_pks)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('day', 'session__batch_id', 'session__subject_id', 'session__teacher_id')
+        .distinct()
+    )
+    refresh_groups(list(touched))
+
+
+def rebuild(batch_size=1000):
+    """Recreate the whole rollup from AttendanceRecord. Returns the number of rollup rows."""
+    with transaction.atomic():
+        DailyAttendance.objects.all().delete()
+        created = DailyAttendance.objects.bulk_create(_rows(_aggregate(AttendanceRecord.objects.all())), batch_size=batch_size)
+    return len(created)
+
+
+def daily_counts(days=7, **filters):
+    """
+    (labels, counts) for the last `days` local days ending today, from one query.
+    `filters` narrow the rollup, e.g. teacher=..., student=...
+    """
+    today = timezone.localdate()
+    window = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+    totals = dict(
+        DailyAttendance.objects.filter(day__gte=window[0], day__lte=today, **filters)
+        .values('day').annotate(n=Sum('count')).order_by().values_list('day', 'n')
+    )
+    return [day.strftime('%a') for day in window], [totals.get(day, 0) for day in window]
+
+
+def record_count(params):
+    """
+    Number of records matching the report filters (batch, subject, date or
+    start/end), summed from the rollup instead of counting record rows.
+    Rollup rows keep the batch and subject a session had when its records were
+    marked, so after a session is edited this is approximate until
+    ``rebuild_attendance_rollup`` runs.
+    """
+    rows = DailyAttendance.objects.all()
+    if params.get('batch'):
+        rows = rows.filter(batch_id=params['batch'])
+    if params.get('subject'):
+        rows = rows.filter(subject_id=params['subject'])
+    for start, end in (day_bounds(params.get('date'), params.get('date')), day_bounds(params.get('start'), params.get('end'))):
+        if start:
+            rows = rows.filter(day__gte=timezone.localdate(start))
+        if end:
+            rows = rows.filter(day__lt=timezone.localdate(end))
+    return rows.aggregate(n=Sum('count'))['n'] or 0
@@ -0,0 +1,168 @@
+"""
+Per-session roster snapshots held in Django's cache.
+
+When a session opens, the ids (plus name/roll number for rendering) of every
+student in its batch are captured, so scans and the manual attendance page can
+check eligibility in memory. A present-set is kept alongside as one cache key per
+(session, student) so marking and unmarking are single atomic cache operations.
+The present-set is a hint: a missing key falls back to the database.
+
+Each capture gets a version token, stored under its own small key. Workers keep
+the rosters they have decoded, so a scan reads only the token unless the roster
+was recaptured since.
+"""
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .models import AttendanceSession, Student
+from .session_cache import cache_is_process_local
+
+ROSTER_PREFIX = 'ams:roster:v2:'
+PRESENT_PREFIX = 'ams:present:v1:'
+LOCAL_ROSTERS = 256
+
+_decoded = OrderedDict()  # session pk -> (version, Roster), most recently used last
+_decoded_lock = threading.Lock()
+
+
+class RosterEntry(namedtuple('RosterEntry', 'pk full_name roll_number')):
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return self.pk
+
+
+class Roster:
+    def __init__(self, entries):
+        self.entries = {e.pk: e for e in entries}
+        self.student_ids = frozenset(self.entries)
+
+    def __contains__(self, student_pk):
+        return student_pk in self.student_ids
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def get(self, student_pk):
+        return self.entries.get(student_pk)
+
+    def absent(self, present_ids):
+        """Roster entries not in present_ids."""
+        return [e for pk, e in self.entries.items() if pk not in present_ids]
+
+
+def _timeout():
+    timeout = getattr(settings, 'ROSTER_CACHE_TIMEOUT', 12 * 60 * 60)
+    if cache_is_process_local():
+        # Recaptures and unmarks only reach this worker's copy (see checks.py)
+        timeout = min(timeout, getattr(settings, 'ROSTER_CACHE_LOCAL_TIMEOUT', 30))
+    return timeout
+
+
+def _roster_key(session_pk):
+    return f"{ROSTER_PREFIX}{session_pk}"
+
+
+def _version_key(session_pk):
+    return f"{ROSTER_PREFIX}version:{session_pk}"
+
+
+def _present_key(session_pk, student_pk):
+    return f"{PRESENT_PREFIX}{session_pk}:{student_pk}"
+
+
+def snapshot_roster(session_pk, batch_id):
+    """Capture (or recapture) the roster of a session's batch."""
+    rows = Student.objects.filter(batch_id=batch_id).order_by('id').values_list(
+        'id', 'user__first_name', 'user__last_name', 'roll_number'
+    )
+    entries = [RosterEntry(pk, f"{first} {last}".strip(), roll) for pk, first, last, roll in rows]
+    version = uuid.uuid4().hex
+    cache.set_many({_roster_key(session_pk): (version, entries), _version_key(session_pk): version}, _timeout())
+    return _remember(session_pk, version, entries)
+
+
+def _remember(session_pk, version, entries):
+    roster = Roster(entries)
+    with _decoded_lock:
+        _decoded[session_pk] = (version, roster)
+        _decoded.move_to_end(session_pk)
+        while len(_decoded) > LOCAL_ROSTERS:
+            _decoded.popitem(last=False)
+    return roster
+
+
+def _recall(session_pk, version):
+    with _decoded_lock:
+        decoded = _decoded.get(session_pk)
+    if version is not None and decoded is not None and decoded[0] == version:
+        return decoded[1]
+    return None
+
+
+def _decode(session_pk, version, cached):
+    if cached is None or cached[0] != version:
+        return None
+    return _remember(session_pk, version, cached[1])
+
+
+def get_roster(session):
+    """Roster for a session (model or SessionSnapshot), rebuilt if it fell out of the cache."""
+    version = cache.get(_version_key(session.pk))
+    roster = _recall(session.pk, version)
+    if roster is None and version is not None:
+        roster = _decode(session.pk, version, cache.get(_roster_key(session.pk)))
+    metrics.cache_lookup('roster', roster is not None)
+    if roster is None:
+        return snapshot_roster(session.pk, session.batch_id)
+    return roster
+
+
+async def aget_roster(session):
+    version = await cache.aget(_version_key(session.pk))
+    roster = _recall(session.pk, version)
+    if roster is None and version is not None:
+        roster = _decode(session.pk, version, await cache.aget(_roster_key(session.pk)))
+    metrics.cache_lookup('roster', roster is not None)
+    if roster is None:
+        return await sync_to_async(snapshot_roster)(session.pk, session.batch_id)
+    return roster
+
+
+def refresh_rosters(*batch_ids):
+    """Recapture rosters (and roster_size) of the active sessions in the given batches."""
+    batch_ids = [b for b in batch_ids if b is not None]
+    if not batch_ids:
+        return
+    for session_pk, batch_id in AttendanceSession.objects.filter(
+        batch_id__in=batch_ids, is_active=True
+    ).values_list('pk', 'batch_id'):
+        roster = snapshot_roster(session_pk, batch_id)
+        AttendanceSession.objects.filter(pk=session_pk).update(roster_size=len(roster))
+
+
+def is_present(session_pk, student_pk):
+    return cache.get(_present_key(session_pk, student_pk)) is not None
+
+
+def mark_present(session_pk, student_pk):
+    cache.set(_present_key(session_pk, student_pk), 1, _timeout())
+
+
+def unmark_present(session_pk, student_pk):
+    cache.delete(_present_key(session_pk, student_pk))
+
+
+async def ais_present(session_pk, student_pk):
+    return await cache.aget(_present_key(session_pk, student_pk)) is not None
+
+
+async def amark_present(session_pk, student_pk):
+    await cache.aset(_present_key(session_pk, student_pk), 1, _timeout())
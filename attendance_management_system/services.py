@@ -0,0 +1,65 @@
+"""
+Write-side helpers shared by the attendance views.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce
+from django.db.models.sql import InsertQuery
+
+from .models import AttendanceRecord, AttendanceSession
+from .pubsub import notify_session_changed
+from . import student_stats
+from .rollup import record_added
+
+
+def mark_once(session, student, status='Present'):
+    """
+    Mark a student present for a session with a single conditional INSERT.
+
+    Uses INSERT IGNORE / INSERT OR IGNORE / ON CONFLICT DO NOTHING (per backend)
+    against the ('session', 'student') unique key, so concurrent scans never raise
+    IntegrityError. `session` needs pk, batch_id, subject_id and teacher_id.
+    The session's present_count, the daily rollup and the student's stats are
+    updated in the same transaction, so a failure leaves neither the record nor
+    its counters behind. Returns True if a row was inserted, False if already marked.
+    """
+    # Only primary keys are needed, so cached session snapshots work here too
+    record = AttendanceRecord(session_id=session.pk, student_id=student.pk, status=status)
+    using = router.db_for_write(AttendanceRecord)
+    fields = [f for f in AttendanceRecord._meta.concrete_fields if not f.primary_key]
+
+    query = InsertQuery(AttendanceRecord, on_conflict=OnConflict.IGNORE)
+    query.insert_values(fields, [record])
+
+    inserted = 0
+    # No savepoint: inside a caller's transaction a failure should abort that too
+    with transaction.atomic(using=using, savepoint=False):
+        with connections[using].cursor() as cursor:
+            for sql, params in query.get_compiler(using=using).as_sql():
+                cursor.execute(sql, params)
+                inserted += cursor.rowcount
+        if inserted:
+            # Raw inserts skip post_save, so keep the daily rollup in step here
+            record_added(session, student.pk, record.timestamp)
+            student_stats.record_added(student.pk, record.timestamp)
+            adjust_present_count(session.pk, 1)
+            transaction.on_commit(lambda: notify_session_changed(session.pk), using=using)
+    return inserted > 0
+
+
+def adjust_present_count(session_pk, delta):
+    """Atomically add delta to a session's present_count (never below zero)."""
+    sessions = AttendanceSession.objects.filter(pk=session_pk)
+    if delta < 0:
+        sessions = sessions.filter(present_count__gte=-delta)
+    sessions.update(present_count=F('present_count') + delta)
+
+
+def recount_present(session_pks=None):
+    """Reset present_count from the records in one UPDATE (all sessions if session_pks is None)."""
+    sessions = AttendanceSession.objects.all()
+    if session_pks is not None:
+        sessions = sessions.filter(pk__in=session_pks)
+    counts = AttendanceRecord.objects.filter(session=OuterRef('pk')).order_by().values('session').annotate(n=Count('id')).values('n')
+    return sessions.update(present_count=Coalesce(Subquery(counts), Value(0)))
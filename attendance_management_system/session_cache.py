@@ -0,0 +1,160 @@
+"""
+Cache of the fields of an AttendanceSession needed on the scan / QR hot paths,
+keyed by session UUID and shared across workers through Django's cache framework.
+
+Entries are retired by the signal handlers in ``signals.py`` whenever the session
+(or its subject) is saved, which covers ending a session from ``session_qr`` and
+edits made in the Django admin. Snapshots are stored under a per-session
+generation token, and invalidation drops the token rather than the snapshot: a
+read that fetched the row just before the session ended writes its copy under
+the old token, where no later read looks.
+"""
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+from .models import AttendanceSession
+
+KEY_PREFIX = 'ams:session:v3:'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    pk: int
+    session_id: UUID
+    teacher_id: int
+    batch_id: int
+    subject_id: int
+    subject_name: str
+    latitude: Optional[Decimal]
+    longitude: Optional[Decimal]
+    radius: float
+    is_active: bool
+    ingest_mode: str
+
+    @property
+    def id(self):
+        return self.pk
+
+    @classmethod
+    def from_session(cls, session):
+        return cls(
+            pk=session.pk,
+            session_id=session.session_id,
+            teacher_id=session.teacher_id,
+            batch_id=session.batch_id,
+            subject_id=session.subject_id,
+            subject_name=session.subject.name,
+            latitude=session.latitude,
+            longitude=session.longitude,
+            radius=session.radius,
+            is_active=session.is_active,
+            ingest_mode=session.ingest_mode,
+        )
+
+
+def _generation_key(session_uuid):
+    return f"{KEY_PREFIX}gen:{session_uuid}"
+
+
+def _key(session_uuid, generation):
+    return f"{KEY_PREFIX}{session_uuid}:{generation}"
+
+
+def _generation(session_uuid):
+    key = _generation_key(session_uuid)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+async def _ageneration(session_uuid):
+    key = _generation_key(session_uuid)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, uuid4().hex, None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def cache_is_process_local():
+    """True when the default cache lives in each worker's memory (LocMemCache)."""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def _timeout():
+    timeout = getattr(settings, 'SESSION_CACHE_TIMEOUT', 300)
+    if cache_is_process_local():
+        # Saves only drop this worker's copy, so other workers must refetch is_active soon
+        timeout = min(timeout, getattr(settings, 'SESSION_CACHE_LOCAL_TIMEOUT', 2))
+    return timeout
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+    metrics.cache_lookup('session', name == 'hits')
+
+
+def get_session_snapshot(session_uuid):
+    """Return the SessionSnapshot for a session UUID, or None if it does not exist."""
+    key = _key(session_uuid, _generation(session_uuid))
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        _count('hits')
+        return snapshot
+
+    _count('misses')
+    session = AttendanceSession.objects.select_related('subject').filter(session_id=session_uuid).first()
+    if session is None:
+        return None
+    snapshot = SessionSnapshot.from_session(session)
+    cache.set(key, snapshot, _timeout())
+    return snapshot
+
+
+async def aget_session_snapshot(session_uuid):
+    """Async counterpart of get_session_snapshot for async views."""
+    key = _key(session_uuid, await _ageneration(session_uuid))
+    snapshot = await cache.aget(key)
+    if snapshot is not None:
+        _count('hits')
+        return snapshot
+
+    _count('misses')
+    try:
+        session = await AttendanceSession.objects.select_related('subject').aget(session_id=session_uuid)
+    except AttendanceSession.DoesNotExist:
+        return None
+    snapshot = SessionSnapshot.from_session(session)
+    await cache.aset(key, snapshot, _timeout())
+    return snapshot
+
+
+def invalidate_session(*session_uuids):
+    cache.delete_many([_generation_key(u) for u in session_uuids])
+
+
+def stats():
+    """Hit/miss counters for this worker process."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 3) if total else 0.0}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats['hits'] = _stats['misses'] = 0
@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'attendance_management_system.metrics.MetricsMiddleware',
+    'attendance_management_system.sql_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +85,40 @@ DATABASES = {
     }
 }
 
+# Cache – locmem by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'attendance-default'),
+    }
+}
+
+# Seconds an active-session snapshot may live in the cache (dropped earlier on save).
+# With the per-process LocMemCache a save cannot reach other workers, so the
+# snapshot lives SESSION_CACHE_LOCAL_TIMEOUT seconds instead, and the system
+# checks fail when WEB_CONCURRENCY (the gunicorn/uvicorn worker count) is above 1 on LocMemCache.
+SESSION_CACHE_TIMEOUT = 300
+SESSION_CACHE_LOCAL_TIMEOUT = 2
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Seconds a session roster snapshot and present-set entries stay cached (about one teaching day);
+# ROSTER_CACHE_LOCAL_TIMEOUT applies instead on the per-process LocMemCache
+ROSTER_CACHE_TIMEOUT = 12 * 60 * 60
+ROSTER_CACHE_LOCAL_TIMEOUT = 30
+
+# Rotating QR tokens: time bucket size, max accepted age (seconds), and whether
+# the legacy signing.dumps token format is still accepted during rollout
+QR_TOKEN_BUCKET_SECONDS = 2
+QR_TOKEN_MAX_AGE = 20
+QR_TOKEN_ACCEPT_LEGACY = True
+
+# Session push stream (server-sent events, served when running under asgi.py):
+# DB reconcile interval, burst coalescing window, max stream lifetime (seconds)
+SSE_RECONCILE_SECONDS = 10
+SSE_COALESCE_SECONDS = 0.5
+SSE_MAX_SECONDS = 3600
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -135,3 +171,51 @@ AUTH_USER_MODEL = 'attendance_management_system.User'
 # Login Redirect
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
+
+# Journaled scan ingestion (sessions with ingest_mode='journal')
+ATTENDANCE_JOURNAL_DIR = BASE_DIR / 'journal'
+ATTENDANCE_JOURNAL_BATCH_SIZE = int(os.getenv('ATTENDANCE_JOURNAL_BATCH_SIZE', '200'))
+ATTENDANCE_JOURNAL_FLUSH_INTERVAL = float(os.getenv('ATTENDANCE_JOURNAL_FLUSH_INTERVAL', '1.0'))
+ATTENDANCE_JOURNAL_REPLAY_ON_START = True
+
+# Buffered audit log (see audit.py); settings_test.py writes entries inline
+AUDIT_LOG_BUFFERED = os.getenv('AUDIT_LOG_BUFFERED', '1') == '1'
+AUDIT_LOG_MAX_PENDING = int(os.getenv('AUDIT_LOG_MAX_PENDING', '10000'))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '200'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '1.0'))
+AUDIT_LOG_PUT_TIMEOUT = float(os.getenv('AUDIT_LOG_PUT_TIMEOUT', '0'))
+AUDIT_LOG_PAGE_SIZE = 50
+# Seconds the audit log's action filter list is reused; a newly written action retires it sooner
+AUDIT_ACTIONS_CACHE_TIMEOUT = 60 * 60
+ATTENDANCE_REPORT_PAGE_SIZE = 50
+MANAGE_ATTENDANCE_PAGE_SIZE = 25
+HISTORY_PAGE_SIZE = 50
+# Seconds a student's cached history page lives; new records retire it sooner
+HISTORY_CACHE_TIMEOUT = 300
+# Seconds the admin report's record total (from the daily rollup) is reused per filter set
+ATTENDANCE_REPORT_COUNT_TIMEOUT = 60
+
+# Audit log retention: `manage.py archive_audit_logs` (run daily from cron)
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv('AUDIT_LOG_RETENTION_DAYS', '180'))
+AUDIT_LOG_ARCHIVE_DIR = BASE_DIR / 'archive' / 'audit_logs'
+
+# Background CSV export jobs (see exports.py); artifacts go to MEDIA_ROOT/exports/
+EXPORT_PROCESSES = int(os.getenv('EXPORT_PROCESSES', '2'))
+EXPORT_ARTIFACT_TTL = int(os.getenv('EXPORT_ARTIFACT_TTL', str(24 * 60 * 60)))
+EXPORT_HEARTBEAT_INTERVAL = int(os.getenv('EXPORT_HEARTBEAT_INTERVAL', '30'))
+EXPORT_STALE_AFTER = int(os.getenv('EXPORT_STALE_AFTER', str(10 * 60)))
+
+# Per-request SQL budgets (see sql_budget.py). Views declare theirs with
+# @query_budget(n); SQL_BUDGETS maps url names to overrides. Over budget logs a
+# warning, or fails the request when SQL_BUDGET_STRICT is on (settings_test.py).
+SQL_BUDGETS = {}
+SQL_BUDGET_DEFAULT = int(os.getenv('SQL_BUDGET_DEFAULT', '30'))
+SQL_BUDGET_STRICT = os.getenv('SQL_BUDGET_STRICT', '0') == '1'
+SQL_BUDGET_SLOWEST = 3
+
+# Metrics at /dashboard/admin/metrics/ (see metrics.py). With several worker processes,
+# set METRICS_DIR: each writes its values there so any worker can report for all of
+# them; clear it on deploy. Unset, a scrape reports only the worker that answers it.
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5.0'))
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
@@ -0,0 +1,22 @@
+"""
+Local SQLite profile for load runs and benchmarks without a MySQL server.
+The test suite runs on settings_test.py, which builds on this profile.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_NAME', BASE_DIR / 'db.sqlite3'),
+        # IMMEDIATE so concurrent writers queue on the lock instead of failing a read-then-write upgrade
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+        # File-backed test DB so threaded tests share it and wait on write locks
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Tests create many users; the default PBKDF2 hasher dominates their runtime
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
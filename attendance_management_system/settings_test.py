@@ -0,0 +1,12 @@
+"""
+Test profile: the local SQLite profile plus the overrides the test suite relies on.
+
+    DJANGO_SETTINGS_MODULE=attendance_management_system.settings_test python manage.py test
+"""
+from .settings_sqlite import *  # noqa: F401,F403
+
+# Tests assert on AuditLog rows right after the request, so write them inline
+AUDIT_LOG_BUFFERED = False
+
+# A view over its @query_budget fails the test instead of logging a warning
+SQL_BUDGET_STRICT = True
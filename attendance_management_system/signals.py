@@ -0,0 +1,162 @@
+import threading
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceSession, Student, Subject
+from . import student_stats
+from .pubsub import notify_session_changed
+from .rollup import record_added, record_removed, refresh_groups
+from .services import adjust_present_count, recount_present
+from .roster import refresh_rosters, snapshot_roster, unmark_present
+from .session_cache import invalidate_session
+
+# Records deleted because their session or student is being deleted are set aside
+# and recounted together once the parent rows are gone, instead of ~8 queries each
+_cascade = threading.local()
+
+
+def _cascade_for(origin):
+    state = getattr(_cascade, 'state', None)
+    if state is None or state['origin'] is not origin:
+        state = _cascade.state = {'origin': origin, 'sessions': {}, 'students': set(), 'records': []}
+    return state
+
+
+def _in_cascade(instance, origin):
+    state = getattr(_cascade, 'state', None)
+    return (
+        state is not None and state['origin'] is origin
+        and (instance.session_id in state['sessions'] or instance.student_id in state['students'])
+    )
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+def drop_cached_session(sender, instance, **kwargs):
+    invalidate_session(instance.session_id)
+
+
+@receiver(post_save, sender=AttendanceSession)
+def snapshot_roster_of_new_session(sender, instance, created, raw=False, **kwargs):
+    # Whatever created it (create_session, admin, shell): the teacher rate divides by roster_size
+    if created and not raw and not instance.roster_size:
+        instance.roster_size = len(snapshot_roster(instance.pk, instance.batch_id))
+        AttendanceSession.objects.filter(pk=instance.pk).update(roster_size=instance.roster_size)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def push_attendance_change(sender, instance, origin=None, **kwargs):
+    if not _in_cascade(instance, origin):
+        notify_session_changed(instance.session_id)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def count_record_in_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_added(instance.session, instance.student_id, instance.timestamp)
+        student_stats.record_added(instance.student_id, instance.timestamp)
+        adjust_present_count(instance.session_id, 1)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def uncount_record_in_rollup(sender, instance, origin=None, **kwargs):
+    if _in_cascade(instance, origin):
+        _cascade.state['records'].append(instance)
+        return
+    session = AttendanceSession.objects.filter(pk=instance.session_id).first()
+    if session is not None:
+        record_removed(session, instance.student_id, instance.timestamp)
+        adjust_present_count(session.pk, -1)
+    student_stats.record_removed(instance.student_id)
+    # Admin deletes and cascades too, or the next scan would be told "already marked"
+    unmark_present(instance.session_id, instance.student_id)
+
+
+@receiver(post_init, sender=AttendanceSession)
+def remember_loaded_activity(sender, instance, **kwargs):
+    # __dict__ so a deferred field is not fetched just for this
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=AttendanceSession)
+def count_closed_session_for_students(sender, instance, created, **kwargs):
+    if not created and instance._loaded_is_active and instance.is_active is False:
+        student_stats.session_closed(instance.batch_id)
+    elif not created and instance._loaded_is_active is False and instance.is_active:
+        student_stats.session_closed(instance.batch_id, delta=-1)
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_delete, sender=AttendanceSession)
+def uncount_deleted_session_for_students(sender, instance, **kwargs):
+    if instance.__dict__.get('is_active') is False:
+        student_stats.session_closed(instance.batch_id, delta=-1)
+
+
+@receiver(post_save, sender=Subject)
+def drop_cached_sessions_for_subject(sender, instance, created, **kwargs):
+    # Cached snapshots carry the subject name
+    if created:
+        return
+    session_ids = list(AttendanceSession.objects.filter(subject=instance, is_active=True).values_list('session_id', flat=True))
+    if session_ids:
+        invalidate_session(*session_ids)
+
+
+@receiver(post_init, sender=Student)
+def remember_loaded_batch(sender, instance, **kwargs):
+    instance._loaded_batch_id = instance.batch_id
+
+
+@receiver(post_save, sender=Student)
+def refresh_rosters_on_batch_change(sender, instance, created, **kwargs):
+    previous = instance._loaded_batch_id
+    if created or previous != instance.batch_id:
+        refresh_rosters(previous, instance.batch_id)
+        # Created along with the student, so even the first scan is a one-row UPDATE;
+        # eligible sessions are counted per batch
+        student_stats.refresh(instance.pk, create=created)
+    instance._loaded_batch_id = instance.batch_id
+
+
+@receiver(post_delete, sender=Student)
+def refresh_rosters_on_student_delete(sender, instance, **kwargs):
+    refresh_rosters(instance.batch_id)
+
+
+@receiver(pre_delete, sender=AttendanceSession)
+def start_session_cascade(sender, instance, origin=None, **kwargs):
+    _cascade_for(origin)['sessions'][instance.pk] = instance
+
+
+@receiver(pre_delete, sender=Student)
+def start_student_cascade(sender, instance, origin=None, **kwargs):
+    _cascade_for(origin)['students'].add(instance.pk)
+
+
+@receiver(post_delete, sender=AttendanceSession)
+@receiver(post_delete, sender=Student)
+def recount_after_cascade(sender, instance, origin=None, **kwargs):
+    # The collector deletes records before their sessions and students, so the first
+    # parent's post_delete sees every record of the cascade
+    state = getattr(_cascade, 'state', None)
+    if state is None or state['origin'] is not origin or not state['records']:
+        return
+    records, state['records'] = state['records'], []
+    sessions = dict(state['sessions'])
+    surviving = {r.session_id for r in records} - sessions.keys()
+    sessions.update(AttendanceSession.objects.only('batch_id', 'subject_id', 'teacher_id').in_bulk(surviving))
+    refresh_groups({
+        (timezone.localdate(r.timestamp), s.batch_id, s.subject_id, s.teacher_id)
+        for r in records for s in [sessions.get(r.session_id)] if s is not None
+    })
+    if surviving:
+        recount_present(surviving)
+    student_stats.records_removed({r.student_id for r in records} - state['students'])
+    for record in records:
+        unmark_present(record.session_id, record.student_id)
+    for session_pk in surviving:
+        notify_session_changed(session_pk)
@@ -0,0 +1,209 @@
+"""
+Columnar snapshots of attendance records for analytics tooling.
+
+``write_snapshot`` writes an uncompressed NumPy ``.npz`` archive using only the
+standard library. Each column is a ``.npy`` member stored without compression,
+so ``numpy.load`` reads it as usual and ``load_snapshot`` memory-maps every
+column straight out of the zip without parsing anything.
+
+Record columns hold integer codes into small lookup tables, so a name is stored
+once however many rows refer to it:
+
+    record_id, timestamp_us         int64 (timestamps as UTC epoch microseconds)
+    session, student, subject,
+    batch, teacher                  int32 codes into the tables below
+    status                          int8 code into status_label
+
+    session_id, session_uuid, session_start_us
+    student_id, student_name, student_roll
+    subject_id, subject_name, subject_code
+    batch_id, batch_name
+    teacher_id, teacher_name
+    status_label
+
+e.g. ``snap['subject_name'][snap['subject']]`` gives the subject of every record.
+"""
+import array
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from .models import AttendanceSession, Batch, Student, Subject, Teacher
+from .pagination import EPOCH
+
+_BYTEORDER = '<' if sys.byteorder == 'little' else '>'
+_MICROSECOND = timedelta(microseconds=1)
+# Lookup tables are fetched in slices that stay under every backend's parameter limit
+_LOOKUP_BATCH = 500
+
+DIMENSIONS = ('session', 'student', 'subject', 'batch', 'teacher')
+
+
+class _Column:
+    """A numeric column spilled to a temporary file chunk by chunk."""
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.itemsize = array.array(typecode).itemsize
+        self.file = tempfile.TemporaryFile()
+        self.length = 0
+
+    @property
+    def descr(self):
+        return '|i1' if self.itemsize == 1 else f'{_BYTEORDER}i{self.itemsize}'
+
+    def extend(self, values):
+        chunk = array.array(self.typecode, values)
+        chunk.tofile(self.file)
+        self.length += len(chunk)
+
+
+def _npy_header(descr, length):
+    """Format 1.0 preamble: magic, version, header length, then a dict literal padded to 64 bytes."""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (descr, length)
+    header += ' ' * (-(10 + len(header) + 1) % 64) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def _write_member(archive, name, descr, length, chunks, nbytes):
+    info = zipfile.ZipInfo(f'{name}.npy', date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    with archive.open(info, 'w', force_zip64=nbytes > zipfile.ZIP64_LIMIT) as out:
+        out.write(_npy_header(descr, length))
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                out.write(chunk)
+            else:
+                shutil.copyfileobj(chunk, out)
+
+
+def _write_column(archive, name, column):
+    column.file.seek(0)
+    _write_member(archive, name, column.descr, column.length, [column.file], column.length * column.itemsize)
+    column.file.close()
+
+
+def _write_ints(archive, name, values, typecode='q'):
+    column = _Column(typecode)
+    column.extend(values)
+    _write_column(archive, name, column)
+
+
+def _write_strings(archive, name, values):
+    """Fixed-width unicode column (NumPy '<U'), padded to the longest value."""
+    width = max([len(v) for v in values] + [1])
+    data = b''.join(v.encode('utf-32-le').ljust(4 * width, b'\0') for v in values)
+    _write_member(archive, name, f'<U{width}', len(values), [data], len(data))
+
+
+def _micros(moment):
+    return (moment - EPOCH) // _MICROSECOND
+
+
+def _code(codes, pk):
+    code = codes.get(pk)
+    if code is None:
+        code = codes[pk] = len(codes)
+    return code
+
+
+def _lookup(queryset, codes, *fields):
+    """Rows of `fields` for the primary keys in `codes`, in code order."""
+    pks = list(codes)
+    found = {}
+    for i in range(0, len(pks), _LOOKUP_BATCH):
+        for row in queryset.filter(pk__in=pks[i:i + _LOOKUP_BATCH]).values_list('pk', *fields):
+            found[row[0]] = row[1:]
+    return [found[pk] for pk in pks]
+
+
+def _full_name(first, last):
+    return f"{first} {last}".strip()
+
+
+def write_snapshot(records, path, chunk_size=5000):
+    """
+    Write the records of a queryset as a columnar snapshot at `path`.
+    Rows are read in primary-key chunks; returns the row count.
+    """
+    columns = {
+        'record_id': _Column('q'),
+        'timestamp_us': _Column('q'),
+        **{dim: _Column('i') for dim in DIMENSIONS},
+        'status': _Column('b'),
+    }
+    codes = {dim: {} for dim in DIMENSIONS}
+    statuses = {}
+    rows = records.values_list(
+        'id', 'timestamp', 'session_id', 'student_id',
+        'session__subject_id', 'session__batch_id', 'session__teacher_id', 'status',
+    ).order_by('id')
+
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        columns['record_id'].extend(row[0] for row in chunk)
+        columns['timestamp_us'].extend(_micros(row[1]) for row in chunk)
+        for i, dim in enumerate(DIMENSIONS, start=2):
+            dim_codes = codes[dim]
+            columns[dim].extend(_code(dim_codes, row[i]) for row in chunk)
+        columns['status'].extend(_code(statuses, row[7]) for row in chunk)
+        last_id = chunk[-1][0]
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, column in columns.items():
+            _write_column(archive, name, column)
+
+        sessions = _lookup(AttendanceSession.objects.all(), codes['session'], 'session_id', 'start_time')
+        _write_ints(archive, 'session_id', codes['session'])
+        _write_strings(archive, 'session_uuid', [str(uuid) for uuid, _ in sessions])
+        _write_ints(archive, 'session_start_us', [_micros(start) for _, start in sessions])
+
+        students = _lookup(Student.objects.all(), codes['student'], 'user__first_name', 'user__last_name', 'roll_number')
+        _write_ints(archive, 'student_id', codes['student'])
+        _write_strings(archive, 'student_name', [_full_name(first, last) for first, last, _ in students])
+        _write_strings(archive, 'student_roll', [roll for _, _, roll in students])
+
+        subjects = _lookup(Subject.objects.all(), codes['subject'], 'name', 'code')
+        _write_ints(archive, 'subject_id', codes['subject'])
+        _write_strings(archive, 'subject_name', [name for name, _ in subjects])
+        _write_strings(archive, 'subject_code', [code for _, code in subjects])
+
+        batches = _lookup(Batch.objects.all(), codes['batch'], 'name')
+        _write_ints(archive, 'batch_id', codes['batch'])
+        _write_strings(archive, 'batch_name', [name for name, in batches])
+
+        teachers = _lookup(Teacher.objects.all(), codes['teacher'], 'user__first_name', 'user__last_name')
+        _write_ints(archive, 'teacher_id', codes['teacher'])
+        _write_strings(archive, 'teacher_name', [_full_name(first, last) for first, last in teachers])
+
+        _write_strings(archive, 'status_label', list(statuses))
+    return columns['record_id'].length
+
+
+def load_snapshot(path):
+    """
+    Memory-map every column of a snapshot read-only. Needs NumPy, which the
+    server itself does not; returns {column name: array}.
+    """
+    import numpy as np
+
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            # The member's data follows its local header, whose extra field may differ from the central one
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            np.lib.format.read_magic(f)
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            name = info.filename[:-len('.npy')]
+            if shape[0] == 0:
+                columns[name] = np.empty(shape, dtype=dtype)
+            else:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape)
+    return columns
@@ -0,0 +1,161 @@
+"""
+Per-request SQL accounting and query budgets.
+
+``QueryBudgetMiddleware`` tallies the statements each request runs, their
+total database time and the slowest few, per view name. The tally is fed by an
+execute wrapper (the hook behind ``connection.execute_wrapper``) installed on
+every connection as it opens; it finds the current request's tally through a
+context variable, which ``sync_to_async`` carries into its worker threads, so
+async views such as ``mark_attendance`` are measured too. Statements run while
+a streaming response is being sent are not counted, nor is transaction
+control (SQLite's BEGIN, savepoints), which costs a round trip but is the same
+for any view that writes.
+
+Views declare their maximum with ``@query_budget(n)``; ``SQL_BUDGETS``
+({url name: n}) overrides that and ``SQL_BUDGET_DEFAULT`` covers the rest.
+A request over budget logs a warning, or raises ``QueryBudgetExceeded``
+when ``SQL_BUDGET_STRICT`` is on (as in the test settings).
+"""
+import heapq
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('sql_budget_tally', default=None)
+_lock = threading.Lock()
+_views = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most statements one request to this view may run."""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryTally:
+    def __init__(self, keep=3):
+        self.count = 0
+        self.duration = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (seconds, sql)
+
+    def add(self, sql, seconds):
+        self.count += 1
+        self.duration += seconds
+        entry = (seconds, sql)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+# Only some of it reaches the wrapper (SQLite begins through cursor.execute(),
+# other backends on the connection; COMMIT never does), so none is counted
+_TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def _record(execute, sql, params, many, context):
+    tally = _current.get()
+    if tally is None or sql.lstrip()[:9].upper().startswith(_TRANSACTION_CONTROL):
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tally.add(sql, time.perf_counter() - start)
+
+
+def install(sender=None, connection=None, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(install, dispatch_uid='sql_budget_install')
+
+
+def budget_for(view_name, view_func=None):
+    budgets = getattr(settings, 'SQL_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    declared = getattr(view_func, 'query_budget', None)
+    return declared if declared is not None else getattr(settings, 'SQL_BUDGET_DEFAULT', None)
+
+
+def _finish(request, tally):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return
+    name = match.view_name
+    budget = budget_for(name, match.func)
+    over = budget is not None and tally.count > budget
+    with _lock:
+        view = _views.setdefault(name, {'requests': 0, 'queries': 0, 'db_time': 0.0, 'max_queries': 0, 'over_budget': 0, 'slowest': []})
+        view['requests'] += 1
+        view['queries'] += tally.count
+        view['db_time'] += tally.duration
+        view['max_queries'] = max(view['max_queries'], tally.count)
+        view['over_budget'] += over
+        view['slowest'] = heapq.nlargest(tally.keep, view['slowest'] + tally.slowest)
+    if over:
+        message = f"{name} ran {tally.count} SQL queries (budget {budget}, {tally.duration * 1000:.1f} ms in the database)"
+        if getattr(settings, 'SQL_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        slowest = '; '.join(f"{seconds * 1000:.1f} ms: {sql[:120]}" for seconds, sql in sorted(tally.slowest, reverse=True))
+        logger.warning("SQL budget warning: %s. Slowest: %s", message, slowest)
+
+
+def stats():
+    """Per-view totals since start-up: requests, queries, db_time, max_queries, over_budget, slowest."""
+    with _lock:
+        return {name: dict(view, slowest=list(view['slowest'])) for name, view in _views.items()}
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.keep = getattr(settings, 'SQL_BUDGET_SLOWEST', 3)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tally = QueryTally(self.keep)
+        token = _current.set(tally)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, tally)
+        return response
+
+    async def __acall__(self, request):
+        tally = QueryTally(self.keep)
+        token = _current.set(tally)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, tally)
+        return response
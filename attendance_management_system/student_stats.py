@@ -0,0 +1,197 @@
+"""
+Maintenance of StudentStats rows.
+
+A new record for today (the normal case) is folded in with one conditional
+UPDATE; anything else (first record, back-dated inserts, deletes, batch moves)
+recomputes the row from the DailyAttendance rollup, which holds one row per
+attended day instead of one per record, for any number of students in a fixed
+number of queries (cascading deletes recount everyone they touched at once).
+Closing (or re-opening) a session adjusts the eligible session count of its
+whole batch in one statement. Rows are created with the student. Closing
+sessions with ``QuerySet.update()`` bypasses the signals that do this; run
+``manage.py rebuild_student_stats`` afterwards.
+
+``subject_breakdown`` gives per-subject percentages from one grouped query,
+cached per student and dropped whenever that student's records change, along
+with the student's cached history pages.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FilteredRelation, Q, When
+from django.utils import timezone
+
+from . import history, metrics
+from .models import AttendanceRecord, AttendanceSession, DailyAttendance, Student, StudentStats
+
+SUBJECTS_PREFIX = 'ams:subjects:v1:'
+
+# Largest step between attended days that keeps a streak going (weekends off, etc.)
+STREAK_GAP_DAYS = 2
+
+
+def record_added(student_pk, timestamp):
+    day = timezone.localdate(timestamp)
+    # current_streak is assigned before last_attended: MySQL evaluates SET left to right
+    updated = StudentStats.objects.filter(
+        Q(last_attended__isnull=True) | Q(last_attended__lte=day), student_id=student_pk,
+    ).update(
+        total_present=F('total_present') + 1,
+        current_streak=Case(
+            When(Q(last_attended__isnull=True) | Q(last_attended__lt=day - timedelta(days=STREAK_GAP_DAYS)), then=1),
+            When(last_attended__lt=day, then=F('current_streak') + 1),
+            default=F('current_streak'),
+            output_field=StudentStats._meta.get_field('current_streak'),
+        ),
+        last_attended=Case(
+            When(Q(last_attended__isnull=True) | Q(last_attended__lt=day), then=day),
+            default=F('last_attended'),
+            output_field=StudentStats._meta.get_field('last_attended'),
+        ),
+    )
+    if not updated:
+        refresh(student_pk)
+    _forget(student_pk)
+
+
+def record_removed(student_pk):
+    # Never create a row here: the student itself may be mid-delete (cascade)
+    refresh(student_pk, create=False)
+    _forget(student_pk)
+
+
+def records_removed(student_pks):
+    """Records of these students went in one cascade; eligible_sessions is left to the session signals."""
+    attendance = _attendance(student_pks)
+    StudentStats.objects.bulk_update(
+        [StudentStats(student_id=pk, **values) for pk, values in attendance.items()],
+        ['last_attended', 'current_streak', 'total_present'],
+    )
+    for student_pk in student_pks:
+        _forget(student_pk)
+
+
+def _forget(student_pk):
+    cache.delete(_subjects_key(student_pk))
+    history.invalidate(student_pk)
+
+
+def session_closed(batch_id, delta=1):
+    """A session of the batch completed (delta=1), or a completed one was deleted or re-opened (delta=-1)."""
+    stats = StudentStats.objects.filter(student__batch_id=batch_id)
+    if delta < 0:
+        stats = stats.filter(eligible_sessions__gte=-delta)
+    stats.update(eligible_sessions=F('eligible_sessions') + delta)
+
+
+def _streak(days):
+    """(last day, run length) for attended days sorted newest first."""
+    if not days:
+        return None, 0
+    run = 1
+    for newer, older in zip(days, days[1:]):
+        if (newer - older).days > STREAK_GAP_DAYS:
+            break
+        run += 1
+    return days[0], run
+
+
+def _attendance(student_pks):
+    """{student pk: last_attended, current_streak and total_present} from two grouped queries."""
+    days = {pk: [] for pk in student_pks}
+    for student_pk, day in (
+        DailyAttendance.objects.filter(student_id__in=student_pks)
+        .order_by('student_id', '-day').values_list('student_id', 'day').distinct()
+    ):
+        days[student_pk].append(day)
+    totals = dict(
+        AttendanceRecord.objects.filter(student_id__in=student_pks)
+        .order_by().values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+    )
+    attendance = {}
+    for student_pk, attended in days.items():
+        last_attended, streak = _streak(attended)
+        attendance[student_pk] = {
+            'last_attended': last_attended, 'current_streak': streak, 'total_present': totals.get(student_pk, 0),
+        }
+    return attendance
+
+
+def refresh(*student_pks, create=True):
+    """Recompute the stats rows of the given students from scratch."""
+    students = dict(Student.objects.filter(pk__in=student_pks).values_list('pk', 'batch_id'))
+    if not students:
+        return
+    eligible = dict(
+        AttendanceSession.objects.filter(batch_id__in={b for b in students.values() if b}, is_active=False)
+        .order_by().values('batch_id').annotate(n=Count('id')).values_list('batch_id', 'n')
+    )
+    rows = {
+        student_pk: {**values, 'eligible_sessions': eligible.get(students[student_pk], 0)}
+        for student_pk, values in _attendance(list(students)).items()
+    }
+    for student_pk, values in rows.items():
+        # Update first, create only if missing: update_or_create reads inside its
+        # transaction and SQLite cannot upgrade that to a write under contention
+        if StudentStats.objects.filter(student_id=student_pk).update(**values) or not create:
+            continue
+        try:
+            with transaction.atomic():
+                StudentStats.objects.create(student_id=student_pk, **values)
+        except IntegrityError:
+            # Another writer created the row first
+            StudentStats.objects.filter(student_id=student_pk).update(**values)
+
+
+def get_stats(student):
+    """The student's stats row, created on first use."""
+    try:
+        return StudentStats.objects.get(student=student)
+    except StudentStats.DoesNotExist:
+        refresh(student.pk)
+        return StudentStats.objects.get(student=student)
+
+
+def _subjects_key(student_pk):
+    return f"{SUBJECTS_PREFIX}{student_pk}"
+
+
+def subject_breakdown(student, stats=None):
+    """
+    Per-subject attendance over the completed sessions of the student's batch:
+    a list of {'subject', 'code', 'attended', 'held', 'percentage'} sorted by subject.
+    """
+    if not student.batch_id:
+        return []
+    stats = stats or get_stats(student)
+    # Entries remember the batch and completed-session count they were built for, so a
+    # session closing anywhere in the batch retires them without touching each student
+    version = (student.batch_id, stats.eligible_sessions)
+    cached = cache.get(_subjects_key(student.pk))
+    hit = cached is not None and cached[0] == version
+    metrics.cache_lookup('subject_breakdown', hit)
+    if hit:
+        return cached[1]
+
+    # Joins only this student's record (unique per session), so held counts stay exact
+    rows = (
+        AttendanceSession.objects.filter(batch_id=student.batch_id, is_active=False)
+        .annotate(mine=FilteredRelation('records', condition=Q(records__student_id=student.pk)))
+        .values('subject__name', 'subject__code')
+        .annotate(held=Count('id'), attended=Count('mine__id'))
+        .order_by('subject__name')
+    )
+    breakdown = [
+        {
+            'subject': row['subject__name'],
+            'code': row['subject__code'],
+            'attended': row['attended'],
+            'held': row['held'],
+            'percentage': round(row['attended'] / row['held'] * 100, 1),
+        }
+        for row in rows
+    ]
+    cache.set(_subjects_key(student.pk), (version, breakdown), getattr(settings, 'SUBJECT_STATS_CACHE_TIMEOUT', 3600))
+    return breakdown
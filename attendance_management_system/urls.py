@@ -24,9 +24,14 @@ urlpatterns = [
     path('dashboard/admin/batches/edit/<int:batch_id>/', views.edit_batch, name='edit_batch'),
     path('dashboard/admin/report/', views.admin_attendance_report, name='admin_attendance_report'),
     path('dashboard/admin/export/', views.export_reports, name='export_reports'),
+    path('dashboard/admin/export/<uuid:job_id>/', views.export_job, name='export_job'),
+    path('dashboard/admin/export/<uuid:job_id>/download/', views.export_job_download, name='export_job_download'),
+    path('api/export/<uuid:job_id>/', views.export_job_status, name='export_job_status'),
+    path('api/admin/session/<uuid:session_id>/records/', views.admin_session_records, name='admin_session_records'),
     path('dashboard/admin/timetable/', views.admin_timetable, name='admin_timetable'),
     path('dashboard/admin/syllabus/', views.admin_syllabus, name='admin_syllabus'),
     path('dashboard/admin/audit-logs/', views.admin_audit_logs, name='admin_audit_logs'),
+    path('dashboard/admin/metrics/', views.admin_metrics, name='admin_metrics'),
 
     
     # Teacher
@@ -40,11 +45,14 @@ urlpatterns = [
     path('session/<uuid:session_id>/manual/', views.manual_attendance, name='manual_attendance'),
     path('api/session/<uuid:session_id>/attendance/', views.get_session_attendance, name='get_session_attendance'),
     path('api/session/<uuid:session_id>/qr-data/', views.get_qr_data, name='get_qr_data'),
+    path('api/session/<uuid:session_id>/stream/', views.session_stream, name='session_stream'),
     
     # Student
     path('dashboard/student/', views.student_dashboard, name='student_dashboard'),
     path('scan/', views.scan_qr, name='scan_qr'),
     path('api/mark-attendance/', views.mark_attendance, name='mark_attendance'),
+    path('api/student/subject-attendance/', views.student_subject_attendance, name='student_subject_attendance'),
+    path('api/student/history/', views.student_attendance_history, name='student_attendance_history'),
     path('history/', views.attendance_history, name='attendance_history'),
     path('timetable/', views.student_timetable, name='student_timetable'),
     path('syllabus/', views.student_syllabus, name='student_syllabus'),
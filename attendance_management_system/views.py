@@ -1,34 +1,77 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404, StreamingHttpResponse, FileResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.core.exceptions import PermissionDenied
+from django.conf import settings
 from django.utils import timezone
-from .models import User, Student, Teacher, Batch, Subject, AttendanceSession, AttendanceRecord, TimetableSlot, Syllabus
+from django.utils.cache import patch_cache_control
+from django.core.cache import cache
+from django.views.decorators.http import condition
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Greatest
+from .models import User, Student, Teacher, Batch, Subject, AttendanceSession, AttendanceRecord, AuditLog, ExportJob, TimetableSlot, Syllabus
+from .journal import get_journal
+from .services import mark_once, recount_present
+from .session_cache import get_session_snapshot, aget_session_snapshot
+from .roster import get_roster, aget_roster, ais_present, mark_present, amark_present
+from .background import run_after_response
+from . import audit
+from .pagination import keyset_page, day_bounds
+from .rollup import daily_counts, record_count
+from .student_stats import get_stats, subject_breakdown
+from .history import history_page
+from .sql_budget import query_budget
+from . import metrics
+from . import exports
+from .exports import csv_lines, filter_attendance_records
+from .qr_tokens import issue_token, verify_token, current_bucket, seconds_left_in_bucket
+from .push import session_event_stream
+from asgiref.sync import sync_to_async
+import asyncio
 import json
-import csv
-import uuid
 from django.core import signing
-import time
 import math
 from functools import wraps
 
+def _request_roles(request):
+    """Roles of the requesting user, or None if not logged in."""
+    if not request.user.is_authenticated:
+        return None
+    
+    user_roles = []
+    if request.user.is_superuser: user_roles.append('admin')
+    if getattr(request.user, 'is_teacher', False): user_roles.append('teacher')
+    if getattr(request.user, 'is_student', False): user_roles.append('student')
+    return user_roles
+
 def role_required(*roles):
     """
     Custom decorator to check user roles and return 403 if unauthorized.
+    Also redirects anonymous users to login, and works on async views.
     """
     def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                # request.user is lazy and may hit the DB, so resolve it off the event loop
+                user_roles = await sync_to_async(_request_roles)(request)
+                if user_roles is None:
+                    return redirect('login')
+                if any(role in roles for role in user_roles):
+                    return await view_func(request, *args, **kwargs)
+                raise PermissionDenied
+            return _wrapped_async_view
+
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            if not request.user.is_authenticated:
+            user_roles = _request_roles(request)
+            if user_roles is None:
                 return redirect('login')
             
-            user_roles = []
-            if request.user.is_superuser: user_roles.append('admin')
-            if getattr(request.user, 'is_teacher', False): user_roles.append('teacher')
-            if getattr(request.user, 'is_student', False): user_roles.append('student')
-            
             if any(role in roles for role in user_roles):
                 return view_func(request, *args, **kwargs)
             
@@ -53,13 +96,24 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 def log_action(user, action, details=""):
-    """Record an action in the AuditLog."""
+    """Record an action in the AuditLog (buffered and bulk-written, see audit.py)."""
     try:
+        if audit.is_buffered():
+            audit.get_audit_buffer().log(user.pk if user is not None else None, action, details)
+            return
         from .models import AuditLog
         AuditLog.objects.create(user=user, action=action, details=details)
+        audit.actions_written([action])
     except Exception as e:
         print(f"Error logging action: {e}")
 
+async def alog_action(request, action, details=""):
+    """log_action for async views; only unbuffered writes need to leave the event loop."""
+    if audit.is_buffered():
+        log_action(request.user, action, details)
+    else:
+        await run_after_response(request, log_action, request.user, action, details)
+
 # --- Helper Functions ---
 
 def is_admin(user):
@@ -73,6 +127,7 @@ def is_student(user):
 
 # --- Authentication Views ---
 
+@query_budget(2)
 def index_view(request):
     if request.user.is_authenticated:
         if request.user.is_superuser:
@@ -83,6 +138,7 @@ def index_view(request):
             return redirect('student_dashboard')
     return render(request, 'index.html')
 
+@query_budget(10)
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('index') # Let index handle the redirect based on role
@@ -99,10 +155,12 @@ def login_view(request):
             messages.error(request, 'Invalid username or password')
     return render(request, 'login.html')
 
+@query_budget(5)
 def logout_view(request):
     logout(request)
     return redirect('index')
 
+@query_budget(8)
 @login_required
 def profile(request):
     user = request.user
@@ -117,6 +175,7 @@ def profile(request):
         
     return render(request, 'profile.html', {'user': user})
 
+@query_budget(10)
 def register_view(request):
     batches = Batch.objects.all()
     
@@ -172,6 +231,7 @@ def register_view(request):
 
 # --- Admin Views ---
 
+@query_budget(8)
 @login_required
 @role_required('admin')
 def admin_dashboard(request):
@@ -182,14 +242,8 @@ def admin_dashboard(request):
         'teacher__user', 'subject', 'batch'
     ).order_by('-start_time')[:10]
 
-    from datetime import timedelta
-    today = timezone.now().date()
-    last_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    chart_labels = [day.strftime('%a') for day in last_7_days]
-    chart_data = [
-        AttendanceRecord.objects.filter(timestamp__date=day).count()
-        for day in last_7_days
-    ]
+    # Last 7 days from the daily rollup (one query)
+    chart_labels, chart_data = daily_counts(7)
 
     context = {
         'total_students': total_students,
@@ -201,6 +255,7 @@ def admin_dashboard(request):
     }
     return render(request, 'admin/admin_dashboard.html', context)
 
+@query_budget(10)
 @login_required
 @role_required('admin')
 def manage_users(request):
@@ -265,6 +320,7 @@ def manage_users(request):
         'batches': batches
     })
 
+@query_budget(8)
 @login_required
 @role_required('admin')
 def edit_user(request, user_id):
@@ -290,12 +346,39 @@ def edit_user(request, user_id):
     batches = Batch.objects.all()
     return render(request, 'admin/edit_user.html', {'target_user': user_to_edit, 'batches': batches})
 
+@query_budget(5)
 @login_required
 @role_required('admin')
 def manage_attendance(request):
-    sessions = AttendanceSession.objects.select_related('teacher', 'subject', 'batch').order_by('-start_time')
-    return render(request, 'admin/manage_attendance.html', {'sessions': sessions})
+    # One page of sessions with their stored present counts; records load per session on demand
+    sessions = AttendanceSession.objects.select_related('teacher__user', 'subject', 'batch')
+    sessions, next_cursor = keyset_page(
+        sessions, request.GET.get('cursor'), getattr(settings, 'MANAGE_ATTENDANCE_PAGE_SIZE', 25), field='start_time',
+    )
+    return render(request, 'admin/manage_attendance.html', {
+        'sessions': sessions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+@query_budget(4)
+@login_required
+@role_required('admin')
+def admin_session_records(request, session_id):
+    # Records of one session for the manage_attendance drill-down, in one joined query
+    rows = AttendanceRecord.objects.filter(session__session_id=session_id).order_by('timestamp', 'id').values_list(
+        'id', 'timestamp', 'student__roll_number', 'student__user__first_name', 'student__user__last_name',
+    )
+    data = [{
+        'id': pk,
+        'student': f"{first} {last}".strip(),
+        'roll_number': roll_number,
+        'time': timezone.localtime(timestamp).strftime('%H:%M:%S'),
+        'delete_url': reverse('delete_attendance_record', args=[pk]),
+    } for pk, timestamp, roll_number, first, last in rows]
+    return JsonResponse({'records': data})
 
+@query_budget(15)
 @login_required
 @role_required('admin')
 def delete_attendance_record(request, record_id):
@@ -305,6 +388,7 @@ def delete_attendance_record(request, record_id):
         messages.success(request, 'Attendance record deleted')
     return redirect(request.META.get('HTTP_REFERER', 'admin_dashboard'))
 
+@query_budget(8)
 @login_required
 @role_required('admin')
 def manage_batches(request):
@@ -327,6 +411,7 @@ def manage_batches(request):
     batches = Batch.objects.all().order_by('-year', 'name')
     return render(request, 'admin/manage_batches.html', {'batches': batches})
 
+@query_budget(6)
 @login_required
 @role_required('admin')
 def edit_batch(request, batch_id):
@@ -351,6 +436,7 @@ def edit_batch(request, batch_id):
 def is_teacher_or_admin(user):
     return user.is_superuser or user.is_teacher
 
+@query_budget(8)
 @login_required
 @role_required('teacher', 'admin')
 def manage_subjects(request):
@@ -394,6 +480,7 @@ def manage_subjects(request):
     batches = Batch.objects.all()
     return render(request, 'teacher/manage_subjects.html', {'subjects': subjects, 'batches': batches})
 
+@query_budget(8)
 @login_required
 @user_passes_test(is_teacher_or_admin)
 def edit_subject(request, subject_id):
@@ -423,67 +510,150 @@ def edit_subject(request, subject_id):
     batches = Batch.objects.all()
     return render(request, 'teacher/edit_subject.html', {'subject': subject, 'batches': batches})
 
+@query_budget(8)
 @login_required
 @role_required('admin')
 def export_reports(request):
     if request.method == 'POST':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="attendance_report.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Session ID', 'Teacher', 'Subject', 'Batch', 'Student', 'Status'])
-        
-        records = AttendanceRecord.objects.select_related('session', 'student', 'session__teacher', 'session__subject', 'session__batch').all()
-        
-        for record in records:
-            writer.writerow([
-                record.timestamp,
-                record.session.session_id,
-                record.session.teacher.user.get_full_name(),
-                record.session.subject.name,
-                record.session.batch.name,
-                record.student.user.get_full_name(),
-                record.status
-            ])
-        return response
-    return render(request, 'admin/export_reports.html')
+        if 'stream' in request.POST:
+            # Small exports: stream straight back from this request
+            records = filter_attendance_records(AttendanceRecord.objects.all(), request.POST)
+            response = StreamingHttpResponse(csv_lines(records), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="attendance_report.csv"'
+            return response
+
+        job, created = exports.submit(request.POST, request.user)
+        if created:
+            log_action(request.user, "Export Reports", f"Queued export {job.job_id} ({job.filters or 'all records'})")
+        else:
+            messages.info(request, 'An identical export is already available; showing that one.')
+        return redirect('export_job', job_id=job.job_id)
+    return render(request, 'admin/export_reports.html', {
+        'batches': Batch.objects.all(),
+        'subjects': Subject.objects.all(),
+        'recent_jobs': ExportJob.objects.order_by('-created_at')[:10],
+        'formats': ExportJob.FORMAT_CHOICES,
+    })
+
+def _export_job_payload(job):
+    return {
+        'job_id': str(job.job_id),
+        'format': job.format,
+        'status': job.status,
+        'progress': job.progress,
+        'done_parts': job.done_parts,
+        'total_parts': job.total_parts,
+        'row_count': job.row_count,
+        'error': job.error,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'download_url': reverse('export_job_download', args=[job.job_id]) if job.status == ExportJob.DONE else None,
+    }
+
+@query_budget(4)
+@login_required
+@role_required('admin')
+def export_job(request, job_id):
+    job = get_object_or_404(ExportJob, job_id=job_id)
+    return render(request, 'admin/export_job.html', {'job': job, 'payload': _export_job_payload(job)})
 
+@query_budget(4)
+@login_required
+@role_required('admin')
+def export_job_status(request, job_id):
+    job = get_object_or_404(ExportJob, job_id=job_id)
+    return JsonResponse(_export_job_payload(job))
+
+@query_budget(4)
+@login_required
+@role_required('admin')
+def export_job_download(request, job_id):
+    job = get_object_or_404(ExportJob, job_id=job_id, status=ExportJob.DONE)
+    path = exports.artifact_path(job)
+    if path is None or not path.exists() or job.expires_at <= timezone.now():
+        raise Http404
+    if job.format == ExportJob.SNAPSHOT:
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename='attendance_snapshot.npz', content_type='application/zip')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename='attendance_report.csv.gz', content_type='application/gzip')
+
+@query_budget(8)
 @login_required
 @role_required('admin')
 def admin_attendance_report(request):
-    sessions = AttendanceSession.objects.select_related('teacher', 'subject', 'batch').order_by('-start_time')
     batches = Batch.objects.all()
     subjects = Subject.objects.all()
-    
-    # Filters
-    batch_id = request.GET.get('batch')
-    subject_id = request.GET.get('subject')
-    date_str = request.GET.get('date')
-    
-    records = AttendanceRecord.objects.select_related('session', 'student__user', 'session__teacher__user', 'session__subject', 'session__batch').all().order_by('-timestamp')
-    
-    if batch_id:
-        records = records.filter(session__batch_id=batch_id)
-    if subject_id:
-        records = records.filter(session__subject_id=subject_id)
-    if date_str:
-        records = records.filter(timestamp__date=date_str)
-        
+
+    records = AttendanceRecord.objects.select_related('session', 'student__user', 'session__teacher__user', 'session__subject', 'session__batch')
+    records = filter_attendance_records(records, request.GET)
+    records, next_cursor = keyset_page(records, request.GET.get('cursor'), getattr(settings, 'ATTENDANCE_REPORT_PAGE_SIZE', 50))
+
+    # Total from the daily rollup, cached briefly per filter set so paging never counts record rows
+    filters = exports.normalise_filters(request.GET)
+    count_key = f"ams:report-count:v1:{exports.fingerprint(filters)}"
+    total = cache.get(count_key)
+    metrics.cache_lookup('report_count', total is not None)
+    if total is None:
+        total = record_count(filters)
+        cache.set(count_key, total, getattr(settings, 'ATTENDANCE_REPORT_COUNT_TIMEOUT', 60))
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
     context = {
         'records': records,
         'batches': batches,
         'subjects': subjects,
+        'total': total,
+        'filter_query': params.urlencode(),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     }
     return render(request, 'admin/admin_attendance_report.html', context)
 
-# --- Teacher Views ---
-
+@query_budget(5)
 @login_required
 @role_required('admin')
 def admin_audit_logs(request):
-    logs = AuditLog.objects.select_related('user').all().order_by('-timestamp')[:500] # Limit for speed
-    return render(request, 'admin/audit_logs.html', {'logs': logs})
+    logs = AuditLog.objects.select_related('user')
+
+    # Filters
+    action = request.GET.get('action', '')
+    username = request.GET.get('user', '').strip()
+    search = request.GET.get('q', '').strip()
+    start, end = day_bounds(request.GET.get('start'), request.GET.get('end'))
+
+    if action:
+        logs = logs.filter(action=action)
+    if username:
+        logs = logs.filter(user__username=username)
+    if start:
+        logs = logs.filter(timestamp__gte=start)
+    if end:
+        logs = logs.filter(timestamp__lt=end)
+    if search:
+        logs = logs.filter(details__icontains=search)
+
+    logs, next_cursor = keyset_page(logs, request.GET.get('cursor'), getattr(settings, 'AUDIT_LOG_PAGE_SIZE', 50))
 
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    context = {
+        'logs': logs,
+        'actions': audit.action_choices(),
+        'filter_query': params.urlencode(),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    }
+    return render(request, 'admin/audit_logs.html', context)
+
+@query_budget(2)
+@login_required
+@role_required('admin')
+def admin_metrics(request):
+    """Prometheus text exposition of the metrics in metrics.py, summed over all worker processes."""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# --- Teacher Views ---
+
+@query_budget(10)
 @login_required
 @role_required('teacher')
 def teacher_dashboard(request):
@@ -491,35 +661,18 @@ def teacher_dashboard(request):
     active_sessions = AttendanceSession.objects.filter(teacher=teacher, is_active=True).select_related('subject', 'batch')
     past_sessions = AttendanceSession.objects.filter(teacher=teacher, is_active=False).select_related('subject', 'batch').order_by('-start_time')[:5]
     
-    # Calculate recent attendance trend for chart
-    from datetime import timedelta
-    today = timezone.now().date()
-    last_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    
-    chart_labels = [day.strftime('%a') for day in last_7_days]
-    chart_data = []
-    
-    # Calculate attendance for teacher's sessions only
-    for day in last_7_days:
-        count = AttendanceRecord.objects.filter(
-            session__teacher=teacher,
-            timestamp__date=day
-        ).count()
-        chart_data.append(count)
-
-    # Average attendance rate: one query with prefetch (no N+1)
-    completed_sessions = list(AttendanceSession.objects.filter(
-        teacher=teacher, is_active=False
-    ).prefetch_related('batch__students', 'records'))
-    total_teacher_sessions = len(completed_sessions)
+    # Recent attendance trend for teacher's sessions only, from the daily rollup
+    chart_labels, chart_data = daily_counts(7, teacher=teacher)
+
+    # Average attendance rate from the per-session counters (one aggregate); a roster
+    # that grew after its snapshot still counts everyone who attended
+    totals = AttendanceSession.objects.filter(teacher=teacher, is_active=False).aggregate(
+        sessions=Count('id'), possible=Sum(Greatest('roster_size', 'present_count')), actual=Sum('present_count')
+    )
+    total_teacher_sessions = totals['sessions']
     overall_attendance_rate = 0
-    if total_teacher_sessions > 0:
-        total_possible = sum(len(s.batch.students.all()) for s in completed_sessions)
-        actual = sum(len(s.records.all()) for s in completed_sessions)
-        if total_possible > 0:
-            overall_attendance_rate = round((actual / total_possible) * 100, 1)
-        else:
-            overall_attendance_rate = 0
+    if totals['possible']:
+        overall_attendance_rate = round((totals['actual'] / totals['possible']) * 100, 1)
 
     return render(request, 'teacher/teacher_dashboard.html', {
         'active_sessions': active_sessions,
@@ -530,6 +683,7 @@ def teacher_dashboard(request):
         'total_teacher_sessions': total_teacher_sessions
     })
 
+@query_budget(14)
 @login_required
 @role_required('teacher')
 def create_session(request):
@@ -554,6 +708,9 @@ def create_session(request):
         lat = request.POST.get('latitude')
         lon = request.POST.get('longitude')
         rad = request.POST.get('radius', 100)
+        ingest_mode = request.POST.get('ingest_mode')
+        if ingest_mode not in dict(AttendanceSession.INGEST_MODE_CHOICES):
+            ingest_mode = AttendanceSession.INGEST_SYNC
         
         session = AttendanceSession.objects.create(
             teacher=teacher, 
@@ -561,7 +718,8 @@ def create_session(request):
             batch=batch,
             latitude=lat if lat else None,
             longitude=lon if lon else None,
-            radius=float(rad) if rad else 100.0
+            radius=float(rad) if rad else 100.0,
+            ingest_mode=ingest_mode
         )
         log_action(request.user, "Create Session", f"Created {subject.name} session for {batch.name} (GPS restricted: {bool(lat)})")
         return redirect('session_qr', session_id=session.session_id)
@@ -570,6 +728,7 @@ def create_session(request):
     batches = Batch.objects.filter(subjects__in=subjects).distinct().order_by('-year', 'name')
     return render(request, 'teacher/create_session.html', {'subjects': subjects, 'batches': batches})
 
+@query_budget(10)
 @login_required
 @role_required('teacher')
 def session_qr(request, session_id):
@@ -577,20 +736,77 @@ def session_qr(request, session_id):
     if request.method == 'POST' and 'end_session' in request.POST:
         session.is_active = False
         session.end_time = timezone.now()
-        session.save()
+        # Leave the counters to their atomic updates, then settle present_count once
+        session.save(update_fields=['is_active', 'end_time'])
+        recount_present([session.pk])
         log_action(request.user, "End Session", f"Ended session for {session.subject.name}")
         return redirect('teacher_dashboard')
-    return render(request, 'teacher/session_qr.html', {'session': session})
+    records = list(session.records.select_related('student__user').order_by('id'))
+    return render(request, 'teacher/session_qr.html', {
+        'session': session,
+        'records': records,
+        'last_record_id': records[-1].id if records else 0,
+    })
+
+def _session_attendance_state(request, session_id):
+    """(session snapshot, last record id, record count), computed once per request."""
+    if not hasattr(request, '_attendance_state'):
+        session = get_session_snapshot(session_id)
+        state = None
+        if session is not None:
+            agg = AttendanceRecord.objects.filter(session_id=session.pk).aggregate(last_id=Max('id'), count=Count('id'))
+            state = (session, agg['last_id'] or 0, agg['count'])
+        request._attendance_state = state
+    return request._attendance_state
 
+def session_attendance_etag(request, session_id):
+    state = _session_attendance_state(request, session_id)
+    if state is None:
+        return None
+    # Count is part of the tag so unmarked records also invalidate it
+    return f'"{state[1]}-{state[2]}"'
+
+@query_budget(6)
 @login_required
 @role_required('teacher')
+@condition(etag_func=session_attendance_etag)
 def get_session_attendance(request, session_id):
-    # AJAX endpoint for live updates
-    session = get_object_or_404(AttendanceSession, session_id=session_id)
-    records = session.records.select_related('student__user').all()
-    data = [{'student': r.student.user.get_full_name(), 'timestamp': r.timestamp.strftime('%H:%M:%S')} for r in records]
-    return JsonResponse({'attendance': data, 'count': len(data)})
+    # AJAX endpoint for live updates; ?since=<last record id> returns only newer records
+    state = _session_attendance_state(request, session_id)
+    if state is None:
+        raise Http404
+    session, last_id, count = state
+    records = AttendanceRecord.objects.filter(session_id=session.pk).select_related('student__user').order_by('id')
+    since = request.GET.get('since', '')
+    if since.isdigit():
+        records = records.filter(id__gt=int(since))
+    data = [{'id': r.id, 'student': r.student.user.get_full_name(), 'timestamp': r.timestamp.strftime('%H:%M:%S')} for r in records]
+    response = JsonResponse({'attendance': data, 'count': count, 'last_id': last_id})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _own_session_snapshot(request, session_id):
+    session = get_session_snapshot(session_id)
+    if session is None or session.teacher_id != request.user.teacher_profile.pk:
+        raise Http404
+    return session
+
+@query_budget(4)
+@role_required('teacher')
+async def session_stream(request, session_id):
+    # Server-sent events replacing the QR / attendance polling loops (ASGI only)
+    if not isinstance(request, ASGIRequest):
+        # 204 tells EventSource not to reconnect; the page falls back to polling
+        return HttpResponse(status=204)
+    session = await sync_to_async(_own_session_snapshot)(request, session_id)
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since', '')
+    since = int(since) if since.isdigit() else 0
+    response = StreamingHttpResponse(session_event_stream(session, since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
+@query_budget(18)
 @login_required
 @role_required('teacher')
 def manual_attendance(request, session_id):
@@ -601,15 +817,16 @@ def manual_attendance(request, session_id):
         
         if action == 'mark':
             student_id = request.POST.get('student_id')
-            student = get_object_or_404(Student, id=student_id)
+            student = get_roster(session).get(int(student_id)) if student_id and student_id.isdigit() else None
             
-            if student.batch != session.batch:
+            if student is None:
                 messages.error(request, 'Student not in this batch')
-            elif AttendanceRecord.objects.filter(session=session, student=student).exists():
+            elif not mark_once(session, student):
+                mark_present(session.pk, student.pk)
                 messages.info(request, 'Already marked present')
             else:
-                AttendanceRecord.objects.create(session=session, student=student)
-                messages.success(request, f'{student.user.get_full_name()} marked present')
+                mark_present(session.pk, student.pk)
+                messages.success(request, f'{student.full_name} marked present')
                 
         elif action == 'unmark':
             record_id = request.POST.get('record_id')
@@ -619,182 +836,217 @@ def manual_attendance(request, session_id):
             
         return redirect('manual_attendance', session_id=session_id)
     
-    # Get all students in the batch
-    batch_students = Student.objects.filter(batch=session.batch).select_related('user')
-    present_students = session.records.select_related('student__user').all()
-    present_ids = set(present_students.values_list('student_id', flat=True))
+    # Absent list comes from the roster snapshot; only present records hit the DB
+    roster = get_roster(session)
+    present_students = list(session.records.select_related('student__user').all())
+    present_ids = {r.student_id for r in present_students}
     
-    absent_students = [s for s in batch_students if s.id not in present_ids]
+    absent_students = roster.absent(present_ids)
     
     return render(request, 'teacher/manual_attendance.html', {
         'session': session,
         'present_students': present_students,
-        'absent_students': absent_students
+        'absent_students': absent_students,
+        'roster_size': len(roster),
     })
 
 # --- Student Views ---
 
+@query_budget(8)
 @login_required
 @role_required('student')
 def student_dashboard(request):
     student = request.user.student_profile
     
-    # Get total attendance records
-    total_attendance = AttendanceRecord.objects.filter(student=student).count()
+    # Totals and streak come precomputed from the student's stats row
+    stats = get_stats(student)
+    total_attendance = stats.total_present
     
-    # Calculate attendance percentage
-    # Get total sessions for student's batch
-    if student.batch:
-        total_sessions = AttendanceSession.objects.filter(
-            batch=student.batch,
-            is_active=False  # Only count completed sessions
-        ).count()
-        
-        if total_sessions > 0:
-            attendance_percentage = round((total_attendance / total_sessions) * 100, 1)
-        else:
-            attendance_percentage = 0
+    # Percentage over completed sessions of the student's batch
+    if stats.eligible_sessions > 0:
+        attendance_percentage = round((total_attendance / stats.eligible_sessions) * 100, 1)
     else:
         attendance_percentage = 0
     
-    # Calculate current streak (consecutive days with attendance)
-    from datetime import timedelta
-    current_streak = 0
-    records = AttendanceRecord.objects.filter(student=student).order_by('-timestamp')
-    
-    if records.exists():
-        records_list = list(records)
-        unique_dates = sorted(list(set(r.timestamp.date() for r in records_list)), reverse=True)
-        
-        if unique_dates:
-            expected_date = timezone.now().date()
-            
-            for record_date in unique_dates:
-                if record_date == expected_date:
-                    current_streak += 1
-                    expected_date = record_date - timedelta(days=1)
-                elif record_date == (expected_date - timedelta(days=1)):
-                    current_streak += 1
-                    expected_date = record_date - timedelta(days=1)
-                else:
-                    break
-    
-    # Calculate attendance for the last 7 days
-    today = timezone.now().date()
-    last_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    
-    chart_labels = [day.strftime('%a') for day in last_7_days]
-    chart_data = []
+    # Consecutive attended days (single-day gaps allowed), lapsing after a missed day
+    current_streak = stats.streak_on(timezone.localdate())
     
-    for day in last_7_days:
-        count = AttendanceRecord.objects.filter(
-            student=student,
-            timestamp__date=day
-        ).count()
-        chart_data.append(count)
+    # Attendance for the last 7 days, from the daily rollup
+    chart_labels, chart_data = daily_counts(7, student=student)
     
     context = {
         'total_attendance': total_attendance,
         'attendance_percentage': attendance_percentage,
         'current_streak': current_streak,
+        'subject_attendance': subject_breakdown(student, stats),
         'chart_labels': chart_labels, # Passed as list, will be json_scripted in template
         'chart_data': chart_data,
     }
     
     return render(request, 'student/student_dashboard.html', context)
 
+@query_budget(6)
+@login_required
+@role_required('student')
+def student_subject_attendance(request):
+    """Per-subject attendance percentages for the mobile client."""
+    student = request.user.student_profile
+    subjects = subject_breakdown(student, get_stats(student))
+    # Both over completed sessions (stats.total_present also counts sessions still running)
+    return JsonResponse({
+        'subjects': subjects,
+        'attended': sum(row['attended'] for row in subjects),
+        'held': sum(row['held'] for row in subjects),
+    })
+
+@query_budget(3)
 @login_required
 @role_required('student')
 def scan_qr(request):
     return render(request, 'student/scan_qr.html')
 
+def qr_data_etag(request, session_id):
+    """One ETag per rotation bucket, so duplicate pollers within a bucket get a 304."""
+    session = get_session_snapshot(session_id)
+    if session is None:
+        return None
+    if not session.is_active:
+        return '"inactive"'
+    return f'"{current_bucket()}"'
+
+@query_budget(4)
 @login_required
 @role_required('teacher')
+@condition(etag_func=qr_data_etag)
 def get_qr_data(request, session_id):
-    session = get_object_or_404(AttendanceSession, session_id=session_id)
+    session = get_session_snapshot(session_id)
+    if session is None:
+        raise Http404
     if not session.is_active:
         return JsonResponse({'status': 'error', 'message': 'Session inactive'})
     
-    data = {
-        'session_id': str(session.session_id),
-        'timestamp': time.time()
-    }
-    # Sign the data, valid for limited time (validated in mark_attendance)
-    token = signing.dumps(data)
-    return JsonResponse({'qr_data': token})
+    # Compact signed token, valid for limited time (validated in mark_attendance)
+    token = issue_token(session.session_id)
+    response = JsonResponse({'qr_data': token})
+    # Let the browser reuse the token until the bucket rolls over
+    patch_cache_control(response, private=True, max_age=int(seconds_left_in_bucket()))
+    return response
 
-@login_required
+def _scan_result(outcome, status, message, http_status=200):
+    """JSON reply for a scan, counted under its outcome in metrics.SCAN_OUTCOMES."""
+    metrics.SCAN_OUTCOMES.inc(outcome=outcome)
+    return JsonResponse({'status': status, 'message': message}, status=http_status)
+
+@query_budget(10)
 @role_required('student')
-def mark_attendance(request):
+async def mark_attendance(request):
+    # Async so class-start bursts wait on I/O without holding a worker each;
+    # role_required also redirects anonymous users, so login_required is not needed.
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             token = data.get('token')
             
             try:
-                # Decrypt and validate token
-                # max_age=15 seconds: QR changes every 2s, but give some buffer for scanning/network
-                payload = signing.loads(token, max_age=20)
-                session_uuid_str = payload['session_id']
-                session_uuid = uuid.UUID(session_uuid_str)
+                # Validate token (compact or legacy format)
+                # QR changes every 2s, but QR_TOKEN_MAX_AGE gives some buffer for scanning/network
+                session_uuid = verify_token(token)
             except signing.SignatureExpired:
-                 return JsonResponse({'status': 'error', 'message': 'QR Code expired. Scan faster!'})
+                 return _scan_result('expired', 'error', 'QR Code expired. Scan faster!')
             except signing.BadSignature:
-                 return JsonResponse({'status': 'error', 'message': 'Invalid QR Code'})
+                 return _scan_result('bad_signature', 'error', 'Invalid QR Code')
             except (ValueError, KeyError):
-                 return JsonResponse({'status': 'error', 'message': 'Invalid QR Data'})
+                 return _scan_result('invalid_token', 'error', 'Invalid QR Data')
 
-            session = get_object_or_404(AttendanceSession, session_id=session_uuid)
+            session = await aget_session_snapshot(session_uuid)
+            if session is None:
+                return _scan_result('session_not_found', 'error', 'Session not found')
             
             if not session.is_active:
-                return JsonResponse({'status': 'error', 'message': 'Session has ended'})
+                return _scan_result('session_ended', 'error', 'Session has ended')
             
-            student = request.user.student_profile
+            # request.user was already loaded by role_required
+            student = await Student.objects.select_related('user').aget(user_id=request.user.pk)
             
-            # Check if student belongs to the batch
-            if student.batch != session.batch:
-                return JsonResponse({'status': 'error', 'message': 'You are not in this batch'})
+            # Check if student belongs to the batch (roster captured when the session opened)
+            if student.pk not in await aget_roster(session):
+                return _scan_result('wrong_batch', 'error', 'You are not in this batch')
             
-            # Check if already marked
             # GPS Validation
             student_lat = data.get('latitude')
             student_lon = data.get('longitude')
             
             if session.latitude and session.longitude:
                 if not student_lat or not student_lon:
-                    return JsonResponse({'status': 'error', 'message': 'Location access required for this session'}, status=400)
+                    return _scan_result('location_required', 'error', 'Location access required for this session', 400)
                 
                 distance = calculate_distance(session.latitude, session.longitude, student_lat, student_lon)
                 if distance > session.radius:
-                    log_action(request.user, "Fraud Attempt", f"Student tried to mark attendance from {distance:.1f}m away.")
-                    return JsonResponse({
-                        'status': 'error', 
-                        'message': f'You are too far from the classroom ({distance:.1f}m away)'
-                    }, status=403)
-
-            if AttendanceRecord.objects.filter(session=session, student=student).exists():
-                return JsonResponse({'status': 'info', 'message': 'Attendance already marked'})
+                    await alog_action(request, "Fraud Attempt", f"Student tried to mark attendance from {distance:.1f}m away.")
+                    return _scan_result('too_far', 'error', f'You are too far from the classroom ({distance:.1f}m away)', 403)
+
+            # Check if already marked
+            if await ais_present(session.pk, student.pk):
+                return _scan_result('already_marked', 'info', 'Attendance already marked')
+
+            if session.ingest_mode == AttendanceSession.INGEST_JOURNAL:
+                # Ack once the scan is durable in the journal; the flusher batches the inserts
+                journal = await sync_to_async(get_journal)()
+                if journal.is_pending(session.pk, student.pk) or await AttendanceRecord.objects.filter(session_id=session.pk, student=student).aexists():
+                    await amark_present(session.pk, student.pk)
+                    return _scan_result('already_marked', 'info', 'Attendance already marked')
+                details = f"Marked {student.user.get_full_name()} present for {session.subject_name}"
+                if not await sync_to_async(journal.append, thread_sensitive=False)(session.pk, student.pk, request.user.pk, details):
+                    return _scan_result('already_marked', 'info', 'Attendance already marked')
+                await amark_present(session.pk, student.pk)
+                return _scan_result('success', 'success', 'Attendance marked successfully')
+
+            # Single conditional INSERT (see services.mark_once); no async cursor API exists for it
+            inserted = await sync_to_async(mark_once)(session, student)
+            await amark_present(session.pk, student.pk)
+            if not inserted:
+                return _scan_result('already_marked', 'info', 'Attendance already marked')
             
-            AttendanceRecord.objects.create(session=session, student=student)
-            log_action(request.user, "Mark Attendance", f"Marked {student.user.get_full_name()} present for {session.subject.name}")
+            await alog_action(request, "Mark Attendance", f"Marked {student.user.get_full_name()} present for {session.subject_name}")
             
-            return JsonResponse({'status': 'success', 'message': 'Attendance marked successfully'})
+            return _scan_result('success', 'success', 'Attendance marked successfully')
             
         except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)})
+            return _scan_result('error', 'error', str(e))
             
     return JsonResponse({'status': 'error', 'message': 'Invalid request'})
 
+@query_budget(6)
 @login_required
 @role_required('student')
 def attendance_history(request):
     student = request.user.student_profile
-    records = AttendanceRecord.objects.filter(student=student).order_by('-timestamp')
-    return render(request, 'student/attendance_history.html', {'records': records})
+    records, next_cursor = history_page(student, request.GET, request.GET.get('cursor'))
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return render(request, 'student/attendance_history.html', {
+        'records': records,
+        'subjects': Subject.objects.filter(batch_id=student.batch_id).order_by('name'),
+        'filter_query': params.urlencode(),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+@query_budget(4)
+@login_required
+@role_required('student')
+def student_attendance_history(request):
+    """Paginated attendance history for the mobile client (?subject, ?start, ?end, ?cursor)."""
+    records, next_cursor = history_page(request.user.student_profile, request.GET, request.GET.get('cursor'))
+    return JsonResponse({
+        'records': [dict(r, timestamp=r['timestamp'].isoformat()) for r in records],
+        'next_cursor': next_cursor,
+    })
 
 
 # --- Timetable & Syllabus (Admin upload; Faculty & Student view) ---
 
+@query_budget(10)
 @login_required
 @role_required('admin')
 def admin_timetable(request):
@@ -834,6 +1086,7 @@ def admin_timetable(request):
     })
 
 
+@query_budget(8)
 @login_required
 @role_required('admin')
 def admin_syllabus(request):
@@ -870,6 +1123,7 @@ def admin_syllabus(request):
     })
 
 
+@query_budget(5)
 @login_required
 @role_required('teacher')
 def teacher_timetable(request):
@@ -884,6 +1138,7 @@ def teacher_timetable(request):
     return render(request, 'teacher/teacher_timetable.html', {'slots': slots, 'days': days, 'selected_day': selected_day})
 
 
+@query_budget(6)
 @login_required
 @role_required('teacher')
 def teacher_syllabus(request):
@@ -893,6 +1148,7 @@ def teacher_syllabus(request):
     return render(request, 'teacher/teacher_syllabus.html', {'syllabi': syllabi})
 
 
+@query_budget(6)
 @login_required
 @role_required('student')
 def student_timetable(request):
@@ -909,6 +1165,7 @@ def student_timetable(request):
     return render(request, 'student/student_timetable.html', {'slots': slots, 'days': days, 'selected_day': selected_day})
 
 
+@query_budget(6)
 @login_required
 @role_required('student')
 def student_syllabus(request):
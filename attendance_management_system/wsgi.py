@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_management_system.settings')
 
 application = get_wsgi_application()
+
+# Scans acknowledged from the journal before a restart become visible without waiting for the next one
+from attendance_management_system.journal import replay_in_background  # noqa: E402
+
+replay_in_background()
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: legacy signing.dumps QR tokens vs the compact HMAC format.
+
+    DJANGO_SETTINGS_MODULE=attendance_management_system.settings_sqlite python tests/bench_qr_tokens.py
+
+Reports sign/verify time per token, token length, and the smallest QR version
+that fits the token at error correction level H in byte mode (what qrcodejs uses).
+Compact signing is reported twice: through the per-bucket token cache, which is
+what pollers after the first in a rotation pay, and uncached, the actual mint.
+"""
+import os
+import sys
+import time
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_management_system.settings_sqlite')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core import signing
+
+from attendance_management_system.qr_tokens import _token_for_bucket, current_bucket, issue_token, verify_token
+
+# Byte-mode capacity at error correction level H for QR versions 1-20
+QR_H_BYTE_CAPACITY = [7, 14, 24, 34, 44, 58, 64, 84, 98, 119, 137, 155, 177, 194, 220, 250, 280, 310, 338, 382]
+
+N = 20000
+
+
+def qr_version(length):
+    for version, capacity in enumerate(QR_H_BYTE_CAPACITY, start=1):
+        if length <= capacity:
+            return version
+    return None
+
+
+def legacy_sign(session_uuid):
+    return signing.dumps({'session_id': str(session_uuid), 'timestamp': time.time()})
+
+
+def legacy_verify(token):
+    return uuid.UUID(signing.loads(token, max_age=20)['session_id'])
+
+
+def mint_uncached(session_uuid):
+    return _token_for_bucket.__wrapped__(session_uuid, current_bucket(), settings.SECRET_KEY)
+
+
+def report(name, sign, verify):
+    session_uuid = uuid.uuid4()
+    token = sign(session_uuid)
+    assert verify(token) == session_uuid
+    sign_us = timeit.timeit(lambda: sign(session_uuid), number=N) / N * 1e6
+    verify_us = timeit.timeit(lambda: verify(token), number=N) / N * 1e6
+    version = qr_version(len(token))
+    modules = 17 + 4 * version if version else None
+    print(f"{name:<16} sign {sign_us:7.2f} us  verify {verify_us:7.2f} us  "
+          f"length {len(token):4d}  QR v{version} ({modules}x{modules} modules @ H)")
+
+
+if __name__ == '__main__':
+    report('legacy', legacy_sign, legacy_verify)
+    report('compact cached', issue_token, verify_token)
+    report('compact uncached', mint_uncached, verify_token)
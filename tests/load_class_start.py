@@ -0,0 +1,248 @@
+"""
+Class-start burst load test for mark_attendance.
+
+Seeds N students in one batch, opens a session, then fires concurrent scans with
+valid rotating QR tokens and GPS payloads at a Django live server running
+in-process on a throwaway SQLite database. Reports throughput, latency
+percentiles, an outcome breakdown and DB queries per scan.
+
+    python tests/load_class_start.py --students 300 --concurrency 50 --mode sync
+    python tests/load_class_start.py --students 300 --mode journal --repeat 0.2
+
+Run it against both ingest modes (and after changes to the scan path) to compare
+strategies before a release.
+"""
+import argparse
+import os
+import random
+import re
+import secrets
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DJANGO_SETTINGS_MODULE'] = 'attendance_management_system.settings_sqlite'
+
+# Classroom the session is geofenced to
+CLASS_LAT, CLASS_LON, RADIUS = 28.6139, 77.2090, 100.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=50, help='parallel scanning clients')
+    parser.add_argument('--mode', choices=['sync', 'journal'], default='sync', help='session ingest mode')
+    parser.add_argument('--repeat', type=float, default=0.0, help='fraction of students who scan twice')
+    parser.add_argument('--far', type=float, default=0.0, help='fraction of scans sent from outside the geofence')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep-db', action='store_true', help='leave the SQLite file behind for inspection')
+    return parser.parse_args()
+
+
+def setup_database():
+    fd, path = tempfile.mkstemp(prefix='ams-load-', suffix='.sqlite3')
+    os.close(fd)
+    os.environ['SQLITE_NAME'] = path
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db.backends.signals import connection_created
+
+    def use_wal(sender, connection, **kwargs):
+        # Readers no longer block the writer; closer to how MySQL behaves under load
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+
+    connection_created.connect(use_wal)
+    call_command('migrate', verbosity=0)
+    return path
+
+
+def seed(n_students, mode):
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.test import Client
+
+    from attendance_management_system.models import AttendanceSession, Batch, Student, Subject, Teacher, User
+    from attendance_management_system.roster import snapshot_roster
+
+    batch = Batch.objects.create(name='Load Test', year=2024)
+    subject = Subject.objects.create(name='Load Testing', code='LT101', batch=batch)
+    teacher = Teacher.objects.create(user=User.objects.create_user('load-faculty', password='123', is_teacher=True))
+    teacher.subjects.add(subject)
+
+    password = make_password('123')
+    users = User.objects.bulk_create([
+        User(username=f'load-student-{i}', first_name='Student', last_name=str(i), password=password, is_student=True)
+        for i in range(n_students)
+    ])
+    Student.objects.bulk_create([
+        Student(user=user, batch=batch, roll_number=f'LT{i:05d}') for i, user in enumerate(users)
+    ])
+    # bulk_create skips the post_save that creates each student's stats row
+    call_command('rebuild_student_stats', verbosity=0)
+
+    session = AttendanceSession.objects.create(
+        teacher=teacher, subject=subject, batch=batch,
+        latitude=CLASS_LAT, longitude=CLASS_LON, radius=RADIUS, ingest_mode=mode,
+    )
+    snapshot_roster(session.pk, batch.pk)
+
+    cookies = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        cookies.append(client.cookies['sessionid'].value)
+    return session, cookies
+
+
+class QueryCounter:
+    """execute_wrapper installed on every connection; counts only while enabled."""
+
+    def __init__(self):
+        self.count = 0
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.enabled:
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connection
+        from django.db.backends.signals import connection_created
+
+        connection.execute_wrappers.append(self)
+        connection_created.connect(lambda sender, connection, **kw: connection.execute_wrappers.append(self), weak=False)
+
+
+def start_server():
+    from django.test.testcases import LiveServerThread, _StaticFilesHandler
+
+    server = LiveServerThread('127.0.0.1', _StaticFilesHandler)
+    server.daemon = True
+    server.start()
+    server.is_ready.wait()
+    if server.error:
+        raise server.error
+    return server
+
+
+def jitter(inside):
+    # ~0.0001 deg is ~11 m; 0.01 deg is ~1.1 km
+    spread = 0.0003 if inside else 0.01
+    offset = spread if not inside else 0
+    return (CLASS_LAT + offset + random.uniform(-spread, spread) / 3,
+            CLASS_LON + offset + random.uniform(-spread, spread) / 3)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run(args):
+    import requests
+
+    from attendance_management_system.qr_tokens import issue_token
+
+    random.seed(args.seed)
+    session, cookies = seed(args.students, args.mode)
+    server = start_server()
+    base_url = f'http://127.0.0.1:{server.port}'
+
+    scans = list(range(len(cookies)))
+    scans += random.sample(scans, int(len(cookies) * args.repeat))
+    random.shuffle(scans)
+    far = set(random.sample(range(len(scans)), int(len(scans) * args.far)))
+
+    local = threading.local()
+
+    def scan(job):
+        i, student = job
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+        csrf = secrets.token_hex(16)
+        lat, lon = jitter(inside=i not in far)
+        started = time.perf_counter()
+        try:
+            response = local.http.post(
+                f'{base_url}/api/mark-attendance/',
+                json={'token': issue_token(session.session_id), 'latitude': lat, 'longitude': lon},
+                cookies={'sessionid': cookies[student], 'csrftoken': csrf},
+                headers={'X-CSRFToken': csrf},
+                timeout=60,
+            )
+            elapsed = time.perf_counter() - started
+            try:
+                body = response.json()
+                # Fold distances etc. so messages group into one bucket per outcome
+                message = re.sub(r'[\d.]+', 'N', str(body.get('message')))
+                outcome = f"{response.status_code} {body.get('status')}: {message}"
+            except ValueError:
+                outcome = f"{response.status_code} non-JSON response"
+        except requests.RequestException as e:
+            elapsed = time.perf_counter() - started
+            outcome = f"transport error: {type(e).__name__}"
+        return elapsed, outcome
+
+    counter = QueryCounter()
+    counter.install()
+    counter.enabled = True
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(scan, enumerate(scans)))
+    wall = time.perf_counter() - started
+    counter.enabled = False
+
+    drain = None
+    if args.mode == 'journal':
+        from attendance_management_system.journal import get_journal
+        drain_started = time.perf_counter()
+        get_journal().flush()
+        drain = time.perf_counter() - drain_started
+
+    server.terminate()
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    outcomes = Counter(r[1] for r in results)
+    records = session.records.count()
+
+    print(f"\nmode={args.mode} students={args.students} scans={len(scans)} concurrency={args.concurrency}")
+    print(f"throughput   {len(scans) / wall:8.1f} scans/s  (wall {wall:.2f}s)")
+    print(f"latency ms   p50 {percentile(latencies, 50):7.1f}  p95 {percentile(latencies, 95):7.1f}  "
+          f"p99 {percentile(latencies, 99):7.1f}  max {latencies[-1]:7.1f}  mean {statistics.mean(latencies):7.1f}")
+    print(f"db queries   {counter.count} total, {counter.count / len(scans):.1f} per scan")
+    if drain is not None:
+        print(f"journal      final flush {drain * 1000:.1f} ms")
+    print(f"records      {records} stored for {args.students} students")
+    print("outcomes")
+    for outcome, n in outcomes.most_common():
+        print(f"  {n:6d}  {outcome}")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    db_path = setup_database()
+    try:
+        run(args)
+    finally:
+        if args.keep_db:
+            print(f"\nSQLite database kept at {db_path}")
+        else:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system.models import AttendanceRecord, AttendanceSession, Batch, Subject, User
+from attendance_management_system.rollup import rebuild
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+@override_settings(ATTENDANCE_REPORT_PAGE_SIZE=2)
+class AttendanceReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, self.students = make_session(students=5)
+        now = timezone.now()
+        for i, student in enumerate(self.students):
+            mark_once(self.session, student)
+            # Two records share a timestamp so the id tiebreak is exercised
+            AttendanceRecord.objects.filter(student=student).update(timestamp=now - timedelta(days=min(i, 3)))
+        rebuild()
+        self.client.force_login(User.objects.create_superuser('admin', password='123'))
+
+    def get(self, **params):
+        return self.client.get(reverse('admin_attendance_report'), params)
+
+    def test_cursor_walks_every_record_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            response = self.get(**({'cursor': cursor} if cursor else {}))
+            seen += [r.pk for r in response.context['records']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+        expected = list(AttendanceRecord.objects.order_by('-timestamp', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_date_filters_are_timestamp_ranges(self):
+        today = timezone.localdate()
+        response = self.get(date=str(today - timedelta(days=3)))
+        self.assertEqual(len(response.context['records']), 2)
+        self.assertEqual(response.context['total'], 2)
+
+        response = self.get(start=str(today - timedelta(days=2)), end=str(today - timedelta(days=1)))
+        self.assertEqual(len(response.context['records']), 2)
+
+    def test_total_comes_from_cached_rollup(self):
+        other_batch = Batch.objects.create(name='MBA', year=2024)
+        other = AttendanceSession.objects.create(
+            teacher=self.session.teacher, batch=other_batch,
+            subject=Subject.objects.create(name='Finance', code='FN101', batch=other_batch),
+        )
+        self.assertEqual(self.get(batch=self.session.batch_id).context['total'], 5)
+
+        mark_once(other, self.students[0])
+        self.assertEqual(self.get(batch=self.session.batch_id).context['total'], 5)
+        self.assertEqual(self.get().context['total'], 6)
+        self.assertEqual(self.get(subject=other.subject_id).context['total'], 1)
+
+        # Later pages reuse the cached total
+        cursor = self.get().context['next_cursor']
+        with self.assertNumQueries(5):
+            self.get(cursor=cursor)
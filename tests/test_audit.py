@@ -0,0 +1,137 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system import audit
+from attendance_management_system.audit import AuditBuffer, archive_before
+from attendance_management_system.models import AuditLog, User
+from attendance_management_system.views import log_action
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('faculty', password='123', is_teacher=True)
+
+    def test_entries_are_written_in_one_bulk_insert(self):
+        buffer = AuditBuffer(batch_size=50, flush_interval=None)
+        for i in range(3):
+            buffer.log(self.user.pk, "User Login", f"login {i}")
+        self.assertFalse(AuditLog.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(AuditLog.objects.filter(user=self.user, action="User Login").count(), 3)
+        self.assertEqual(buffer.stats()['written'], 3)
+
+    def test_full_buffer_drops_instead_of_blocking(self):
+        buffer = AuditBuffer(max_pending=2, flush_interval=None)
+        results = [buffer.log(self.user.pk, "Mark Attendance") for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        stats = buffer.stats()
+        self.assertEqual((stats['dropped'], stats['backpressure'], stats['pending']), (1, 1, 2))
+
+    def test_failed_flush_keeps_entries_for_retry(self):
+        buffer = AuditBuffer(flush_interval=None)
+        buffer.log(self.user.pk, "End Session")
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        self.assertEqual(buffer.stats()['pending'], 1)
+
+        buffer.flush()
+        self.assertTrue(AuditLog.objects.filter(action="End Session").exists())
+
+    def test_failed_drain_is_logged(self):
+        buffer = AuditBuffer(flush_interval=None)
+        buffer.log(self.user.pk, "End Session")
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            with self.assertLogs('attendance_management_system.audit', 'ERROR') as logs:
+                audit._drain_at_exit(buffer)
+        self.assertIn('db down', logs.output[0])
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_log_action_does_not_touch_the_database(self):
+        buffer = AuditBuffer(flush_interval=None)
+        with mock.patch.object(audit, '_buffer', buffer):
+            with self.assertNumQueries(0):
+                log_action(self.user, "Create Session", "Networks")
+            buffer.flush()
+        self.assertTrue(AuditLog.objects.filter(user=self.user, action="Create Session").exists())
+
+
+class AuditLogExplorerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='123')
+        self.student = User.objects.create_user('student1', password='123', is_student=True)
+        now = timezone.now()
+        logs = AuditLog.objects.bulk_create(
+            [AuditLog(user=self.student, action="Mark Attendance", details=f"scan {i}") for i in range(7)]
+            + [AuditLog(user=self.student, action="Fraud Attempt", details="from 950.0m away")]
+        )
+        # Pin timestamps (auto_now_add) so two rows share one and the last is a month old
+        for i, log in enumerate(logs):
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(minutes=i // 2))
+        AuditLog.objects.filter(pk=logs[-1].pk).update(timestamp=now - timedelta(days=30))
+        self.client.force_login(self.admin)
+
+    def get(self, **params):
+        return self.client.get(reverse('admin_audit_logs'), params)
+
+    @override_settings(AUDIT_LOG_PAGE_SIZE=3)
+    def test_cursor_pages_cover_every_row_once(self):
+        seen, params = [], {'user': 'student1'}
+        while True:
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            seen += [log.pk for log in response.context['logs']]
+            if not response.context['next_cursor']:
+                break
+            params['cursor'] = response.context['next_cursor']
+
+        expected = list(AuditLog.objects.filter(user=self.student).order_by('-timestamp', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        last_month = (timezone.localdate() - timedelta(days=30)).isoformat()
+
+        fraud = self.get(action="Fraud Attempt", start=last_month, end=last_month).context['logs']
+        self.assertEqual([log.details for log in fraud], ["from 950.0m away"])
+        self.assertEqual(len(self.get(q='scan 3').context['logs']), 1)
+        self.assertEqual(len(self.get(user='nobody').context['logs']), 0)
+
+    @mock.patch.object(audit, '_known_actions', set())
+    def test_action_list_is_cached_until_a_new_action_is_written(self):
+        cache.clear()
+        self.assertEqual(audit.action_choices(), ["Fraud Attempt", "Mark Attendance"])
+        with self.assertNumQueries(0):
+            audit.action_choices()
+
+        with override_settings(AUDIT_LOG_BUFFERED=False):
+            log_action(self.admin, "End Session", "Ended session for Networks")
+            log_action(self.admin, "End Session", "Ended session for Networks")
+        self.assertEqual(audit.action_choices(), ["End Session", "Fraud Attempt", "Mark Attendance"])
+        self.assertEqual(self.get().context['actions'], ["End Session", "Fraud Attempt", "Mark Attendance"])
+
+    def test_archive_moves_old_rows_to_compressed_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            archived, files = archive_before(timezone.now() - timedelta(days=7), directory)
+            (path,) = Path(directory).iterdir()
+            with gzip.open(path, 'rt') as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertEqual((archived, files), (1, 1))
+        self.assertEqual(rows[0]['action'], "Fraud Attempt")
+        self.assertEqual(rows[0]['username'], 'student1')
+        self.assertFalse(AuditLog.objects.filter(action="Fraud Attempt").exists())
+        self.assertEqual(AuditLog.objects.count(), 7)
+        self.assertEqual(audit.action_choices(), ["Mark Attendance"])
@@ -0,0 +1,244 @@
+import array
+import ast
+import csv
+import gzip
+import struct
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system import exports
+from attendance_management_system.models import AttendanceRecord, AttendanceSession, Batch, ExportJob, Subject, User
+from attendance_management_system.services import mark_once
+from attendance_management_system.exports import csv_lines
+from attendance_management_system.snapshot import load_snapshot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .test_services import make_session
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.session, self.students = make_session(students=5)
+        for student in self.students:
+            mark_once(self.session, student)
+        self.client.force_login(User.objects.create_superuser('admin', password='123'))
+
+    def test_streams_every_row_without_per_row_queries(self):
+        response = self.client.post(reverse('export_reports'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['Date', 'Session ID', 'Teacher', 'Subject', 'Batch', 'Student', 'Status'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][2:5], ['', 'Networks', 'B.Tech CSE'])
+
+        # One query per chunk plus the final empty one, whatever the row count
+        with self.assertNumQueries(3):
+            self.assertEqual(len(list(csv_lines(AttendanceRecord.objects.all(), chunk_size=3))), 6)
+
+    def test_filters_match_attendance_report(self):
+        other_batch = Batch.objects.create(name='MBA', year=2024)
+        other = AttendanceSession.objects.create(
+            teacher=self.session.teacher, batch=other_batch,
+            subject=Subject.objects.create(name='Finance', code='FN101', batch=other_batch),
+        )
+        mark_once(other, self.students[0])
+
+        response = self.client.post(reverse('export_reports'), {'batch': other_batch.pk, 'stream': '1'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row[3] for row in rows[1:]], ['Finance'])
+
+        report = self.client.get(reverse('admin_attendance_report'), {'batch': other_batch.pk})
+        self.assertEqual(len(report.context['records']), 1)
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.session, self.students = make_session(students=3)
+        for student in self.students:
+            mark_once(self.session, student)
+        other_batch = Batch.objects.create(name='MBA', year=2024)
+        other = AttendanceSession.objects.create(
+            teacher=self.session.teacher, batch=other_batch,
+            subject=Subject.objects.create(name='Finance', code='FN101', batch=other_batch),
+        )
+        mark_once(other, self.students[0])
+        self.client.force_login(User.objects.create_superuser('admin', password='123'))
+
+    def test_job_writes_gzip_csv_partitioned_by_batch(self):
+        response = self.client.post(reverse('export_reports'), {'subject': ''})
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, reverse('export_job', args=[job.job_id]))
+
+        exports.run(job.pk, processes=0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_parts, job.done_parts, job.row_count), (ExportJob.DONE, 2, 2, 4))
+
+        status = self.client.get(reverse('export_job_status', args=[job.job_id])).json()
+        self.assertEqual(status['progress'], 100)
+        download = self.client.get(status['download_url'])
+        rows = list(csv.reader(gzip.decompress(b''.join(download.streaming_content)).decode().splitlines()))
+        self.assertEqual(rows[0], exports.HEADER)
+        self.assertEqual(sorted(row[4] for row in rows[1:]), ['B.Tech CSE'] * 3 + ['MBA'])
+
+    def test_month_partitions_within_one_batch(self):
+        AttendanceRecord.objects.filter(student=self.students[0], session=self.session).update(
+            timestamp=timezone.now() - timedelta(days=62)
+        )
+        job, _ = exports.submit({'batch': self.session.batch_id})
+        exports.run(job.pk, processes=0)
+        job.refresh_from_db()
+        self.assertGreaterEqual(job.total_parts, 3)
+        self.assertEqual(job.row_count, 3)
+
+    def test_identical_requests_share_a_job_until_it_expires(self):
+        first, created = exports.submit({'batch': str(self.session.batch_id), 'date': ''})
+        self.assertTrue(created)
+        self.assertEqual(exports.submit({'batch': self.session.batch_id}), (first, False))
+
+        exports.run(first.pk, processes=0)
+        first.refresh_from_db()
+        path = exports.artifact_path(first)
+        self.assertTrue(path.exists())
+
+        self.assertEqual(exports.purge_expired(now=first.expires_at), 1)
+        self.assertFalse(path.exists())
+        self.assertEqual(ExportJob.objects.get(pk=first.pk).status, ExportJob.EXPIRED)
+        self.assertTrue(exports.submit({'batch': self.session.batch_id})[1])
+
+
+    def test_stalled_jobs_are_not_reused_and_get_reaped(self):
+        stalled, _ = exports.submit({'batch': self.session.batch_id})
+        running, _ = exports.submit({'batch': self.session.batch_id, 'subject': self.session.subject_id})
+        ExportJob.objects.filter(pk__in=[stalled.pk, running.pk]).update(status=ExportJob.RUNNING)
+        ExportJob.objects.filter(pk=stalled.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=11))
+
+        replacement, created = exports.submit({'batch': self.session.batch_id})
+        self.assertTrue(created)
+        self.assertNotEqual(replacement.pk, stalled.pk)
+
+        self.assertEqual(exports.reap_stale(), 1)
+        self.assertEqual(ExportJob.objects.get(pk=stalled.pk).status, ExportJob.FAILED)
+        self.assertEqual(ExportJob.objects.get(pk=running.pk).status, ExportJob.RUNNING)
+
+
+class ProcessPoolExportTests(TransactionTestCase):
+    """The default path: partitions written by spawned worker processes, which read committed rows."""
+    def test_partitions_run_in_worker_processes(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        session, students = make_session(students=3)
+        for student in students:
+            mark_once(session, student)
+        other_batch = Batch.objects.create(name='MBA', year=2024)
+        other = AttendanceSession.objects.create(
+            teacher=session.teacher, batch=other_batch,
+            subject=Subject.objects.create(name='Finance', code='FN101', batch=other_batch),
+        )
+        mark_once(other, students[0])
+        job = ExportJob.objects.create(filters={}, fingerprint='x')
+
+        with override_settings(MEDIA_ROOT=media.name):
+            exports.run(job.pk, processes=2)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.error, job.done_parts, job.row_count), (ExportJob.DONE, '', 2, 4))
+            with gzip.open(exports.artifact_path(job), 'rt') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], exports.HEADER)
+        self.assertEqual(sorted(row[4] for row in rows[1:]), ['B.Tech CSE'] * 3 + ['MBA'])
+
+def read_npz(path):
+    """Minimal stdlib reader for the 1-d arrays a snapshot holds."""
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED
+            data = archive.read(info)
+            assert data[:8] == b'\x93NUMPY\x01\x00'
+            (header_len,) = struct.unpack('<H', data[8:10])
+            header = ast.literal_eval(data[10:10 + header_len].decode('latin1'))
+            assert (10 + header_len) % 64 == 0
+            body, descr, (length,) = data[10 + header_len:], header['descr'], header['shape']
+            if descr.startswith('<U'):
+                width = int(descr[2:]) * 4
+                values = [body[i:i + width].decode('utf-32-le').rstrip('\0') for i in range(0, len(body), width)]
+            else:
+                values = list(array.array({1: 'b', 4: 'i', 8: 'q'}[int(descr[-1])], body))
+            assert len(values) == length
+            columns[info.filename[:-len('.npy')]] = values
+    return columns
+
+
+class SnapshotExportTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.session, self.students = make_session(students=3)
+        for student in self.students:
+            mark_once(self.session, student)
+        other_batch = Batch.objects.create(name='MBA', year=2024)
+        self.other = AttendanceSession.objects.create(
+            teacher=self.session.teacher, batch=other_batch,
+            subject=Subject.objects.create(name='Finance', code='FN101', batch=other_batch),
+        )
+        mark_once(self.other, self.students[0])
+        self.client.force_login(User.objects.create_superuser('admin', password='123'))
+
+    def run_snapshot(self, **filters):
+        self.client.post(reverse('export_reports'), dict(filters, format='npz'))
+        job = ExportJob.objects.get()
+        exports.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.format), (ExportJob.DONE, ExportJob.SNAPSHOT))
+        return job
+
+    def test_codes_and_lookup_tables(self):
+        job = self.run_snapshot()
+        self.assertEqual(job.row_count, 4)
+        snap = read_npz(exports.artifact_path(job))
+
+        records = AttendanceRecord.objects.order_by('id')
+        self.assertEqual(snap['record_id'], [r.pk for r in records])
+        self.assertEqual([snap['student_id'][c] for c in snap['student']], [r.student_id for r in records])
+        self.assertEqual([snap['subject_name'][c] for c in snap['subject']], ['Networks'] * 3 + ['Finance'])
+        self.assertEqual(snap['batch_name'], ['B.Tech CSE', 'MBA'])
+        self.assertEqual(snap['session_uuid'][snap['session'][-1]], str(self.other.session_id))
+        self.assertEqual(snap['status_label'], ['Present'])
+        self.assertEqual(set(snap['status']), {0})
+        first = records[0].timestamp
+        self.assertEqual(snap['timestamp_us'][0], int(first.timestamp()) * 1_000_000 + first.microsecond)
+
+        download = self.client.get(reverse('export_job_download', args=[job.job_id]))
+        self.assertEqual(download['Content-Type'], 'application/zip')
+
+    def test_filters_and_separate_fingerprint(self):
+        job = self.run_snapshot(batch=self.other.batch_id)
+        self.assertEqual(read_npz(exports.artifact_path(job))['subject_code'], ['FN101'])
+        # A CSV of the same filters is a different job
+        self.assertTrue(exports.submit({'batch': self.other.batch_id})[1])
+
+    @unittest.skipUnless(numpy, 'needs NumPy')
+    def test_load_snapshot_memory_maps_columns(self):
+        job = self.run_snapshot()
+        snap = load_snapshot(exports.artifact_path(job))
+        self.assertIsInstance(snap['record_id'], numpy.memmap)
+        self.assertEqual(list(snap['subject_name'][snap['subject']]), ['Networks'] * 3 + ['Finance'])
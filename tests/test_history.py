@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system.history import history_page
+from attendance_management_system.models import AttendanceRecord, AttendanceSession, Subject
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+@override_settings(HISTORY_PAGE_SIZE=2)
+class AttendanceHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, (self.student,) = make_session()
+        self.maths = Subject.objects.create(name='Maths', code='MA101', batch=self.session.batch)
+        self.sessions = [self.session] + [
+            AttendanceSession.objects.create(teacher=self.session.teacher, subject=subject, batch=self.session.batch)
+            for subject in (self.maths, self.maths)
+        ]
+        for days, session in enumerate(self.sessions):
+            mark_once(session, self.student)
+            AttendanceRecord.objects.filter(session=session).update(timestamp=timezone.now() - timedelta(days=days))
+
+    def test_pages_are_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            rows, cursor = history_page(self.student, {})
+        self.assertEqual([r['subject'] for r in rows], ['Networks', 'Maths'])
+        with self.assertNumQueries(0):
+            self.assertEqual(history_page(self.student, {}), (rows, cursor))
+
+        rows, cursor = history_page(self.student, {}, cursor)
+        self.assertEqual((len(rows), cursor), (1, None))
+
+    def test_new_record_retires_cached_pages(self):
+        history_page(self.student, {})
+        extra = AttendanceSession.objects.create(teacher=self.session.teacher, subject=self.maths, batch=self.session.batch)
+        mark_once(extra, self.student)
+        with self.assertNumQueries(1):
+            rows, _ = history_page(self.student, {})
+        self.assertEqual(rows[0]['id'], AttendanceRecord.objects.get(session=extra).pk)
+
+    def test_subject_and_date_filters(self):
+        rows, cursor = history_page(self.student, {'subject': str(self.maths.pk)})
+        self.assertEqual((len(rows), cursor), (2, None))
+        since = str(timezone.localdate() - timedelta(days=1))
+        self.assertEqual(len(history_page(self.student, {'subject': self.maths.pk, 'start': since})[0]), 1)
+
+    def test_page_and_json_endpoint(self):
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('attendance_history'), {'subject': self.maths.pk})
+        self.assertEqual([r['subject'] for r in response.context['records']], ['Maths', 'Maths'])
+
+        data = self.client.get(reverse('student_attendance_history')).json()
+        self.assertEqual(len(data['records']), 2)
+        self.assertEqual(data['records'][0]['status'], 'Present')
+        data = self.client.get(reverse('student_attendance_history'), {'cursor': data['next_cursor']}).json()
+        self.assertEqual(([r['subject'] for r in data['records']], data['next_cursor']), (['Maths'], None))
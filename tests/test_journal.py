@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from attendance_management_system import journal
+from attendance_management_system.journal import ScanJournal
+from attendance_management_system.models import AttendanceRecord, AuditLog, DailyAttendance
+
+from .test_services import make_session
+
+
+def _dead_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+
+def _write_entries(path, session, students, ts=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        for student in students:
+            f.write(json.dumps({
+                'session': session.pk, 'student': student.pk, 'user': student.user_id,
+                'details': f"Marked {student.pk}", 'ts': ts or time.time(),
+            }) + '\n')
+        f.write('{"session": ')  # torn final line from the crash
+
+
+def _replay(directory, barrier, results):
+    barrier.wait()
+    try:
+        results.put(ScanJournal(directory).replay())
+    finally:
+        connections.close_all()
+
+
+class JournalReplayTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.session, self.students = make_session(students=3)
+
+    def test_dead_process_files_are_applied_once(self):
+        pid = _dead_pid()
+        _write_entries(self.directory / f"scans-{pid}.jsonl", self.session, self.students[:2])
+        _write_entries(self.directory / f"scans-{pid}-1.pending", self.session, self.students[1:])
+
+        self.assertEqual(ScanJournal(self.directory).replay(), 4)
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='Mark Attendance').count(), 3)
+        self.assertEqual(list(self.directory.iterdir()), [])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.present_count, 3)
+
+    def test_segment_that_already_committed_adds_no_audit_rows(self):
+        # Crash between the commit and removing the segment
+        segment = self.directory / f"scans-{_dead_pid()}-1.pending"
+        _write_entries(segment, self.session, self.students)
+        ScanJournal(self.directory)._apply_segment(segment.rename(self.directory / 'copy'))
+        _write_entries(segment, self.session, self.students)
+
+        ScanJournal(self.directory).replay()
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='Mark Attendance').count(), 3)
+
+    def test_replayed_records_keep_the_time_of_the_scan(self):
+        scanned = timezone.now() - timedelta(days=3)
+        _write_entries(self.directory / f"scans-{_dead_pid()}.jsonl", self.session, self.students[:1], ts=scanned.timestamp())
+
+        ScanJournal(self.directory).replay()
+        record = AttendanceRecord.objects.get(session=self.session)
+        self.assertAlmostEqual(record.timestamp.timestamp(), scanned.timestamp(), places=3)
+        self.assertEqual(DailyAttendance.objects.get().day, timezone.localdate(scanned))
+
+    def test_live_process_files_are_left_alone(self):
+        parent = self.directory / f"scans-{os.getppid()}.jsonl"
+        _write_entries(parent, self.session, self.students)
+        self.assertEqual(ScanJournal(self.directory).replay(), 0)
+        self.assertTrue(parent.exists())
+
+
+class ConcurrentJournalReplayTests(TransactionTestCase):
+    def test_workers_replaying_together_apply_each_segment_once(self):
+        cache.clear()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        session, students = make_session(students=4)
+        pid = _dead_pid()
+        for i, student in enumerate(students):
+            _write_entries(directory / f"scans-{pid}-{i}.pending", session, [student])
+
+        # Real processes, like workers starting after a crash; children open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        barrier, results = context.Barrier(2), context.Queue()
+        workers = [context.Process(target=_replay, args=(directory, barrier, results)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(results.get(timeout=5) + results.get(timeout=5), 4)
+        self.assertEqual(AttendanceRecord.objects.filter(session=session).count(), 4)
+        self.assertEqual(AuditLog.objects.filter(action='Mark Attendance').count(), 4)
+        self.assertEqual(list(directory.iterdir()), [])
+
+
+class ReplayAtStartTests(TestCase):
+    def test_started_once_per_process(self):
+        with mock.patch.object(journal, '_replay_started', False), mock.patch.object(journal.threading, 'Thread') as thread:
+            journal.replay_in_background()
+            journal.replay_in_background()
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
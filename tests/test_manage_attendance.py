@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system.models import AttendanceSession, User
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+@override_settings(MANAGE_ATTENDANCE_PAGE_SIZE=2)
+class ManageAttendanceTests(TestCase):
+    def setUp(self):
+        self.session, self.students = make_session(students=3)
+        self.sessions = [self.session]
+        for days in range(1, 4):
+            session = AttendanceSession.objects.create(
+                teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch,
+            )
+            AttendanceSession.objects.filter(pk=session.pk).update(start_time=timezone.now() - timedelta(days=days))
+            self.sessions.append(session)
+        for student in self.students:
+            mark_once(self.session, student)
+        self.client.force_login(User.objects.create_superuser('admin', password='123'))
+
+    def test_pages_of_sessions_in_constant_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('manage_attendance'))
+        self.assertEqual([s.pk for s in response.context['sessions']], [s.pk for s in self.sessions[:2]])
+        self.assertContains(response, '<td>3</td>', html=True)
+        self.assertNotContains(response, self.students[0].roll_number)
+
+        response = self.client.get(reverse('manage_attendance'), {'cursor': response.context['next_cursor']})
+        self.assertEqual([s.pk for s in response.context['sessions']], [s.pk for s in self.sessions[2:]])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_records_endpoint_is_one_joined_query(self):
+        url = reverse('admin_session_records', args=[self.session.session_id])
+        self.client.get(url)
+        # Auth session and user, then the records
+        with self.assertNumQueries(3):
+            data = self.client.get(url).json()
+        self.assertEqual([r['roll_number'] for r in data['records']], [s.roll_number for s in self.students])
+        self.assertEqual(data['records'][0]['delete_url'], reverse('delete_attendance_record', args=[data['records'][0]['id']]))
+
+        empty = self.client.get(reverse('admin_session_records', args=[self.sessions[1].session_id])).json()
+        self.assertEqual(empty, {'records': []})
@@ -0,0 +1,110 @@
+import json
+import shutil
+import tempfile
+import time
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from attendance_management_system import background
+from attendance_management_system import journal as journal_module
+from attendance_management_system.models import AttendanceRecord, AttendanceSession, AuditLog
+from attendance_management_system.qr_tokens import issue_token
+
+from .test_services import make_session
+
+
+class MarkAttendanceViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, (self.student,) = make_session()
+        self.client.force_login(self.student.user)
+
+    def scan(self, session=None):
+        session = session or self.session
+        token = signing.dumps({'session_id': str(session.session_id), 'timestamp': time.time()})
+        response = self.client.post('/api/mark-attendance/', json.dumps({'token': token}), content_type='application/json')
+        return response.json()
+
+    def test_scan_marks_once(self):
+        self.assertEqual(self.scan()['status'], 'success')
+        self.assertEqual(self.scan()['status'], 'info')
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 1)
+
+    def test_compact_token_from_qr_endpoint(self):
+        response = self.client.post(
+            '/api/mark-attendance/', json.dumps({'token': issue_token(self.session.session_id)}), content_type='application/json'
+        )
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_ended_session_rejects_scan(self):
+        self.session.is_active = False
+        self.session.save()
+
+        self.assertEqual(self.scan()['message'], 'Session has ended')
+
+    def test_tampered_token_is_rejected(self):
+        token = signing.dumps({'session_id': str(self.session.session_id), 'timestamp': time.time()})
+        response = self.client.post('/api/mark-attendance/', json.dumps({'token': token[:-2] + 'xx'}), content_type='application/json')
+        self.assertEqual(response.json()['message'], 'Invalid QR Code')
+
+
+class JournaledMarkAttendanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir, ignore_errors=True)
+        self.override = override_settings(ATTENDANCE_JOURNAL_DIR=self.journal_dir, ATTENDANCE_JOURNAL_FLUSH_INTERVAL=3600)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        journal_module._journal = None
+        self.addCleanup(setattr, journal_module, '_journal', None)
+
+        self.session, (self.student,) = make_session()
+        self.session.ingest_mode = AttendanceSession.INGEST_JOURNAL
+        self.session.save()
+        self.client.force_login(self.student.user)
+
+    def test_scan_is_acked_then_flushed_in_batch(self):
+        token = signing.dumps({'session_id': str(self.session.session_id), 'timestamp': time.time()})
+        post = lambda: self.client.post('/api/mark-attendance/', json.dumps({'token': token}), content_type='application/json').json()
+
+        self.assertEqual(post()['status'], 'success')
+        self.assertEqual(post()['status'], 'info')
+        self.assertFalse(AttendanceRecord.objects.filter(session=self.session).exists())
+
+        self.assertEqual(journal_module.get_journal().flush(), 1)
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 1)
+        self.assertEqual(AuditLog.objects.filter(action='Mark Attendance').count(), 1)
+
+
+class AsyncMarkAttendanceTests(TransactionTestCase):
+    # Deferred audit writes run on their own connection, so no wrapping transaction
+    def setUp(self):
+        cache.clear()
+        self.session, (self.student,) = make_session()
+        self.session.latitude, self.session.longitude = 28.6139, 77.2090
+        self.session.save()
+
+    async def scan(self, **location):
+        await sync_to_async(self.async_client.force_login)(self.student.user)
+        body = json.dumps({'token': issue_token(self.session.session_id), **location})
+        response = await self.async_client.post('/api/mark-attendance/', body, content_type='application/json')
+        await background.drain()
+        return response
+
+    async def test_asgi_scan_marks_and_audits_after_response(self):
+        response = await self.scan(latitude=28.6139, longitude=77.2090)
+
+        self.assertEqual(response.json(), {'status': 'success', 'message': 'Attendance marked successfully'})
+        self.assertTrue(await AttendanceRecord.objects.filter(session=self.session).aexists())
+        self.assertTrue(await AuditLog.objects.filter(action='Mark Attendance').aexists())
+
+    async def test_asgi_scan_too_far_is_logged_as_fraud(self):
+        response = await self.scan(latitude=19.0760, longitude=72.8777)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertTrue(await AuditLog.objects.filter(action='Fraud Attempt').aexists())
@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core import signing
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from attendance_management_system import metrics
+from attendance_management_system.models import User
+from attendance_management_system.qr_tokens import issue_token
+
+from .test_services import make_session
+
+
+def _other_worker():
+    metrics.SCAN_OUTCOMES.inc(2, outcome='success')
+    metrics.CACHE_LOOKUPS.inc(3, cache='session', result='hit')
+    metrics.AUDIT_LOG_PENDING.set(7)
+    metrics.flush()
+
+
+@override_settings(METRICS_DIR=None)
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.session, (self.student,) = make_session()
+        self.admin = User.objects.create_superuser('admin', password='123')
+
+    def scan(self, payload):
+        self.client.force_login(self.student.user)
+        return self.client.post(reverse('mark_attendance'), json.dumps(payload), content_type='application/json').json()
+
+    def test_scan_outcomes_latency_and_cache_ratio(self):
+        token = signing.dumps({'session_id': str(self.session.session_id), 'timestamp': time.time()})
+        self.assertEqual(self.scan({'token': token})['status'], 'success')
+        self.assertEqual(self.scan({'token': token})['status'], 'info')
+        self.scan({'token': token + 'x'})
+        self.scan({'token': issue_token(self.session.session_id, now=time.time() - 3600)})
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        for line in (
+            'ams_scan_outcomes_total{outcome="success"} 1',
+            'ams_scan_outcomes_total{outcome="already_marked"} 1',
+            'ams_scan_outcomes_total{outcome="bad_signature"} 1',
+            'ams_scan_outcomes_total{outcome="expired"} 1',
+            'ams_request_duration_seconds_count{view="mark_attendance"} 4',
+            'ams_request_duration_seconds_bucket{view="mark_attendance",le="+Inf"} 4',
+            'ams_cache_lookups_total{cache="session",result="miss"} 1',
+            'ams_cache_lookups_total{cache="session",result="hit"} 1',
+            'ams_cache_hit_ratio{cache="session"} 0.5',
+            '# TYPE ams_request_duration_seconds histogram',
+        ):
+            self.assertIn(line + '\n', text)
+
+    def test_admin_only(self):
+        self.client.force_login(self.student.user)
+        self.assertEqual(self.client.get(reverse('admin_metrics')).status_code, 403)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.001, 0.005, 0.2, 30):
+            metrics.REQUEST_LATENCY.observe(seconds, view='x')
+        text = metrics.render()
+        self.assertIn('ams_request_duration_seconds_bucket{view="x",le="0.005"} 2\n', text)
+        self.assertIn('ams_request_duration_seconds_bucket{view="x",le="0.25"} 3\n', text)
+        self.assertIn('ams_request_duration_seconds_bucket{view="x",le="10.0"} 3\n', text)
+        self.assertIn('ams_request_duration_seconds_bucket{view="x",le="+Inf"} 4\n', text)
+        self.assertIn('ams_request_duration_seconds_sum{view="x"} 30.206\n', text)
+
+    def test_label_values_are_escaped(self):
+        metrics.CACHE_LOOKUPS.inc(cache='a"b\\c', result='hit')
+        self.assertIn('ams_cache_lookups_total{cache="a\\"b\\\\c",result="hit"} 1\n', metrics.render())
+
+    def use_directory(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(METRICS_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        return directory
+
+    def write_worker(self, path, pid, start, success):
+        path.write_text(json.dumps({
+            'pid': pid, 'start': start,
+            'metrics': {'ams_scan_outcomes_total': [[['success'], success]], 'ams_audit_log_pending': [[[], 5]]},
+        }))
+
+    def test_values_are_summed_across_processes(self):
+        directory = self.use_directory()
+        worker = multiprocessing.get_context('fork').Process(target=_other_worker)
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+
+        metrics.SCAN_OUTCOMES.inc(outcome='success')
+        metrics.cache_lookup('session', hit=False)
+        totals = metrics.collect()
+        self.assertEqual(totals['ams_scan_outcomes_total'], {('success',): 3})
+        self.assertEqual(totals['ams_cache_hit_ratio'], {('session',): 0.75})
+        # Gauges of exited workers are dropped; their counters still count, from the compacted file
+        self.assertEqual(totals['ams_audit_log_pending'], {})
+        self.assertEqual(sorted(p.name for p in directory.glob('*.json')), [metrics.COMPACTED])
+        self.assertEqual(metrics.collect()['ams_scan_outcomes_total'], {('success',): 3})
+
+    def test_reused_pid_is_not_taken_for_the_old_worker(self):
+        directory = self.use_directory()
+        parent = os.getppid()
+        self.write_worker(directory / 'metrics-1-1.json', parent, metrics._process_start(parent), 2)
+        self.write_worker(directory / 'metrics-2-2.json', parent, -1, 3)
+
+        totals = metrics.collect()
+        self.assertEqual(totals['ams_scan_outcomes_total'], {('success',): 5})
+        self.assertEqual(totals['ams_audit_log_pending'], {(): 5})
+        self.assertTrue((directory / 'metrics-1-1.json').exists())
+        self.assertFalse((directory / 'metrics-2-2.json').exists())
+
+    def test_file_left_behind_by_an_interrupted_compaction_counts_once(self):
+        directory = self.use_directory()
+        self.write_worker(directory / 'metrics-3-3.json', os.getppid(), -1, 4)
+        (directory / metrics.COMPACTED).write_text(json.dumps({
+            'merged': ['metrics-3-3.json'], 'metrics': {'ams_scan_outcomes_total': [[['success'], 4]]},
+        }))
+
+        self.assertEqual(metrics.collect()['ams_scan_outcomes_total'], {('success',): 4})
+        self.assertFalse((directory / 'metrics-3-3.json').exists())
+        self.assertEqual(metrics.collect()['ams_scan_outcomes_total'], {('success',): 4})
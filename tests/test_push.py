@@ -0,0 +1,70 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+
+from attendance_management_system.push import session_event_stream
+from attendance_management_system.services import mark_once
+from attendance_management_system.session_cache import get_session_snapshot
+
+from .test_services import make_session
+
+
+async def next_event(stream, name, timeout=5):
+    while True:
+        frame = await asyncio.wait_for(anext(stream), timeout)
+        if f"event: {name}" in frame:
+            return frame
+
+
+class SessionEventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def mark_and_commit(self, session, student):
+        # The test transaction never commits, so run the on_commit notification here
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_once(session, student)
+
+    async def test_stream_pushes_qr_and_new_records(self):
+        session, students = await sync_to_async(make_session)(students=2)
+        snapshot = await sync_to_async(get_session_snapshot)(session.session_id)
+        stream = session_event_stream(snapshot)
+        try:
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            self.assertIn('qr_data', await next_event(stream, 'qr'))
+            self.assertIn('"count": 0', await next_event(stream, 'attendance'))
+
+            await sync_to_async(self.mark_and_commit)(session, students[0])
+            frame = await next_event(stream, 'attendance')
+            self.assertIn('"count": 1', frame)
+        finally:
+            await stream.aclose()
+
+    async def test_stream_ends_with_session(self):
+        session, _ = await sync_to_async(make_session)(students=0)
+        snapshot = await sync_to_async(get_session_snapshot)(session.session_id)
+        session.is_active = False
+        await session.asave()
+
+        stream = session_event_stream(snapshot)
+        try:
+            await anext(stream)
+            self.assertIn('event: end', await anext(stream))
+        finally:
+            await stream.aclose()
+
+
+class SessionStreamViewTests(TestCase):
+    def test_wsgi_request_falls_back_to_polling(self):
+        session, _ = make_session(students=0)
+        self.client.force_login(session.teacher.user)
+
+        response = self.client.get(f'/api/session/{session.session_id}/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_anonymous_user_is_redirected(self):
+        session, _ = make_session(students=0)
+        response = self.client.get(f'/api/session/{session.session_id}/stream/')
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from attendance_management_system import qr_tokens
+
+from .test_services import make_session
+
+
+class QrDataPollingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, _ = make_session(students=0)
+        self.client.force_login(self.session.teacher.user)
+        self.url = f'/api/session/{self.session.session_id}/qr-data/'
+
+    def test_response_carries_etag_and_cache_control(self):
+        response = self.client.get(self.url)
+
+        self.assertIn('qr_data', response.json())
+        self.assertTrue(response['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_duplicate_poller_in_same_bucket_gets_304(self):
+        # Mid-bucket and frozen, so the two polls cannot straddle a rotation
+        bucket = qr_tokens.bucket_seconds()
+        now = qr_tokens.current_bucket() * bucket + bucket / 2
+        with mock.patch.object(qr_tokens.time, 'time', return_value=now):
+            first = self.client.get(self.url)
+            second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+        with mock.patch.object(qr_tokens.time, 'time', return_value=now + bucket):
+            third = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_polls_in_same_bucket_share_token_without_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):  # session + user lookups for auth only
+            self.client.get(self.url)
+
+    def test_ended_session_changes_etag(self):
+        first = self.client.get(self.url)
+        self.session.is_active = False
+        self.session.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.json()['message'], 'Session inactive')
@@ -0,0 +1,56 @@
+import time
+import uuid
+
+from django.core import signing
+from django.test import SimpleTestCase, override_settings
+
+from attendance_management_system.qr_tokens import TOKEN_LENGTH, issue_token, verify_token
+
+
+class CompactTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.session_uuid = uuid.uuid4()
+
+    def test_round_trip(self):
+        token = issue_token(self.session_uuid)
+        self.assertEqual(len(token), TOKEN_LENGTH)
+        self.assertEqual(verify_token(token), self.session_uuid)
+
+    def test_expired(self):
+        token = issue_token(self.session_uuid, now=time.time() - 60)
+        with self.assertRaises(signing.SignatureExpired):
+            verify_token(token, max_age=20)
+
+    def test_tampered_uuid_is_rejected(self):
+        token = issue_token(self.session_uuid)
+        tampered = token[:5] + ('A' if token[5] != 'A' else 'B') + token[6:]
+        with self.assertRaises(signing.BadSignature):
+            verify_token(tampered)
+
+    def test_future_bucket_is_rejected(self):
+        token = issue_token(self.session_uuid, now=time.time() + 60)
+        with self.assertRaises(signing.BadSignature):
+            verify_token(token)
+
+    def test_fallback_secret_still_verifies(self):
+        token = issue_token(self.session_uuid)
+        with self.settings(SECRET_KEY='rotated-key', SECRET_KEY_FALLBACKS=[self._secret()]):
+            self.assertEqual(verify_token(token), self.session_uuid)
+
+    def _secret(self):
+        from django.conf import settings
+        return settings.SECRET_KEY
+
+
+class LegacyTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.session_uuid = uuid.uuid4()
+        self.token = signing.dumps({'session_id': str(self.session_uuid), 'timestamp': time.time()})
+
+    def test_legacy_token_accepted_during_rollout(self):
+        self.assertEqual(verify_token(self.token), self.session_uuid)
+
+    @override_settings(QR_TOKEN_ACCEPT_LEGACY=False)
+    def test_legacy_token_rejected_after_rollout(self):
+        with self.assertRaises(signing.BadSignature):
+            verify_token(self.token)
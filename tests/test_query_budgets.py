@@ -0,0 +1,148 @@
+import json
+import time
+
+from django.core import signing
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import URLPattern, reverse
+
+from attendance_management_system import sql_budget, urls
+from attendance_management_system.models import AttendanceSession, ExportJob, User
+from attendance_management_system.services import mark_once
+from attendance_management_system.sql_budget import QueryBudgetExceeded
+
+from .test_services import make_session
+
+
+class ViewBudgetTests(TestCase):
+    """
+    Requests every view with enough rows that a per-row query would show; the
+    middleware fails any request over the view's declared @query_budget.
+    """
+    def setUp(self):
+        cache.clear()
+        sql_budget.reset()
+        self.session, self.students = make_session(students=6)
+        self.teacher = self.session.teacher.user
+        self.ended = AttendanceSession.objects.create(
+            teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch,
+        )
+        for session in (self.session, self.ended):
+            for student in self.students:
+                mark_once(session, student)
+        self.ended.is_active = False
+        self.ended.save(update_fields=['is_active'])
+        self.session.teacher.subjects.add(self.session.subject)
+        self.admin = User.objects.create_superuser('admin', password='123')
+        self.job = ExportJob.objects.create(filters={}, fingerprint='x')
+
+    def visit(self, user, name, *args, method='get', data=None, **extra):
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+        response = getattr(self.client, method)(reverse(name, args=args), data or {}, **extra)
+        self.assertLess(response.status_code, 500, name)
+        return response
+
+    def test_admin_views(self):
+        session_id, batch, subject = self.session.session_id, self.session.batch_id, self.session.subject_id
+        for name, args in [
+            ('admin_dashboard', ()), ('manage_users', ()), ('edit_user', (self.teacher.pk,)),
+            ('manage_attendance', ()), ('admin_session_records', (session_id,)),
+            ('manage_batches', ()), ('edit_batch', (batch,)), ('manage_subjects', ()), ('edit_subject', (subject,)),
+            ('admin_attendance_report', ()), ('export_reports', ()), ('export_job', (self.job.job_id,)),
+            ('export_job_status', (self.job.job_id,)), ('admin_timetable', ()), ('admin_syllabus', ()),
+            ('admin_audit_logs', ()), ('admin_metrics', ()), ('profile', ()),
+        ]:
+            self.visit(self.admin, name, *args)
+        self.visit(self.admin, 'admin_attendance_report', data={'batch': batch, 'subject': subject})
+        self.visit(self.admin, 'export_reports', method='post', data={'batch': batch})
+        record = self.students[0].attendance_records.first()
+        self.visit(self.admin, 'delete_attendance_record', record.pk, method='post')
+
+    def test_teacher_views(self):
+        session_id = self.session.session_id
+        for name, args in [
+            ('teacher_dashboard', ()), ('teacher_timetable', ()), ('teacher_syllabus', ()), ('create_session', ()),
+            ('session_qr', (session_id,)), ('manual_attendance', (session_id,)),
+            ('get_session_attendance', (session_id,)), ('get_qr_data', (session_id,)), ('session_stream', (session_id,)),
+        ]:
+            self.visit(self.teacher, name, *args)
+        self.visit(self.teacher, 'create_session', method='post',
+                   data={'subject': self.session.subject_id, 'batch': self.session.batch_id})
+        fresh = AttendanceSession.objects.exclude(pk__in=[self.session.pk, self.ended.pk]).get()
+        self.visit(self.teacher, 'manual_attendance', fresh.session_id, method='post',
+                   data={'action': 'mark', 'student_id': self.students[0].pk})
+        record = fresh.records.get()
+        self.visit(self.teacher, 'manual_attendance', fresh.session_id, method='post',
+                   data={'action': 'unmark', 'record_id': record.pk})
+        self.visit(self.teacher, 'session_qr', session_id, method='post', data={'end_session': '1'})
+
+    def test_student_views(self):
+        student = self.students[0].user
+        for name in ('student_dashboard', 'student_subject_attendance', 'scan_qr', 'attendance_history',
+                     'student_attendance_history', 'student_timetable', 'student_syllabus', 'profile'):
+            self.visit(student, name)
+        fresh = AttendanceSession.objects.create(
+            teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch,
+        )
+        token = signing.dumps({'session_id': str(fresh.session_id), 'timestamp': time.time()})
+        response = self.visit(student, 'mark_attendance', method='post', data=json.dumps({'token': token}),
+                              content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_public_views(self):
+        for name in ('index', 'login', 'register'):
+            self.visit(None, name)
+        self.visit(None, 'login', method='post', data={'username': 'admin', 'password': '123'})
+        self.visit(self.admin, 'logout')
+
+    def test_every_view_declares_a_budget(self):
+        missing = [
+            p.name for p in urls.urlpatterns
+            if isinstance(p, URLPattern) and getattr(p.callback, 'query_budget', None) is None
+        ]
+        self.assertEqual(missing, [])
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sql_budget.reset()
+        self.session, (self.student,) = make_session()
+        self.client.force_login(self.student.user)
+
+    def test_over_budget_fails_in_tests_and_warns_otherwise(self):
+        with override_settings(SQL_BUDGETS={'student_dashboard': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('student_dashboard'))
+            with override_settings(SQL_BUDGET_STRICT=False), self.assertLogs('attendance_management_system.sql_budget', 'WARNING') as logs:
+                self.assertEqual(self.client.get(reverse('student_dashboard')).status_code, 200)
+        self.assertIn('SQL budget warning: student_dashboard ran', logs.output[0])
+        self.assertIn('Slowest: ', logs.output[0])
+        self.assertEqual(sql_budget.stats()['student_dashboard']['over_budget'], 2)
+
+
+class MarkAttendanceBudgetTests(TransactionTestCase):
+    """
+    The scan as production runs it: autocommit rather than inside a test
+    transaction, and nothing cached yet.
+    """
+    def test_a_cold_scan_fits_the_budget(self):
+        session, (student,) = make_session()
+        self.client.force_login(student.user)
+        cache.clear()
+        sql_budget.reset()
+        token = signing.dumps({'session_id': str(session.session_id), 'timestamp': time.time()})
+        response = self.client.post(reverse('mark_attendance'), json.dumps({'token': token}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        view = sql_budget.stats()['mark_attendance']
+        # Auth session, user, the session snapshot, student profile and roster; then the insert,
+        # its three follow-up writes and the audit row (inline under the test settings). The
+        # BEGIN IMMEDIATE that SQLite runs through the cursor is transaction control, not counted.
+        self.assertEqual(view['queries'], 10)
+        self.assertEqual(view['requests'], 1)
+        self.assertEqual(view['over_budget'], 0)
+        self.assertTrue(view['slowest'])
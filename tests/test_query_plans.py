@@ -0,0 +1,137 @@
+"""
+Query-plan regression tests.
+
+Each dashboard / report view is requested with the test client, and every
+SELECT it runs against one of the large tables is EXPLAINed. A table read
+without any index (SQLite ``SCAN <table>``, MySQL ``access_type: ALL`` with no
+candidate keys) fails the test, so a view change that drops an index from its
+access path is caught here rather than in production.
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system.models import (
+    AttendanceRecord, AttendanceSession, AuditLog, DailyAttendance, StudentStats, User,
+)
+from attendance_management_system.pagination import encode_cursor
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+LARGE_TABLES = {
+    model._meta.db_table for model in (AttendanceRecord, AttendanceSession, AuditLog, DailyAttendance, StudentStats)
+}
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)$')
+# Subqueries and repeated joins name their tables by alias: FROM "table" U0
+TABLE_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+
+def _mysql_tables(node):
+    if isinstance(node, dict):
+        if 'table_name' in node and 'access_type' in node:
+            yield node
+        for value in node.values():
+            yield from _mysql_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_tables(value)
+
+
+def unindexed_tables(sql, params=None):
+    """Large tables the backend would read without an index for `sql`."""
+    aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            scans = [SQLITE_SCAN.match(row[-1]) for row in cursor.fetchall()]
+            return {aliases.get(m.group(1), m.group(1)) for m in scans if m} & LARGE_TABLES
+        cursor.execute('EXPLAIN FORMAT=JSON ' + sql, params)
+        plan = json.loads(cursor.fetchone()[0])
+        # Tiny test tables may make MySQL prefer a scan; only a scan with no usable key is a regression
+        return {
+            aliases.get(t['table_name'], t['table_name']) for t in _mysql_tables(plan)
+            if t['access_type'] == 'ALL' and not t.get('possible_keys')
+        } & LARGE_TABLES
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            self.skipTest('EXPLAIN parsing covers SQLite and MySQL')
+        cache.clear()
+        self.session, self.students = make_session(students=3)
+        for student in self.students:
+            mark_once(self.session, student)
+        ended = AttendanceSession.objects.create(
+            teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch, is_active=False,
+        )
+        mark_once(ended, self.students[0])
+        self.admin = User.objects.create_superuser('admin', password='123')
+        AuditLog.objects.create(action='Login', user=self.admin, details='seed')
+        self.today = str(timezone.localdate())
+        self.week_ago = str(timezone.localdate() - timedelta(days=7))
+
+    def assertIndexed(self, user, name, *args, params=None, method='get', allowed=()):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(reverse(name, args=args), params or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, name)
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in LARGE_TABLES):
+                continue
+            checked += 1
+            scanned = unindexed_tables(sql) - {model._meta.db_table for model in allowed}
+            self.assertEqual(scanned, set(), f"{name} {params or ''} scans without an index:\n{sql}")
+        return checked
+
+    def test_admin_views(self):
+        batch, subject = self.session.batch_id, self.session.subject_id
+        self.assertIndexed(self.admin, 'admin_dashboard')
+        # The unfiltered total sums the whole rollup (cached; see ATTENDANCE_REPORT_COUNT_TIMEOUT)
+        self.assertTrue(self.assertIndexed(self.admin, 'admin_attendance_report', allowed=[DailyAttendance]))
+        for params in ({'date': self.today}, {'start': self.week_ago, 'end': self.today},
+                       {'batch': batch}, {'batch': batch, 'subject': subject}, {'subject': subject, 'date': self.today}):
+            self.assertTrue(self.assertIndexed(self.admin, 'admin_attendance_report', params=params))
+        record = AttendanceRecord.objects.order_by('id').first()
+        self.assertIndexed(self.admin, 'admin_attendance_report', params={'cursor': encode_cursor(record.timestamp, record.pk)},
+                           allowed=[DailyAttendance])
+
+        self.assertIndexed(self.admin, 'manage_attendance')
+        self.assertIndexed(self.admin, 'admin_session_records', self.session.session_id)
+        for params in ({}, {'action': 'Login'}, {'user': 'admin'}, {'start': self.week_ago, 'end': self.today}):
+            self.assertIndexed(self.admin, 'admin_audit_logs', params=params)
+        self.assertIndexed(self.admin, 'export_reports', params={'batch': batch, 'stream': '1'}, method='post')
+
+    def test_teacher_views(self):
+        teacher = self.session.teacher.user
+        self.assertTrue(self.assertIndexed(teacher, 'teacher_dashboard'))
+        self.assertIndexed(teacher, 'get_session_attendance', self.session.session_id)
+
+    def test_student_views(self):
+        student = self.students[0].user
+        self.assertTrue(self.assertIndexed(student, 'student_dashboard'))
+        for params in ({}, {'subject': self.session.subject_id}, {'start': self.week_ago, 'end': self.today}):
+            self.assertTrue(self.assertIndexed(student, 'attendance_history', params=params))
+        self.assertIndexed(student, 'student_subject_attendance')
+
+    def test_detects_an_unindexed_filter(self):
+        sql, params = AttendanceRecord.objects.filter(status='Absent').query.sql_with_params()
+        self.assertEqual(unindexed_tables(sql, params), {AttendanceRecord._meta.db_table})
+
+    def test_detects_an_unindexed_subquery(self):
+        absent = AttendanceRecord.objects.filter(status='Absent').values('session_id')
+        sql, params = AttendanceSession.objects.filter(pk__in=absent).query.sql_with_params()
+        self.assertIn(' U0 ', sql)
+        self.assertEqual(unindexed_tables(sql, params), {AttendanceRecord._meta.db_table})
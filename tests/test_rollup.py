@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system.models import AttendanceRecord, DailyAttendance
+from attendance_management_system.rollup import daily_counts, rebuild, refresh_sessions
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.session, self.students = make_session(students=3)
+
+    def rollup(self):
+        return list(DailyAttendance.objects.order_by('student_id').values_list('student_id', 'count'))
+
+    def test_mark_once_and_orm_writes_keep_rollup_in_step(self):
+        mark_once(self.session, self.students[0])
+        mark_once(self.session, self.students[0])
+        AttendanceRecord.objects.create(session=self.session, student=self.students[1])
+        self.assertEqual(self.rollup(), [(self.students[0].pk, 1), (self.students[1].pk, 1)])
+
+        AttendanceRecord.objects.get(student=self.students[0]).delete()
+        self.assertEqual(self.rollup(), [(self.students[1].pk, 1)])
+
+    def test_refresh_after_bulk_insert(self):
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(session=self.session, student=s) for s in self.students])
+        refresh_sessions({self.session.pk})
+        self.assertEqual(self.rollup(), [(s.pk, 1) for s in self.students])
+
+    def test_rebuild_matches_records(self):
+        for student in self.students:
+            mark_once(self.session, student)
+        old = AttendanceRecord.objects.get(student=self.students[2])
+        AttendanceRecord.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=2))
+        before = daily_counts(7)
+
+        self.assertEqual(rebuild(), 3)
+        labels, counts = daily_counts(7)
+        self.assertEqual(counts[-1], 2)
+        self.assertEqual(counts[-3], 1)
+        self.assertNotEqual(before, (labels, counts))
+
+    def test_chart_is_one_query(self):
+        mark_once(self.session, self.students[0])
+        with self.assertNumQueries(1):
+            labels, counts = daily_counts(7, teacher=self.session.teacher)
+        self.assertEqual(len(labels), 7)
+        self.assertEqual(counts, [0] * 6 + [1])
+
+    def test_dashboards_read_rollup(self):
+        mark_once(self.session, self.students[0])
+        self.client.force_login(self.students[0].user)
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.context['chart_data'][-1], 1)
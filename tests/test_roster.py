@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from attendance_management_system.models import Batch, Student, User
+from attendance_management_system.roster import ROSTER_PREFIX, get_roster, is_present, mark_present, snapshot_roster
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+class RosterSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, self.students = make_session(students=3)
+        snapshot_roster(self.session.pk, self.session.batch_id)
+
+    def test_membership_is_served_from_cache(self):
+        with self.assertNumQueries(0):
+            roster = get_roster(self.session)
+        self.assertEqual(len(roster), 3)
+        self.assertIn(self.students[0].pk, roster)
+
+    def test_decoded_roster_is_reused_until_recaptured(self):
+        roster = get_roster(self.session)
+        self.assertIs(get_roster(self.session), roster)
+        # Another worker recaptures: only the version token tells this one to decode again
+        cache.set_many({
+            f"{ROSTER_PREFIX}{self.session.pk}": ('elsewhere', []),
+            f"{ROSTER_PREFIX}version:{self.session.pk}": 'elsewhere',
+        })
+        self.assertEqual(len(get_roster(self.session)), 0)
+
+    def test_moving_student_out_of_batch_refreshes_roster(self):
+        other = Batch.objects.create(name='B.Tech ECE', year=2024)
+        student = Student.objects.get(pk=self.students[0].pk)
+        student.batch = other
+        student.save()
+
+        self.assertNotIn(student.pk, get_roster(self.session))
+
+    def test_new_student_joins_active_roster(self):
+        user = User.objects.create_user('late', password='123', is_student=True)
+        student = Student.objects.create(user=user, batch=self.session.batch, roll_number='CS999')
+
+        self.assertIn(student.pk, get_roster(self.session))
+
+
+class ManualAttendanceRosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, self.students = make_session(students=3)
+        self.client.force_login(self.session.teacher.user)
+        self.url = f'/session/{self.session.session_id}/manual/'
+
+    def test_absent_list_comes_from_roster(self):
+        self.client.post(self.url, {'action': 'mark', 'student_id': self.students[0].pk})
+        response = self.client.get(self.url)
+
+        self.assertEqual([s.pk for s in response.context['absent_students']], [s.pk for s in self.students[1:]])
+        self.assertEqual(response.context['roster_size'], 3)
+        self.assertTrue(is_present(self.session.pk, self.students[0].pk))
+
+    def test_unmark_clears_present_set(self):
+        self.client.post(self.url, {'action': 'mark', 'student_id': self.students[0].pk})
+        record = self.session.records.get()
+        self.client.post(self.url, {'action': 'unmark', 'record_id': record.pk})
+
+        self.assertFalse(is_present(self.session.pk, self.students[0].pk))
+
+    def test_student_from_other_batch_is_rejected(self):
+        other_batch = Batch.objects.create(name='B.Tech ECE', year=2024)
+        outsider = Student.objects.create(
+            user=User.objects.create_user('outsider', password='123', is_student=True),
+            batch=other_batch, roll_number='EC001',
+        )
+        self.client.post(self.url, {'action': 'mark', 'student_id': outsider.pk})
+
+        self.assertFalse(self.session.records.exists())
+
+    def test_deleting_record_outside_views_clears_present_set(self):
+        student = self.students[0]
+        mark_once(self.session, student)
+        mark_present(self.session.pk, student.pk)
+        self.session.records.get().delete()
+        self.assertFalse(is_present(self.session.pk, student.pk))
+
+        mark_once(self.session, student)
+        mark_present(self.session.pk, student.pk)
+        Student.objects.filter(pk=student.pk).delete()
+        self.assertFalse(is_present(self.session.pk, student.pk))
@@ -0,0 +1,171 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance_management_system.models import (
+    AttendanceRecord, AttendanceSession, Batch, DailyAttendance, Student, Subject, Teacher, User,
+)
+from attendance_management_system import student_stats
+from attendance_management_system.rollup import rebuild
+from attendance_management_system.services import mark_once, recount_present
+from attendance_management_system.student_stats import get_stats
+
+
+def make_session(students=1):
+    batch = Batch.objects.create(name='B.Tech CSE', year=2024)
+    subject = Subject.objects.create(name='Networks', code='CS301', batch=batch)
+    teacher = Teacher.objects.create(user=User.objects.create_user('faculty', password='123', is_teacher=True))
+    session = AttendanceSession.objects.create(teacher=teacher, subject=subject, batch=batch)
+    roster = [
+        Student.objects.create(
+            user=User.objects.create_user(f'student{i}', password='123', is_student=True),
+            batch=batch,
+            roll_number=f'CS{i:03d}',
+        )
+        for i in range(students)
+    ]
+    return session, roster
+
+
+class MarkOnceTests(TestCase):
+    def test_first_mark_inserts_and_repeat_reports_already_present(self):
+        session, (student,) = make_session()
+
+        self.assertTrue(mark_once(session, student))
+        self.assertFalse(mark_once(session, student))
+        self.assertEqual(AttendanceRecord.objects.filter(session=session, student=student).count(), 1)
+
+    def test_single_record_statement(self):
+        session, (student,) = make_session()
+
+        get_stats(student)
+
+        with CaptureQueriesContext(connection) as queries:
+            mark_once(session, student)
+        statements = [q['sql'] for q in queries]
+        # The record itself is one conditional INSERT and nothing else touches its table...
+        self.assertTrue(statements[0].startswith('INSERT'))
+        self.assertEqual([s for s in statements if AttendanceRecord._meta.db_table in s], statements[:1])
+        # ...then one statement each for the daily rollup, the stats row and present_count
+        self.assertEqual(len(statements), 4)
+
+    def test_failed_counter_update_rolls_back_the_record(self):
+        session, (student,) = make_session()
+
+        with mock.patch.object(student_stats, 'record_added', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                mark_once(session, student)
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertFalse(DailyAttendance.objects.exists())
+        session.refresh_from_db()
+        self.assertEqual(session.present_count, 0)
+
+
+class MarkOnceConcurrencyTests(TransactionTestCase):
+    workers = 8
+
+    def test_parallel_marks_insert_exactly_one_row(self):
+        session, (student,) = make_session()
+        barrier = threading.Barrier(self.workers)
+
+        def mark(_):
+            try:
+                barrier.wait()
+                return mark_once(session, student)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(mark, range(self.workers)))
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(AttendanceRecord.objects.filter(session=session, student=student).count(), 1)
+
+
+class SessionCounterTests(TestCase):
+    def test_present_count_follows_every_write_path(self):
+        session, students = make_session(students=3)
+        mark_once(session, students[0])
+        mark_once(session, students[0])
+        AttendanceRecord.objects.create(session=session, student=students[1])
+        session.refresh_from_db()
+        self.assertEqual(session.present_count, 2)
+
+        AttendanceRecord.objects.get(student=students[1]).delete()
+        session.refresh_from_db()
+        self.assertEqual(session.present_count, 1)
+
+    def test_backfill_and_teacher_rate_aggregate(self):
+        session, students = make_session(students=4)
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(session=session, student=s) for s in students[:3]])
+        AttendanceSession.objects.filter(pk=session.pk).update(is_active=False)
+
+        call_command('backfill_session_counters', stdout=StringIO())
+        session.refresh_from_db()
+        self.assertEqual((session.roster_size, session.present_count), (4, 3))
+
+        self.client.force_login(session.teacher.user)
+        response = self.client.get(reverse('teacher_dashboard'))
+        self.assertEqual(response.context['overall_attendance_rate'], 75.0)
+        self.assertEqual(response.context['total_teacher_sessions'], 1)
+
+    def test_sessions_created_anywhere_get_a_roster_size_and_rates_stay_within_100(self):
+        session, students = make_session(students=3)
+        other = AttendanceSession.objects.create(teacher=session.teacher, subject=session.subject, batch=session.batch)
+        other.refresh_from_db()
+        self.assertEqual(other.roster_size, 3)
+
+        # A session that predates its batch's students, or a stale snapshot
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(session=session, student=s) for s in students])
+        recount_present([session.pk])
+        AttendanceSession.objects.filter(pk=session.pk).update(is_active=False, roster_size=1)
+        self.client.force_login(session.teacher.user)
+        self.assertEqual(self.client.get(reverse('teacher_dashboard')).context['overall_attendance_rate'], 100.0)
+
+
+class CascadeDeleteTests(TestCase):
+    def setUp(self):
+        self.session, self.students = make_session(students=5)
+        self.other = AttendanceSession.objects.create(
+            teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch,
+        )
+        for session in (self.session, self.other):
+            for student in self.students:
+                mark_once(session, student)
+
+    def assertCountersMatchRecords(self):
+        rollup = sorted(DailyAttendance.objects.values_list('student_id', 'count'))
+        rebuild()
+        self.assertEqual(rollup, sorted(DailyAttendance.objects.values_list('student_id', 'count')))
+        for session in AttendanceSession.objects.all():
+            self.assertEqual(session.present_count, session.records.count())
+        for student in Student.objects.all():
+            self.assertEqual(get_stats(student).total_present, student.attendance_records.count())
+
+    def test_session_delete_recounts_once_not_per_record(self):
+        # Delete, rollup group recompute and one stats update for the whole class; per-record
+        # bookkeeping cost about 8 statements for each record
+        with self.assertNumQueries(11):
+            self.session.delete()
+        self.assertCountersMatchRecords()
+
+    def test_student_delete_recounts_the_sessions_it_attended(self):
+        self.students[0].delete()
+        self.assertCountersMatchRecords()
+        self.assertEqual(AttendanceSession.objects.get(pk=self.other.pk).present_count, 4)
+
+    def test_batch_delete(self):
+        self.session.batch.delete()
+        self.assertFalse(DailyAttendance.objects.exists())
+
+    def test_single_record_delete_keeps_the_rest_of_the_day(self):
+        # Both sessions share the student's rollup row for the day (count 2)
+        self.students[0].attendance_records.get(session=self.session).delete()
+        self.assertCountersMatchRecords()
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from attendance_management_system.services import mark_once
+
+from .test_services import make_session
+
+
+class SessionAttendanceDeltaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, self.students = make_session(students=3)
+        self.client.force_login(self.session.teacher.user)
+        self.url = f'/api/session/{self.session.session_id}/attendance/'
+
+    def test_full_list_without_cursor(self):
+        mark_once(self.session, self.students[0])
+        mark_once(self.session, self.students[1])
+
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(len(data['attendance']), 2)
+
+    def test_since_returns_only_new_records(self):
+        mark_once(self.session, self.students[0])
+        first = self.client.get(self.url).json()
+
+        mark_once(self.session, self.students[1])
+        delta = self.client.get(self.url, {'since': first['last_id']}).json()
+
+        self.assertEqual(delta['count'], 2)
+        self.assertEqual([r['id'] for r in delta['attendance']], [delta['last_id']])
+
+    def test_unchanged_attendance_returns_304(self):
+        mark_once(self.session, self.students[0])
+        first = self.client.get(self.url, {'since': 0})
+
+        again = self.client.get(self.url, {'since': 0}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_removed_record_changes_etag(self):
+        mark_once(self.session, self.students[0])
+        mark_once(self.session, self.students[1])
+        first = self.client.get(self.url)
+
+        self.session.records.first().delete()
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['count'], 1)
+
+    def test_session_page_seeds_cursor(self):
+        mark_once(self.session, self.students[0])
+        response = self.client.get(f'/session/{self.session.session_id}/qr/')
+
+        self.assertEqual(response.context['last_record_id'], self.session.records.get().id)
+        self.assertContains(response, f"let lastRecordId = {response.context['last_record_id']};")
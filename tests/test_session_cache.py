@@ -0,0 +1,80 @@
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from attendance_management_system import session_cache
+from attendance_management_system.checks import check_shared_cache
+from attendance_management_system.models import AttendanceSession
+from attendance_management_system.session_cache import SessionSnapshot, get_session_snapshot
+
+from .test_services import make_session
+
+
+class SessionSnapshotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        session_cache.reset_stats()
+        self.session, _ = make_session(students=0)
+
+    def test_second_lookup_is_a_cache_hit(self):
+        first = get_session_snapshot(self.session.session_id)
+        with self.assertNumQueries(0):
+            second = get_session_snapshot(self.session.session_id)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second.subject_name, 'Networks')
+        self.assertEqual(second.batch_id, self.session.batch_id)
+        self.assertEqual(session_cache.stats()['hits'], 1)
+        self.assertEqual(session_cache.stats()['misses'], 1)
+
+    def test_ending_session_invalidates_snapshot(self):
+        self.assertTrue(get_session_snapshot(self.session.session_id).is_active)
+
+        self.session.is_active = False
+        self.session.save()
+
+        self.assertFalse(get_session_snapshot(self.session.session_id).is_active)
+
+    def test_session_ended_during_a_miss_is_not_cached_as_active(self):
+        from_session = SessionSnapshot.from_session
+
+        def end_mid_read(session):
+            # The reader already holds the active row when the teacher ends the session
+            ended = AttendanceSession.objects.get(pk=session.pk)
+            ended.is_active = False
+            ended.save()
+            return from_session(session)
+
+        with mock.patch.object(SessionSnapshot, 'from_session', side_effect=end_mid_read):
+            self.assertTrue(get_session_snapshot(self.session.session_id).is_active)
+
+        self.assertFalse(get_session_snapshot(self.session.session_id).is_active)
+
+    def test_renaming_subject_invalidates_snapshot(self):
+        get_session_snapshot(self.session.session_id)
+
+        subject = self.session.subject
+        subject.name = 'Computer Networks'
+        subject.save()
+
+        self.assertEqual(get_session_snapshot(self.session.session_id).subject_name, 'Computer Networks')
+
+    def test_unknown_session_is_none(self):
+        self.assertIsNone(get_session_snapshot(uuid.uuid4()))
+
+
+class ProcessLocalCacheTests(TestCase):
+    def test_locmem_snapshots_expire_quickly(self):
+        self.assertTrue(session_cache.cache_is_process_local())
+        self.assertEqual(session_cache._timeout(), 2)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(session_cache._timeout(), 300)
+
+    def test_several_workers_on_locmem_fail_the_check(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(WEB_CONCURRENCY=4):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ['attendance.E001'])
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance_management_system import student_stats
+from attendance_management_system.models import AttendanceRecord, AttendanceSession, Student, StudentStats, Subject, User
+from attendance_management_system.services import mark_once
+from attendance_management_system.student_stats import get_stats, subject_breakdown
+
+from .test_services import make_session
+
+
+class StudentStatsTests(TestCase):
+    def setUp(self):
+        self.session, (self.student,) = make_session()
+        self.stats = get_stats(self.student)
+
+    def add(self, days_ago):
+        student_stats.record_added(self.student.pk, timezone.now() - timedelta(days=days_ago))
+        self.stats.refresh_from_db()
+
+    def test_streak_runs_across_single_day_gaps_and_resets_after_longer_ones(self):
+        self.add(10)
+        self.add(6)
+        self.add(4)
+        self.add(3)
+        self.add(3)
+        self.assertEqual((self.stats.current_streak, self.stats.total_present), (3, 5))
+        self.assertEqual(self.stats.last_attended, timezone.localdate() - timedelta(days=3))
+        # Shown as lapsed: the last attended day is older than yesterday
+        self.assertEqual(self.stats.streak_on(timezone.localdate()), 0)
+        self.assertEqual(self.stats.streak_on(timezone.localdate() - timedelta(days=2)), 3)
+
+    def test_records_and_session_close_update_the_row(self):
+        mark_once(self.session, self.student)
+        self.session.is_active = False
+        self.session.save(update_fields=['is_active'])
+        self.stats.refresh_from_db()
+        self.assertEqual((self.stats.total_present, self.stats.eligible_sessions, self.stats.current_streak), (1, 1, 1))
+
+        AttendanceRecord.objects.get(student=self.student).delete()
+        self.stats.refresh_from_db()
+        self.assertEqual((self.stats.total_present, self.stats.last_attended, self.stats.current_streak), (0, None, 0))
+
+        AttendanceSession.objects.get(pk=self.session.pk).delete()
+        self.assertEqual(StudentStats.objects.get(pk=self.student.pk).eligible_sessions, 0)
+
+    def test_dashboard_renders_from_stats(self):
+        mark_once(self.session, self.student)
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.context['total_attendance'], 1)
+        self.assertEqual(response.context['current_streak'], 1)
+
+
+    def test_row_is_created_with_the_student_so_the_first_scan_is_one_update(self):
+        student = Student.objects.create(
+            user=User.objects.create_user('late', password='123', is_student=True), batch=self.session.batch, roll_number='CS900',
+        )
+        self.assertTrue(StudentStats.objects.filter(student=student).exists())
+        with self.assertNumQueries(1):
+            student_stats.record_added(student.pk, timezone.now())
+
+    def test_reopening_a_session_uncounts_it(self):
+        self.session.is_active = False
+        self.session.save(update_fields=['is_active'])
+        self.session.is_active = True
+        self.session.save(update_fields=['is_active'])
+        self.stats.refresh_from_db()
+        self.assertEqual(self.stats.eligible_sessions, 0)
+
+    def test_rebuild_command_repairs_queryset_updates(self):
+        mark_once(self.session, self.student)
+        AttendanceSession.objects.filter(pk=self.session.pk).update(is_active=False)
+        StudentStats.objects.filter(pk=self.student.pk).update(total_present=7)
+
+        call_command('rebuild_student_stats', stdout=StringIO())
+        self.stats.refresh_from_db()
+        self.assertEqual((self.stats.total_present, self.stats.eligible_sessions), (1, 1))
+
+
+class StudentStatsConcurrencyTests(TransactionTestCase):
+    workers = 8
+
+    def test_parallel_refreshes_create_one_row(self):
+        _, (student,) = make_session()
+        StudentStats.objects.all().delete()
+        barrier = threading.Barrier(self.workers)
+
+        def refresh(_):
+            try:
+                barrier.wait()
+                student_stats.refresh(student.pk)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(refresh, range(self.workers)))
+        self.assertEqual(StudentStats.objects.filter(student=student).count(), 1)
+
+class SubjectBreakdownTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session, (self.student, self.other) = make_session(students=2)
+        maths = Subject.objects.create(name='Maths', code='MA101', batch=self.session.batch)
+        self.maths = AttendanceSession.objects.create(teacher=self.session.teacher, subject=maths, batch=self.session.batch)
+        mark_once(self.session, self.student)
+        mark_once(self.session, self.other)
+        mark_once(self.maths, self.other)
+        for session in (self.session, self.maths):
+            session.is_active = False
+            session.save(update_fields=['is_active'])
+
+    def test_one_grouped_query_then_cached(self):
+        stats = get_stats(self.student)
+        with self.assertNumQueries(1):
+            breakdown = subject_breakdown(self.student, stats)
+        self.assertEqual([(r['code'], r['attended'], r['held'], r['percentage']) for r in breakdown],
+                         [('MA101', 0, 1, 0.0), ('CS301', 1, 1, 100.0)])
+        with self.assertNumQueries(0):
+            self.assertEqual(subject_breakdown(self.student, stats), breakdown)
+
+    def test_new_record_and_closed_session_refresh_the_breakdown(self):
+        subject_breakdown(self.student)
+        AttendanceRecord.objects.create(session=self.maths, student=self.student)
+        self.assertEqual(subject_breakdown(self.student)[0]['attended'], 1)
+
+        extra = AttendanceSession.objects.create(teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch)
+        extra.is_active = False
+        extra.save(update_fields=['is_active'])
+        self.assertEqual(subject_breakdown(self.student)[1]['held'], 2)
+
+    def test_json_endpoint(self):
+        # A scan in a running session is not counted against sessions held yet
+        running = AttendanceSession.objects.create(teacher=self.session.teacher, subject=self.session.subject, batch=self.session.batch)
+        mark_once(running, self.student)
+        self.client.force_login(self.student.user)
+        data = self.client.get(reverse('student_subject_attendance')).json()
+        self.assertEqual((data['attended'], data['held']), (1, 2))
+        self.assertEqual(data['subjects'][1], {'subject': 'Networks', 'code': 'CS301', 'attended': 1, 'held': 1, 'percentage': 100.0})